@@ -0,0 +1,214 @@
+import argparse
+import math
+import numpy as np
+
+# the reactive atoms of each residue of a generated micelle, matching example/input/core_reactive.txt and sur_reactive.txt
+CORE_REACTIVE_ATOMS = {"SUR": 2, "DVO": 4, "DVP": 4, "DVM": 4}
+SUR_REACTIVE_ATOMS = {"SUR": 3, "LN2": 2}
+# the number of diazide linkers and divinyl benzenes per surfactant
+LINKERS_PER_SURFACTANT = 1.2
+CROSSLINKERS_PER_SURFACTANT = 0.8
+DIVINYL_BENZENES = ("DVO", "DVP", "DVM")
+HYBRID36_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def controller():
+
+    args = handle_input()
+    counts = generate_micelles(
+        args.pdb_file_path, args.reactive_atoms, args.seed, args.surfactants, args.waters
+    )
+    print(
+        f"Wrote {counts['micelles']} micelles with {counts['atoms']} atoms and {counts['reactive_atoms']} reactive atoms "
+        f"to {args.pdb_file_path}"
+    )
+
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Generation of a synthetic pdb file of micelles with surfactants (SUR), diazide linkers (LN2), "
+        "divinyl benzene cross linkers (DVO/DVP/DVM) and a template (TMP) in the core, for benchmarking LNKD."
+    )
+    parser.add_argument("pdb_file_path", help="The path of the generated pdb file")
+    parser.add_argument(
+        "-n", "--reactive_atoms", type=int, default=1000, help="approximate number of core and surface reactive atoms (default: 1000)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random coordinates (default: 0)")
+    parser.add_argument(
+        "--surfactants", type=int, default=50, help="number of surfactants per micelle (default: 50)"
+    )
+    parser.add_argument(
+        "--waters", type=int, default=0, help="number of water molecules per surfactant (default: 0)"
+    )
+    return parser.parse_args()
+
+
+def hybrid36(value: int, width: int) -> str:
+    """Encodes a serial or residue number that may not fit its column as a decimal in the hybrid-36 encoding.
+
+    Args:
+        value (int): The non-negative number.
+        width (int): The width of the column.
+
+    Returns:
+        str: The right justified decimal, or the upper case and then lower case base 36 digits above 10**width - 1.
+    """
+    if value < 10**width:
+        return str(value).rjust(width)
+    value -= 10**width
+    digits = HYBRID36_DIGITS
+    if value >= 26 * 36 ** (width - 1):
+        value -= 26 * 36 ** (width - 1)
+        digits = HYBRID36_DIGITS.lower()
+    value += 10 * 36 ** (width - 1)
+    encoded = ""
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        encoded = digits[digit] + encoded
+    return encoded
+
+
+def reactive_atoms_per_micelle(surfactants: int) -> int:
+    """The number of core and surface reactive atoms of a micelle with a number of surfactants."""
+    linkers = round(surfactants * LINKERS_PER_SURFACTANT)
+    crosslinkers = round(surfactants * CROSSLINKERS_PER_SURFACTANT)
+    return (
+        surfactants * (CORE_REACTIVE_ATOMS["SUR"] + SUR_REACTIVE_ATOMS["SUR"])
+        + linkers * SUR_REACTIVE_ATOMS["LN2"]
+        + crosslinkers * CORE_REACTIVE_ATOMS["DVO"]
+    )
+
+
+def micelle_radius(surfactants: int) -> float:
+    """The radius of the surface of a micelle, at the terminal alkynes of its surfactants."""
+    return 6 + surfactants ** (1 / 3) * 4
+
+
+def random_directions(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Draws uniformly distributed unit vectors."""
+    vectors = rng.normal(size=(count, 3))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def micelle_residues(rng: np.random.Generator, center: np.ndarray, surfactants: int, waters: int):
+    """Generates the residues of one micelle.
+
+    The methacrylates of the surfactants and the divinyl benzenes form the core, the three terminal alkynes of each
+    surfactant and the diazide linkers form the surface, the template sits at the center and the water surrounds the
+    micelle.
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+        center (np.ndarray): The center of the micelle.
+        surfactants (int): The number of surfactants.
+        waters (int): The number of water molecules per surfactant.
+
+    Yields:
+        Tuple[str, List[Tuple[str, str, np.ndarray]]]: The residue name and the (atom name, element, coordinates) of each atom of a residue.
+    """
+    radius = micelle_radius(surfactants)
+    linkers = round(surfactants * LINKERS_PER_SURFACTANT)
+    crosslinkers = round(surfactants * CROSSLINKERS_PER_SURFACTANT)
+
+    ring = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+    ring = np.column_stack((np.cos(ring), np.sin(ring), np.zeros(6))) * 1.4
+    yield "TMP", [(f"C{k + 1}", "C", center + position) for k, position in enumerate(ring)]
+
+    for direction in random_directions(rng, surfactants):
+        base = center + direction * radius * 0.4
+        atoms = [
+            ("C14", "C", base),
+            ("C16", "C", base + random_directions(rng, 1)[0] * 1.34),
+            ("C1", "C", base + direction * 3),
+        ]
+        for arm in "XYZ":
+            alkyne = center + direction * radius + random_directions(rng, 1)[0] * 2.5
+            atoms.append((f"C{arm}3", "C", alkyne))
+            atoms.append((f"C{arm}2", "C", alkyne + random_directions(rng, 1)[0] * 1.2))
+        yield "SUR", atoms
+
+    for direction in random_directions(rng, linkers):
+        middle = center + direction * (radius + 2)
+        offsets = random_directions(rng, 4) * 3
+        yield "LN2", [
+            ("N6", "N", middle + offsets[0]),
+            ("N4", "N", middle + offsets[1]),
+            ("N3", "N", middle + offsets[2]),
+            ("N1", "N", middle + offsets[3]),
+            ("C1", "C", middle),
+        ]
+
+    for k in range(crosslinkers):
+        middle = center + random_directions(rng, 1)[0] * rng.uniform(0, radius * 0.4)
+        vinyl1 = middle + random_directions(rng, 1)[0] * 2
+        vinyl2 = middle + random_directions(rng, 1)[0] * 2
+        yield DIVINYL_BENZENES[k % len(DIVINYL_BENZENES)], [
+            ("CU", "C", vinyl1),
+            ("CV", "C", vinyl1 + random_directions(rng, 1)[0] * 1.34),
+            ("CX", "C", vinyl2),
+            ("CW", "C", vinyl2 + random_directions(rng, 1)[0] * 1.34),
+            ("C1", "C", middle),
+        ]
+
+    for direction in random_directions(rng, waters * surfactants):
+        oxygen = center + direction * rng.uniform(radius + 4, radius + 15)
+        yield "TIP3", [
+            ("OH2", "O", oxygen),
+            ("H1", "H", oxygen + random_directions(rng, 1)[0]),
+            ("H2", "H", oxygen + random_directions(rng, 1)[0]),
+        ]
+
+
+def generate_micelles(
+    file: str, reactive_atoms: int, seed: int = 0, surfactants: int = 50, waters: int = 0
+) -> dict[str, int]:
+    """Writes a pdb file of micelles with about a given number of reactive atoms.
+
+    The micelles are placed at the centers of the cells of a cubic grid, far enough apart that the query radii of the
+    example do not reach from one micelle to another, and the CRYST1 record holds the box of the grid. Serial numbers
+    above 99999 and residue numbers above 9999 are written in the hybrid-36 encoding.
+
+    Args:
+        file (str): The path of the generated pdb file.
+        reactive_atoms (int): The approximate number of core and surface reactive atoms.
+        seed (int): The seed of the random coordinates, defaults to 0.
+        surfactants (int): The number of surfactants per micelle, defaults to 50.
+        waters (int): The number of water molecules per surfactant, defaults to 0.
+
+    Returns:
+        Dict[str, int]: The number of micelles, atoms, residues and reactive atoms written.
+    """
+    rng = np.random.default_rng(seed)
+    micelles = max(round(reactive_atoms / reactive_atoms_per_micelle(surfactants)), 1)
+    grid = math.ceil(micelles ** (1 / 3))
+    # the surface atoms reach 5 angstrom beyond the radius and the water 16, so 20 keeps the surfaces of neighboring
+    # micelles more than the largest query radius of the example (15) apart
+    spacing = 2 * (micelle_radius(surfactants) + 20)
+    serial = 0
+    res_seq = 0
+    with open(file, "w") as f:
+        f.write(f"CRYST1{grid * spacing:9.3f}{grid * spacing:9.3f}{grid * spacing:9.3f}{90:7.2f}{90:7.2f}{90:7.2f} P 1           1\n")
+        for micelle in range(micelles):
+            center = (np.array(np.unravel_index(micelle, (grid, grid, grid))) + 0.5) * spacing
+            for res_name, atoms in micelle_residues(rng, center, surfactants, waters):
+                res_seq += 1
+                for name, element, (x, y, z) in atoms:
+                    serial += 1
+                    f.write(
+                        f"ATOM  {hybrid36(serial, 5)} {name if len(name) == 4 else ' ' + name:<4} {res_name:<4} "
+                        f"{hybrid36(res_seq, 4)}    {x:8.3f}{y:8.3f}{z:8.3f}{1:6.2f}{0:6.2f}          {element:>2}\n"
+                    )
+        f.write("END\n")
+    return {
+        "micelles": micelles,
+        "atoms": serial,
+        "residues": res_seq,
+        "reactive_atoms": micelles * reactive_atoms_per_micelle(surfactants),
+    }
+
+
+if __name__ == "__main__":
+    controller()
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+PREDICTION_DIRECTORY = os.path.join(REPOSITORY_DIRECTORY, "pair_prediction")
+# the modules of the command line tools and the library interface, imported the way the scripts are run
+ENTRY_POINTS = (
+    "predict_for_single_surfactant",
+    "predict_batch",
+    "predict_sweep",
+    "predict_ensemble",
+    "predict_trajectory",
+    "predict_server",
+    "predict_client",
+    "lnkd",
+)
+# the packages that are only imported once a backend or mode using them runs
+DEFAULT_LAZY_PACKAGES = "scipy,sklearn,joblib,threadpoolctl"
+
+
+def controller():
+
+    args = handle_input()
+    entries = []
+    for module in args.modules:
+        entry = measure_imports(module, args.repeats, args.lazy_packages)
+        entries.append(entry)
+        print(format_entry(entry), file=sys.stderr)
+
+    results = {
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "lazy_packages": args.lazy_packages,
+        "entries": entries,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        print(format_comparison(read_json(args.baseline), results), file=sys.stderr)
+
+    eager = [entry["module"] for entry in entries if entry["lazy_packages_imported"]]
+    if eager:
+        print(f"{', '.join(eager)} import packages that should only be imported once used", file=sys.stderr)
+        sys.exit(1)
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the import time of the command line tools of LNKD, measured with python -X importtime, "
+        "with a check that the packages of the optional backends and modes are not imported at startup."
+    )
+    parser.add_argument(
+        "--modules",
+        type=lambda value: value.split(","),
+        default=list(ENTRY_POINTS),
+        help="comma separated modules of pair_prediction to import (default: all command line tools and lnkd)",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="number of imports of each module, the fastest is kept (default: 5)"
+    )
+    parser.add_argument(
+        "--lazy_packages",
+        type=lambda value: [package for package in value.split(",") if package],
+        default=DEFAULT_LAZY_PACKAGES,
+        help=f"comma separated packages that must not be imported at startup (default: {DEFAULT_LAZY_PACKAGES})",
+    )
+    parser.add_argument("-o", "--output", help="The path of the results file (default: standard output)")
+    parser.add_argument("--baseline", help="The path of the results file of an earlier run to compare the import times with")
+    return parser.parse_args()
+
+
+def read_json(file):
+    """Reads a json file, or returns None if it does not exist."""
+    if file is None or not os.path.exists(file):
+        return None
+    with open(file) as f:
+        return json.load(f)
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int, int]]:
+    """Parses the report of python -X importtime.
+
+    Args:
+        output (str): The standard error of the interpreter.
+
+    Returns:
+        List[Tuple[str, int, int, int]]: The name, nesting depth, self time and cumulative time (microseconds) of every
+        imported module, in the order the imports finished.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        imports.append((name.strip(), depth, int(self_time), int(cumulative_time)))
+    return imports
+
+
+def measure_imports(module: str, repeats: int, lazy_packages) -> dict:
+    """Imports a module of pair_prediction in fresh interpreters and measures its import time.
+
+    Args:
+        module (str): The module name.
+        repeats (int): The number of interpreters, the fastest import is kept.
+        lazy_packages (List[str]): The packages that must not be imported at startup.
+
+    Returns:
+        dict: The fastest cumulative import time in seconds, the number of imported modules, the slowest direct imports
+        of the module and the lazy packages it imported.
+    """
+    best = None
+    for _ in range(max(repeats, 1)):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PREDICTION_DIRECTORY,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+        imports = parse_importtime(process.stderr)
+        total = next(cumulative for name, depth, _, cumulative in reversed(imports) if name == module and depth == 0)
+        if best is None or total < best[0]:
+            best = (total, imports)
+
+    total, imports = best
+    packages = {name.split(".")[0] for name, *_ in imports}
+    # the imports of the module itself are nested one level below it
+    direct = sorted(
+        ((name, cumulative) for name, depth, _, cumulative in imports if depth == 1), key=lambda item: -item[1]
+    )
+    return {
+        "module": module,
+        "seconds": total / 1e6,
+        "modules_imported": len(imports),
+        "slowest_imports": {name: cumulative / 1e6 for name, cumulative in direct[:5]},
+        "lazy_packages_imported": sorted(packages.intersection(lazy_packages)),
+    }
+
+
+def format_entry(entry):
+    """A one line summary of the import time of a module."""
+    slowest = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in entry["slowest_imports"].items())
+    eager = entry["lazy_packages_imported"]
+    return (
+        f"{entry['module']}: {entry['seconds']:.3f} s, {entry['modules_imported']} modules (slowest: {slowest})"
+        + (f", IMPORTS {', '.join(eager)}" if eager else "")
+    )
+
+
+def format_comparison(baseline, results):
+    """A table of the import times of a run relative to the same modules of a baseline run.
+
+    Args:
+        baseline (dict): The results of the baseline run.
+        results (dict): The results of this run.
+
+    Returns:
+        str: The baseline and current import time and their ratio for every module in both runs.
+    """
+    if baseline is None:
+        return "No baseline results to compare with"
+    baseline_entries = {entry["module"]: entry for entry in baseline["entries"]}
+    lines = [f"{'module':<32}{'baseline (s)':>14}{'current (s)':>14}{'ratio':>8}"]
+    for entry in results["entries"]:
+        if entry["module"] not in baseline_entries:
+            continue
+        old_value = baseline_entries[entry["module"]]["seconds"]
+        ratio = f"{entry['seconds'] / old_value:.2f}" if old_value > 0 else "-"
+        lines.append(f"{entry['module']:<32}{old_value:>14.4f}{entry['seconds']:>14.4f}{ratio:>8}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    controller()
@@ -0,0 +1,317 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+# the scripts of pair_prediction import the tools package relative to their own directory
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, "pair_prediction"))
+
+import numpy as np
+import scipy
+from tools.metrics import Metrics
+from tools.pdb import PDB
+from predict_polymerization import PredictBondsCore
+from predict_cycloaddition import PredictBondsSur
+from generate_micelle import generate_micelles
+
+# the stages PredictBonds.predict_bonding records in its metrics, in the order they run, the radius query includes
+# building the tree or cell list of the neighbor search backend
+STAGES = (
+    "reactive_selection",
+    "radius_query",
+    "filtering",
+    "pair_initialization",
+    "heap_init",
+    "selection_loop",
+    "radicals",
+)
+DEFAULT_SIZES = "1000,10000"
+REFERENCE_FILE = os.path.join(BENCHMARK_DIRECTORY, "reference.json")
+
+
+def controller():
+
+    args = handle_input()
+    options = {
+        "core_reactive_input": args.core_reactive_input,
+        "core_QR": args.core_QR,
+        "core_W": args.core_W,
+        "sur_reactive_input": args.sur_reactive_input,
+        "sur_QR": args.sur_QR,
+        "sur_W": args.sur_W,
+    }
+    os.makedirs(args.data_directory, exist_ok=True)
+    references = read_json(args.reference) or {}
+
+    cases = []
+    for size in args.sizes:
+        pdb_file = os.path.join(args.data_directory, f"micelle_{size}_seed{args.seed}.pdb")
+        if not os.path.exists(pdb_file):
+            generate_micelles(pdb_file, size, args.seed)
+        case = run_case(pdb_file, options, args.repeats)
+        case.update(name=case_name(size, args.seed), reactive_atoms_requested=size, seed=args.seed)
+        reference = references.get(case["name"])
+        case["matches_reference"] = None if reference is None else reference == case["output"]
+        cases.append(case)
+        print(format_case(case), file=sys.stderr)
+
+    results = {"environment": environment(), "options": options, "cases": cases}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.update_reference:
+        references.update({case["name"]: case["output"] for case in cases})
+        with open(args.reference, "w") as f:
+            json.dump(references, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        print(format_comparison(read_json(args.baseline), results), file=sys.stderr)
+
+    drifted = [case["name"] for case in cases if case["matches_reference"] is False]
+    if drifted and not args.update_reference:
+        print(f"The output of {', '.join(drifted)} differs from the reference", file=sys.stderr)
+        sys.exit(1)
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    example_input = os.path.join(REPOSITORY_DIRECTORY, "example", "input")
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the stages of the bond prediction on synthetic micelles of increasing size, with "
+        "the peak memory and a check of the predicted bonds against stored reference outputs."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=DEFAULT_SIZES,
+        help=f"comma separated approximate numbers of reactive atoms of the generated structures (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the generated structures (default: 0)")
+    parser.add_argument(
+        "--repeats", type=int, default=1, help="number of runs of each structure, the fastest time of each stage is kept (default: 1)"
+    )
+    parser.add_argument(
+        "--core_reactive_input", default=os.path.join(example_input, "core_reactive.txt"), help="The path to the core reactive input file"
+    )
+    parser.add_argument("-core_QR", type=float, default=10, help="radius of the core spatial query (default: 10)")
+    parser.add_argument("-core_W", type=float, default=0.03, help="weight of the core degree of isolation term (default: 0.03)")
+    parser.add_argument(
+        "--sur_reactive_input", default=os.path.join(example_input, "sur_reactive.txt"), help="The path to the surface reactive input file"
+    )
+    parser.add_argument("-sur_QR", type=float, default=15, help="radius of the surface spatial query (default: 15)")
+    parser.add_argument("-sur_W", type=float, default=0.03, help="weight of the surface degree of isolation term (default: 0.03)")
+    parser.add_argument(
+        "--data_directory",
+        default=os.path.join(BENCHMARK_DIRECTORY, "data"),
+        help="The directory the generated structures are kept in (default: benchmarks/data)",
+    )
+    parser.add_argument("-o", "--output", help="The path of the results file (default: standard output)")
+    parser.add_argument("--reference", default=REFERENCE_FILE, help="The path of the reference outputs (default: benchmarks/reference.json)")
+    parser.add_argument(
+        "--update_reference", action="store_true", help="store the outputs of this run as the reference outputs"
+    )
+    parser.add_argument("--baseline", help="The path of the results file of an earlier run to compare the stage times with")
+    return parser.parse_args()
+
+
+def case_name(size, seed):
+    """The name of a benchmark case, the key of its reference output."""
+    return f"micelle_{size}_seed{seed}"
+
+
+def read_json(file):
+    """Reads a json file, or returns None if it does not exist."""
+    if file is None or not os.path.exists(file):
+        return None
+    with open(file) as f:
+        return json.load(f)
+
+
+def environment():
+    """The commit and the versions the benchmark ran with, so results of different commits and machines can be told apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "machine": platform.machine(),
+        "processors": os.cpu_count(),
+    }
+
+
+def time_prediction(predictor):
+    """Runs PredictBonds.predict_bonding with metrics and reads the wall time of its stages from them.
+
+    Args:
+        predictor (PredictBonds): A predictor of a parsed structure, without metrics.
+
+    Returns:
+        Tuple[Dict[str, float], Dict[str, int]]: The wall time of each stage in seconds, and the number of reactive atoms, candidate pairs, potential pairs and selected pairs.
+    """
+    predictor.metrics = Metrics()
+    predictor.predict_bonding()
+    counters = predictor.metrics.counters
+    timings = {name: predictor.metrics.stages.get(name, 0.0) for name in STAGES}
+    counts = {
+        "reactive_atoms": len(predictor.reactive_indices),
+        "candidate_pairs": counters.get("neighbor_pairs", 0),
+        "potential_pairs": counters.get("candidate_pairs", 0),
+        "selected_pairs": counters.get("selected_pairs", 0),
+    }
+    return timings, counts
+
+
+def output_digest(pdb):
+    """Summarizes the predicted bonds and radicals of a structure to compare them with a reference output.
+
+    Returns:
+        Dict[str, object]: The number of core pairs, surface pairs and radicals, and a sha256 digest of the serials of the selected pairs in selection order and of the radicals.
+    """
+    digest = hashlib.sha256()
+    for label, pairs in (("core", pdb.bonded_pairs_core), ("surface", pdb.bonded_pairs_surface)):
+        digest.update(label.encode())
+        digest.update(np.array([(pair.atom1.serial, pair.atom2.serial) for pair in pairs], dtype=np.int64).tobytes())
+    digest.update(b"radicals")
+    digest.update(np.array([radical.serial for radical in pdb.radicals], dtype=np.int64).tobytes())
+    return {
+        "core_pairs": len(pdb.bonded_pairs_core),
+        "surface_pairs": len(pdb.bonded_pairs_surface),
+        "radicals": len(pdb.radicals),
+        "sha256": digest.hexdigest(),
+    }
+
+
+def benchmark_structure(pdb_file, options):
+    """Parses a structure and predicts its core and then its surface bonds, timing each stage, run in a fresh process.
+
+    Args:
+        pdb_file (str): The path to the pdb file.
+        options (dict): The reactive inputs, query radii and weights of the core and surface predictions.
+
+    Returns:
+        dict: The number of atoms, the stage times and counts of the core and surface predictions, the total time, the peak resident memory and the output digest.
+    """
+    start = time.perf_counter()
+    parse_start = time.perf_counter()
+    pdb = PDB(pdb_file)
+    parse_time = time.perf_counter() - parse_start
+
+    predictions = {}
+    for label, predictor in (
+        ("core", PredictBondsCore(pdb, options["core_reactive_input"], options["core_QR"], options["core_W"])),
+        ("surface", PredictBondsSur(pdb, options["sur_reactive_input"], options["sur_QR"], options["sur_W"])),
+    ):
+        timings, counts = time_prediction(predictor)
+        predictions[label] = {"stages": timings, "counts": counts}
+        del predictor
+
+    return {
+        "atoms": len(pdb.serials),
+        "parse": parse_time,
+        "predictions": predictions,
+        "total": time.perf_counter() - start,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10),
+        "output": output_digest(pdb),
+    }
+
+
+def run_case(pdb_file, options, repeats):
+    """Benchmarks a structure, each run in a new process so that its peak memory is its own.
+
+    Args:
+        pdb_file (str): The path to the pdb file.
+        options (dict): The reactive inputs, query radii and weights of the core and surface predictions.
+        repeats (int): The number of runs, the fastest time of each stage and the highest peak memory are kept.
+
+    Returns:
+        dict: The result of benchmark_structure combined over the runs.
+
+    Raises:
+        RuntimeError: If the runs do not predict the same output.
+    """
+    runs = []
+    for _ in range(max(repeats, 1)):
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            runs.append(pool.submit(benchmark_structure, pdb_file, options).result())
+    if any(run["output"] != runs[0]["output"] for run in runs):
+        raise RuntimeError(f"The runs of {pdb_file} predicted different outputs")
+
+    case = runs[0]
+    case["parse"] = min(run["parse"] for run in runs)
+    case["total"] = min(run["total"] for run in runs)
+    case["peak_memory_mb"] = max(run["peak_memory_mb"] for run in runs)
+    for label, prediction in case["predictions"].items():
+        for name in STAGES:
+            prediction["stages"][name] = min(run["predictions"][label]["stages"][name] for run in runs)
+    case["repeats"] = len(runs)
+    return case
+
+
+def format_case(case):
+    """A one line summary of the result of a benchmark case."""
+    reference = {None: "no reference", True: "matches reference", False: "DIFFERS FROM REFERENCE"}[case["matches_reference"]]
+    return (
+        f"{case['name']}: {case['atoms']} atoms, parse {case['parse']:.3f} s, total {case['total']:.3f} s, "
+        f"peak {case['peak_memory_mb']:.0f} MB, {reference}"
+    )
+
+
+def format_comparison(baseline, results):
+    """A table of the stage times of the cases of a run relative to the same cases of a baseline run.
+
+    Args:
+        baseline (dict): The results of the baseline run.
+        results (dict): The results of this run.
+
+    Returns:
+        str: The baseline and current time and their ratio for every stage of every case in both runs.
+    """
+    if baseline is None:
+        return "No baseline results to compare with"
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    lines = [
+        f"Compared with {baseline['environment'].get('commit') or 'the baseline'}:",
+        f"{'case':<24}{'stage':<32}{'baseline (s)':>14}{'current (s)':>14}{'ratio':>8}",
+    ]
+    for case in results["cases"]:
+        if case["name"] not in baseline_cases:
+            continue
+        old = baseline_cases[case["name"]]
+        rows = [("parse", old["parse"], case["parse"])]
+        for label, prediction in case["predictions"].items():
+            rows.extend(
+                (f"{label}.{name}", old["predictions"][label]["stages"][name], prediction["stages"][name])
+                for name in STAGES
+            )
+        rows.append(("total", old["total"], case["total"]))
+        rows.append(("peak_memory_mb", old["peak_memory_mb"], case["peak_memory_mb"]))
+        for name, old_value, new_value in rows:
+            ratio = f"{new_value / old_value:.2f}" if old_value > 0 else "-"
+            lines.append(f"{case['name']:<24}{name:<32}{old_value:>14.4f}{new_value:>14.4f}{ratio:>8}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    controller()
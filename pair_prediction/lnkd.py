@@ -0,0 +1,137 @@
+import numpy as np
+from tools.pdb import PDB
+from predict_for_single_surfactant import predict_structure
+
+
+class PredictionResult:
+    """The bonds and radicals predicted in a structure, as indices of its atoms.
+
+    The atom indices refer to the per-atom arrays of the structure, e.g. structure.serials[core_pairs] gives the serial
+    numbers written to the output files, and to the arrays or atoms the structure was built from.
+
+    Attributes:
+        structure (PDB): The structure the bonds were predicted in.
+        core_pairs (np.ndarray): The (atom, atom) indices of the core pairs, in selection order.
+        core_potentials (np.ndarray): The bond potential of each core pair when it was selected.
+        surface_pairs (np.ndarray): The (atom, atom) indices of the surface bonds, two for each selected cycloaddition pair, in selection order.
+        radicals (np.ndarray): The indices of the radical atoms.
+    """
+
+    def __init__(self, structure):
+        """Collects the predicted bonds and radicals of a structure.
+
+        Args:
+            structure (PDB): The structure holding the predictions.
+        """
+        atom_indices = {id(atom): atom_idx for atom_idx, atom in structure.atom_objects.items()}
+
+        def get_pair_indices(pairs):
+            return np.array(
+                [(atom_indices[id(pair.atom1)], atom_indices[id(pair.atom2)]) for pair in pairs], dtype=np.int64
+            ).reshape(-1, 2)
+
+        self.structure = structure
+        self.core_pairs = get_pair_indices(structure.bonded_pairs_core)
+        self.core_potentials = np.array([pair.probability for pair in structure.bonded_pairs_core], dtype=np.float64)
+        self.surface_pairs = get_pair_indices(structure.bonded_pairs_surface)
+        self.radicals = np.array([atom_indices[id(atom)] for atom in structure.radicals], dtype=np.int64)
+
+
+def predict(structure, core_reactive, core_QR, core_W, sur_reactive, sur_QR, sur_W, **options):
+    """Predicts the core and then the surface bonds of a structure, without writing any file.
+
+    Args:
+        structure (PDB): The structure, e.g. from PDB.from_arrays. Its bonds are predicted in place.
+        core_reactive (str | dict[str, list[str]]): The core reactive input file, or its dictionary of atom names by residue name.
+        core_QR (float): The query radius of the core pairs (angstrom).
+        core_W (float): The weight for the degree of isolation of the core pairs.
+        sur_reactive (str | dict[str, list[str]]): The surface reactive input file, or its dictionary of atom names by residue name.
+        sur_QR (float): The query radius of the surface pairs (angstrom).
+        sur_W (float): The weight for the degree of isolation of the surface pairs.
+        **options: The options of predict_structure, e.g. single_precision, neighbor_search, workers or metrics.
+
+    Returns:
+        PredictionResult: The predicted bonds and radicals.
+    """
+    predict_structure(structure, core_reactive, core_QR, core_W, sur_reactive, sur_QR, sur_W, **options)
+    return PredictionResult(structure)
+
+
+def predict_arrays(
+    coords,
+    res_seqs,
+    names,
+    res_names,
+    core_reactive,
+    core_QR,
+    core_W,
+    sur_reactive,
+    sur_QR,
+    sur_W,
+    elements=None,
+    serials=None,
+    unit_cell=None,
+    periodic=False,
+    **options,
+):
+    """Predicts the bonds of a structure given as per-atom arrays, without reading or writing any file.
+
+    Args:
+        coords (np.ndarray): The (x, y, z) coordinates of each atom.
+        res_seqs (np.ndarray): The sequence number of the residue of each atom, which groups the atoms into chains.
+        names (Sequence[str]): The name of each atom.
+        res_names (Sequence[str]): The name of the residue of each atom.
+        core_reactive (str | dict[str, list[str]]): The core reactive input file, or its dictionary of atom names by residue name.
+        core_QR (float): The query radius of the core pairs (angstrom).
+        core_W (float): The weight for the degree of isolation of the core pairs.
+        sur_reactive (str | dict[str, list[str]]): The surface reactive input file, or its dictionary of atom names by residue name.
+        sur_QR (float): The query radius of the surface pairs (angstrom).
+        sur_W (float): The weight for the degree of isolation of the surface pairs.
+        elements (Sequence[str]): The element symbol of each atom, defaults to None for the first character of its name.
+        serials (np.ndarray): The serial number of each atom, defaults to None to number the atoms from 1.
+        unit_cell (Sequence[float]): The edge lengths and angles of the unit cell, defaults to None for no unit cell.
+        periodic (bool): Whether to apply periodic boundaries in the orthorhombic unit cell, defaults to False.
+        **options: The options of predict_structure, e.g. single_precision, neighbor_search, workers or metrics.
+
+    Returns:
+        PredictionResult: The predicted bonds and radicals, indexing the given arrays.
+    """
+    structure = PDB.from_arrays(
+        coords, res_seqs, names, res_names, elements, serials, unit_cell, periodic=periodic, metrics=options.get("metrics")
+    )
+    return predict(structure, core_reactive, core_QR, core_W, sur_reactive, sur_QR, sur_W, **options)
+
+
+def predict_biopython(
+    structure,
+    core_reactive,
+    core_QR,
+    core_W,
+    sur_reactive,
+    sur_QR,
+    sur_W,
+    model=0,
+    unit_cell=None,
+    periodic=False,
+    **options,
+):
+    """Predicts the bonds of a Biopython Structure or Model, without reading or writing any file.
+
+    Args:
+        structure (Bio.PDB.Structure.Structure | Bio.PDB.Model.Model): The Biopython structure, or one of its models.
+        core_reactive (str | dict[str, list[str]]): The core reactive input file, or its dictionary of atom names by residue name.
+        core_QR (float): The query radius of the core pairs (angstrom).
+        core_W (float): The weight for the degree of isolation of the core pairs.
+        sur_reactive (str | dict[str, list[str]]): The surface reactive input file, or its dictionary of atom names by residue name.
+        sur_QR (float): The query radius of the surface pairs (angstrom).
+        sur_W (float): The weight for the degree of isolation of the surface pairs.
+        model (int): The index of the model of a Structure, defaults to 0.
+        unit_cell (Sequence[float]): The edge lengths and angles of the unit cell, defaults to None for no unit cell.
+        periodic (bool): Whether to apply periodic boundaries in the orthorhombic unit cell, defaults to False.
+        **options: The options of predict_structure, e.g. single_precision, neighbor_search, workers or metrics.
+
+    Returns:
+        PredictionResult: The predicted bonds and radicals, indexing the standard residue atoms of the model in order.
+    """
+    pdb = PDB.from_biopython(structure, model, unit_cell, periodic, options.get("metrics"))
+    return predict(pdb, core_reactive, core_QR, core_W, sur_reactive, sur_QR, sur_W, **options)
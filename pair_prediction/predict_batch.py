@@ -0,0 +1,260 @@
+import argparse
+import collections
+import concurrent.futures
+import glob
+import os
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+from tools.pdb import PDB
+from tools.cache import PredictionCache
+from predict_for_single_surfactant import add_cache_arguments, add_prediction_arguments, handle_output, predict_structure
+
+
+def controller():
+
+    args = handle_input()
+    structures = collect_structures(args.inputs)
+    if not structures:
+        raise SystemExit(f"No pdb files found for {args.inputs}")
+
+    results = run_batch(structures, args)
+    failed = report_results(results, args.summary)
+
+    return 0 if failed == 0 else 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Prediction of cross linking bonds for many micelle structures in parallel."
+    )
+    parser.add_argument(
+        "inputs",
+        help="a directory of pdb files, a glob pattern of pdb files (quoted) or a manifest file listing one pdb file per line",
+    )
+    add_prediction_arguments(parser)
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of structures predicted at once (default: number of processors)"
+    )
+    parser.add_argument(
+        "--summary", help="the path to write a tab separated summary of all structures to (optional)"
+    )
+    add_cache_arguments(parser)
+    return parser.parse_args()
+
+
+def collect_structures(inputs):
+    """Resolves the batch input to a list of pdb files.
+
+    Args:
+        inputs (str): A directory of pdb files, a glob pattern of pdb files, a pdb file, or a manifest file listing one
+            pdb file per line. Empty lines and lines starting with "#" in a manifest are skipped, and relative paths are
+            relative to the manifest.
+
+    Returns:
+        List[str]: The pdb files, sorted unless they are listed in a manifest.
+    """
+    if os.path.isdir(inputs):
+        return sorted(glob.glob(os.path.join(inputs, "*.pdb")))
+    if os.path.isfile(inputs):
+        if inputs.lower().endswith(".pdb"):
+            return [inputs]
+        manifest_directory = os.path.dirname(inputs)
+        with open(inputs, "r") as f:
+            return [
+                os.path.join(manifest_directory, line.strip())
+                for line in f
+                if line.strip() and not line.strip().startswith("#")
+            ]
+    return sorted(glob.glob(inputs, recursive=True))
+
+
+def predict_parsed_structure(pdb, output_directory, options):
+    """Predicts and writes the bonds of a parsed structure, the task run by the batch worker processes.
+
+    Args:
+        pdb (PDB): The parsed structure.
+        output_directory (str): The directory to write the output files to.
+        options (dict): The keyword arguments of predict_structure other than the structure.
+
+    Returns:
+        dict: The number of core pairs, surface pairs and radicals, and the prediction time in seconds.
+    """
+    start = time.perf_counter()
+    predict_structure(pdb, **options)
+    handle_output(pdb.file, output_directory, pdb)
+    return {
+        "core_pairs": len(pdb.bonded_pairs_core),
+        "surface_pairs": len(pdb.bonded_pairs_surface),
+        "radicals": len(pdb.radicals),
+        "predict_seconds": time.perf_counter() - start,
+    }
+
+
+def run_batch(structures, args):
+    """Predicts the bonds of every structure across a pool of worker processes.
+
+    The structures are parsed in this process while the workers predict the previous ones, with at most one parsed
+    structure waiting per worker, which bounds the memory of the batch. A structure that fails to parse or predict
+    is recorded as failed without stopping the batch. When a worker process crashes, the pool is replaced and the
+    structures that were in flight are predicted again one at a time, so that only the structure that crashed fails.
+    With a cache directory, the parsed structures, neighbor pairs and results are loaded from the on-disk cache shared
+    by the workers and by later runs, see tools.cache.PredictionCache.
+
+    Args:
+        structures (List[str]): The pdb files.
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        List[dict]: The result of each structure in input order, with its file, status, error and counts.
+    """
+    cache = PredictionCache(args.cache_directory, int(args.cache_max_size * 2**20)) if args.cache_directory else None
+    options = {
+        "core_reactive_input": args.core_reactive_input,
+        "core_QR": args.core_QR,
+        "core_W": args.core_W,
+        "sur_reactive_input": args.sur_reactive_input,
+        "sur_QR": args.sur_QR,
+        "sur_W": args.sur_W,
+        "single_precision": args.single_precision,
+        "neighbor_search": args.neighbor_search,
+        "workers": args.workers,
+        "cache": cache,
+    }
+    jobs = max(args.jobs, 1)
+    results = [{"file": file, "status": "pending"} for file in structures]
+    # the (result, pdb, output directory) of each structure in flight by its future
+    pending = {}
+    # the structures in flight on a crashed pool, to be predicted again one at a time
+    retries = collections.deque()
+    next_structure = 0
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    try:
+        while next_structure < len(structures) or pending or retries:
+            if retries and not pending:
+                task = retries.popleft()
+                task[0]["retried"] = True
+                pending[pool.submit(predict_parsed_structure, *task[1:], options)] = task
+                continue
+
+            # parse ahead while fewer than two structures per worker are in flight
+            if not retries and next_structure < len(structures) and len(pending) < 2 * jobs:
+                result = results[next_structure]
+                next_structure += 1
+                start = time.perf_counter()
+                try:
+                    if cache is None:
+                        pdb = PDB(result["file"], args.periodic)
+                    else:
+                        pdb = cache.load_structure(result["file"], args.periodic)
+                except Exception as error:
+                    record_failure(result, error)
+                    print_result(result)
+                    continue
+                result["parse_seconds"] = time.perf_counter() - start
+                task = (result, pdb, args.output_directory or os.path.dirname(result["file"]))
+                try:
+                    future = pool.submit(predict_parsed_structure, *task[1:], options)
+                except BrokenProcessPool:
+                    pool = replace_broken_pool(pool, pending, retries, jobs)
+                    future = pool.submit(predict_parsed_structure, *task[1:], options)
+                pending[future] = task
+                continue
+
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                task = pending.pop(future)
+                result = task[0]
+                try:
+                    result.update(future.result())
+                    result["status"] = "ok"
+                except BrokenProcessPool as error:
+                    broken = True
+                    if not result.get("retried"):
+                        retries.append(task)
+                        continue
+                    record_failure(result, error)
+                except Exception as error:
+                    record_failure(result, error)
+                print_result(result)
+            if broken:
+                pool = replace_broken_pool(pool, pending, retries, jobs)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    for result in results:
+        result.pop("retried", None)
+    return results
+
+
+def replace_broken_pool(pool, pending, retries, jobs):
+    """Replaces a crashed worker pool, queueing the structures that were in flight on it to be predicted again.
+
+    A structure that already crashed a pool while predicted on its own is not retried again.
+
+    Args:
+        pool (ProcessPoolExecutor): The crashed pool.
+        pending (dict): The tasks of the structures in flight by their future, emptied by this function.
+        retries (collections.deque): The tasks of the structures to be predicted again one at a time.
+        jobs (int): The number of worker processes of the new pool.
+
+    Returns:
+        ProcessPoolExecutor: The new pool.
+    """
+    for task in pending.values():
+        if task[0].get("retried"):
+            record_failure(task[0], BrokenProcessPool("a worker process terminated abruptly"))
+            print_result(task[0])
+        else:
+            retries.append(task)
+    pending.clear()
+    pool.shutdown(wait=False, cancel_futures=True)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+
+
+def record_failure(result, error):
+    """Marks a structure as failed with the error that stopped it."""
+    result["status"] = "failed"
+    result["error"] = "".join(traceback.format_exception_only(type(error), error)).strip()
+
+
+def print_result(result):
+    """Prints the outcome of a structure once it is finished."""
+    if result["status"] == "ok":
+        print(
+            f"OK     {result['file']}: {result['core_pairs']} core pairs, {result['surface_pairs']} surface pairs, "
+            f"{result['radicals']} radicals ({result['parse_seconds'] + result['predict_seconds']:.2f} s)"
+        )
+    else:
+        print(f"FAILED {result['file']}: {result['error']}")
+
+
+def report_results(results, summary_file=None):
+    """Prints the totals of the batch and optionally writes the result of every structure as a tab separated table.
+
+    Args:
+        results (List[dict]): The result of each structure.
+        summary_file (str): The path of the summary table, defaults to None for no table.
+
+    Returns:
+        int: The number of structures that failed.
+    """
+    failed = sum(result["status"] != "ok" for result in results)
+    print(f"Finished {len(results)} structures: {len(results) - failed} succeeded, {failed} failed")
+
+    if summary_file:
+        columns = ["file", "status", "core_pairs", "surface_pairs", "radicals", "parse_seconds", "predict_seconds", "error"]
+        with open(summary_file, "w") as f:
+            f.write("\t".join(columns) + "\n")
+            for result in results:
+                row = []
+                for column in columns:
+                    value = result.get(column, "")
+                    row.append(f"{value:.3f}" if isinstance(value, float) else str(value).replace("\t", " ").replace("\n", " "))
+                f.write("\t".join(row) + "\n")
+    return failed
+
+
+if __name__ == "__main__":
+    raise SystemExit(controller())
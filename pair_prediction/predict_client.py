@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# the unix socket the server listens on and the client connects to by default
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "lnkd_predict.sock")
+
+
+def controller():
+
+    args = handle_input()
+    request = build_request(args)
+    try:
+        response = send_request(request, args.socket)
+    except OSError as error:
+        raise SystemExit(f"Could not reach the prediction server on {args.socket}: {error}")
+
+    if response["status"] != "ok":
+        print(f"FAILED {request['pdb_file_path']}: {response['error']}", file=sys.stderr)
+        return 1
+    print(
+        f"{response['core_pairs']} core pairs, {response['surface_pairs']} surface pairs, "
+        f"{response['radicals']} radicals ({response['seconds']:.2f} s{', cached' if response['cached'] else ''})"
+    )
+    print("Finished!")
+
+    return 0
+
+
+# creates the parser object and handles the input from the user (via command line inputs), with the same arguments as
+# predict_for_single_surfactant.py, defined here so that the client does not import the prediction modules
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Prediction of cross linking bonds in micelle structure by a running predict_server.py."
+    )
+    parser.add_argument("pdb_file_path", help="The path to the pdb input file")
+    parser.add_argument(
+        "core_reactive_input", help="The path to the core reactive input file"
+    )
+    parser.add_argument(
+        "-core_QR", type=float, help="radius around each core reactive atom to perform spatial query (angstrom)"
+    )
+    parser.add_argument(
+        "-core_W", type=float, help="weight for the degree of isolation term in bond potential of core pairs (float)"
+    )
+    parser.add_argument(
+        "sur_reactive_input", help="The path to the surface reactive input file"
+    )
+    parser.add_argument(
+        "-sur_QR", type=float, help="radius around each core reactive atom to perform spatial query (angstrom)"
+    )
+    parser.add_argument(
+        "-sur_W", type=float, help="weight for the degree of isolation term in bond potential of surface pairs (float)"
+    )
+    parser.add_argument(
+        "-o", "--output_directory", help="The path to the output directory"
+    )
+    parser.add_argument(
+        "--single_precision",
+        action="store_true",
+        help="store the index columns of the potential pairs as int32 to reduce memory, with the same predictions",
+    )
+    parser.add_argument(
+        "--neighbor_search", default="auto", help="the backend of the spatial query of reactive atoms (default: auto)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="number of threads for the spatial query, -1 uses all processors (default: 1)"
+    )
+    parser.add_argument(
+        "--periodic",
+        action="store_true",
+        help="apply periodic boundaries in the orthorhombic unit cell of the CRYST1 record, using minimum image distances",
+    )
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help=f"the path of the unix socket of the server (default: {DEFAULT_SOCKET})"
+    )
+    return parser.parse_args()
+
+
+def build_request(args):
+    """Builds the prediction request of the command line arguments, with absolute paths for the server.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        dict: The fields of the request, see predict_server.REQUEST_FIELDS.
+    """
+    return {
+        "pdb_file_path": os.path.abspath(args.pdb_file_path),
+        "core_reactive_input": os.path.abspath(args.core_reactive_input),
+        "core_QR": args.core_QR,
+        "core_W": args.core_W,
+        "sur_reactive_input": os.path.abspath(args.sur_reactive_input),
+        "sur_QR": args.sur_QR,
+        "sur_W": args.sur_W,
+        "output_directory": os.path.abspath(args.output_directory) if args.output_directory else "",
+        "single_precision": args.single_precision,
+        "neighbor_search": args.neighbor_search,
+        "workers": args.workers,
+        "periodic": args.periodic,
+    }
+
+
+def send_request(request: dict, socket_path: str = DEFAULT_SOCKET) -> dict:
+    """Sends a prediction request to the server and waits for its response.
+
+    Args:
+        request (dict): The fields of the request, see predict_server.REQUEST_FIELDS. Relative paths are relative to the
+            working directory of the server.
+        socket_path (str): The path of the unix socket of the server, defaults to DEFAULT_SOCKET.
+
+    Returns:
+        dict: The response, with the status "ok" and the number of core pairs, surface pairs and radicals, or the status
+        "failed" and the error.
+
+    Raises:
+        OSError: If the server cannot be reached or closes the connection without a response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        with connection.makefile("rb") as responses:
+            response = responses.readline()
+    if not response:
+        raise ConnectionError("The server closed the connection without a response")
+    return json.loads(response)
+
+
+if __name__ == "__main__":
+    raise SystemExit(controller())
@@ -1,10 +1,11 @@
 ###  Author: Bradford Derby   ###
 ### Modified by: Emma Stevens ###
 
+import itertools
 from enums import SchemeOneBE, SchemeOneBN, SchemeTwoBN
 from tools.pair import Pair
 from tools.predict_bonds import PredictBonds
-from tools.constraint_validation import is_valid_LN2_surface_pair
+from tools.constraint_validation import are_valid_LN2_surface_pairs
 
 
 class PredictBondsSur(PredictBonds):
@@ -21,41 +22,38 @@ class PredictBondsSur(PredictBonds):
     IDEAL_BOND_DIST = 3.0  # angstroms
     BOND_DIST_STD = 2.5
     MAX_CONNECTIVITY = 8
+    BONDS_PER_PAIR = 2  # the cycloaddition forms a triazole with two new bonds
+
+    def get_reactive_groups(self):
+        # the atoms of two chains of the same type never form a valid pair (see are_valid_LN2_surface_pairs), so the
+        # query only pairs the atoms of chains of different types, e.g. the SUR alkynes with the LN2 azides
+        num_types = int(self.chain_types.max()) + 1 if len(self.chain_types) else 0
+        return self.chain_types[self.reactive_atom_chains], list(itertools.combinations(range(num_types), 2))
+
+    def calculate_bond_potentials(self, pairs, pair_ids):
+        atom_i = pairs.atom_i[pair_ids]
+        atom_j = pairs.atom_j[pair_ids]
+        chain_i = pairs.chain_i[pair_ids]
+        chain_j = pairs.chain_j[pair_ids]
+
+        valid = are_valid_LN2_surface_pairs(
+            self.atom_bonded, self.bonded_chain_keys, self.chain_types, atom_i, atom_j, chain_i, chain_j
+        )
 
-    def __init__(self, pdb, reactive_input_file, query_radius, weight):
-        """Initializes the PredictBondsSur with a PDB object and a reactive input file.
-
-        Args:
-            pdb (PDB): The PDB object to predict bonds for.
-            reactive_input_file (str): The input file for the specific reactive atom names and residues for the structure.
-            QR (float): The query radius for finding nearby reactive atoms.
-            W (float): The weight for the degree of isolation.
-        """
-        super().__init__(pdb, reactive_input_file, query_radius, weight)
-
-    def calculate_bond_potential(self, atom1, atom2, atoms_dist):
-
-        if not is_valid_LN2_surface_pair(atom1, atom2):
-            return 0
-        
-        if len(self.pdb.get_bonded_pairs_surf()) > 0:
-            all_bonded_chains = []
-            # gets all the bonded chains (with duplicates) in the structure
-            for pair in self.pdb.get_bonded_pairs_surf():
-                all_bonded_chains.append(pair.chain1)
-                all_bonded_chains.append(pair.chain2)
-
-            chain1_iso = all_bonded_chains.count(pair.chain1)
-            chain2_iso = all_bonded_chains.count(pair.chain2)
-            connectivity = chain1_iso + chain2_iso
-            isolatedness = self.MAX_CONNECTIVITY - connectivity
-        else:
-            isolatedness = self.MAX_CONNECTIVITY
-
-        bond_pot = self.bond_potential(
-            atoms_dist, self.IDEAL_BOND_DIST, self.BOND_DIST_STD**2, self.weight, isolatedness, self.MAX_CONNECTIVITY
+        connectivity = self.chain_connectivity.counts[chain_i] + self.chain_connectivity.counts[chain_j]
+        isolatedness = self.MAX_CONNECTIVITY - connectivity
+
+        bond_pots = self.bond_potentials(
+            pairs.distance[pair_ids],
+            valid,
+            self.IDEAL_BOND_DIST,
+            self.BOND_DIST_STD**2,
+            self.weight,
+            isolatedness,
+            self.MAX_CONNECTIVITY,
+            pairs.get_frequency(pair_ids),
         )
-        return bond_pot
+        return bond_pots
 
 
     def add_pair_pdb(self, pair):
@@ -0,0 +1,199 @@
+import argparse
+import collections
+import concurrent.futures
+import os
+import time
+import numpy as np
+from tools.pdb import PDB
+from tools.shared_arrays import SharedArrays, attach_shared_arrays
+from predict_polymerization import PredictBondsCore
+from predict_cycloaddition import PredictBondsSur
+from predict_for_single_surfactant import add_prediction_arguments, handle_output
+from predict_sweep import query_neighbor_pairs
+
+# the structure, candidate pairs and options of a worker process, set once by init_worker
+worker_state = {}
+
+
+def controller():
+
+    args = handle_input()
+    start = time.perf_counter()
+    pdb = PDB(args.pdb_file_path, args.periodic)
+    output_directory = args.output_directory or os.path.dirname(args.pdb_file_path)
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+
+    counts = run_ensemble(pdb, args, output_directory, seed)
+    write_pair_frequencies(
+        os.path.join(output_directory, pair_frequency_filename(args.pdb_file_path)), counts, args.replicates
+    )
+    print(f"Finished {args.replicates} replicates with seed {seed} in {time.perf_counter() - start:.2f} s")
+
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Sampling of an ensemble of cross linked micelle structures, selecting the bonds at random with a "
+        "probability proportional to their bond potential."
+    )
+    parser.add_argument("pdb_file_path", help="The path to the pdb input file")
+    add_prediction_arguments(parser)
+    parser.add_argument(
+        "-n", "--replicates", type=int, default=10, help="number of structures sampled (default: 10)"
+    )
+    parser.add_argument(
+        "--seed", type=int, help="the seed of the ensemble, the same seed samples the same structures (default: random)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of replicates sampled at once (default: number of processors)"
+    )
+    return parser.parse_args()
+
+
+def replicate_directory(output_directory, replicate, replicates):
+    """The directory of the output files of one replicate of the ensemble."""
+    return os.path.join(output_directory, f"replicate_{replicate:0{len(str(replicates - 1))}d}")
+
+
+def pair_frequency_filename(file_path_input):
+    """The name of the pair frequency table of an ensemble, following the naming of the other output files."""
+    return os.path.splitext(os.path.basename(file_path_input))[0] + "_pair_frequency.txt"
+
+
+def init_worker(template, specs, options):
+    """Maps the parsed arrays of the structure and the candidate pairs from shared memory, run once by each worker process.
+
+    Args:
+        template (PDB): A copy of the structure without its parsed arrays.
+        specs (Dict[str, tuple]): The shared memory specs of the parsed arrays and the candidate pairs.
+        options (dict): The reactive inputs, query radii and weights of the predictions and the output options.
+    """
+    arrays, blocks = attach_shared_arrays(specs)
+    for field in PDB.ARRAY_FIELDS:
+        setattr(template, field, arrays[field])
+    worker_state.update(
+        template=template,
+        blocks=blocks,
+        options=options,
+        core_pairs=(arrays["core_atom_i"], arrays["core_atom_j"], arrays["core_distances"]),
+        sur_pairs=(arrays["sur_atom_i"], arrays["sur_atom_j"], arrays["sur_distances"]),
+    )
+
+
+def sample_replicate(seed, output_directory):
+    """Samples the core and then the surface bonds of one replicate and writes its output files, the task run by the worker processes.
+
+    Args:
+        seed (np.random.SeedSequence): The seed of the replicate.
+        output_directory (str): The directory to write the output files of the replicate to.
+
+    Returns:
+        dict: The (atom1 serial, atom2 serial) of the selected core pairs and surface pairs, and the number of radicals.
+    """
+    options = worker_state["options"]
+    pdb = worker_state["template"].copy_structure()
+    core_seed, sur_seed = seed.spawn(2)
+    PredictBondsCore(
+        pdb,
+        options["core_reactive_input"],
+        options["core_QR"],
+        options["core_W"],
+        single_precision=options["single_precision"],
+        neighbor_pairs=worker_state["core_pairs"],
+        seed=core_seed,
+    ).predict_bonding()
+    PredictBondsSur(
+        pdb,
+        options["sur_reactive_input"],
+        options["sur_QR"],
+        options["sur_W"],
+        single_precision=options["single_precision"],
+        neighbor_pairs=worker_state["sur_pairs"],
+        seed=sur_seed,
+    ).predict_bonding()
+
+    os.makedirs(output_directory, exist_ok=True)
+    handle_output(pdb.file, output_directory, pdb)
+    return {
+        "core": [(pair.atom1.serial, pair.atom2.serial) for pair in pdb.bonded_pairs_core],
+        "surface": [(pair.atom1.serial, pair.atom2.serial) for pair in pdb.bonded_pairs_surface],
+        "radicals": len(pdb.radicals),
+    }
+
+
+def run_ensemble(pdb, args, output_directory, seed):
+    """Samples every replicate of the ensemble and writes their output files.
+
+    The neighbors of the core and surface reactive atoms are queried once. The parsed arrays of the structure and the
+    candidate pairs are placed in shared memory, which every worker process maps instead of receiving a copy. Each
+    replicate is seeded by its own child of the seed of the ensemble, so the replicates do not depend on the number
+    of worker processes.
+
+    Args:
+        pdb (PDB): The parsed structure without any bonds.
+        args (argparse.Namespace): The parsed command line arguments.
+        output_directory (str): The directory the replicate directories are created in.
+        seed (int): The seed of the ensemble.
+
+    Returns:
+        Dict[tuple, int]: The number of replicates selecting each (bond type, atom1 serial, atom2 serial) pair.
+    """
+    core_pairs = query_neighbor_pairs(
+        PredictBondsCore, pdb, args.core_reactive_input, args.core_QR, args.neighbor_search, args.workers
+    )
+    sur_pairs = query_neighbor_pairs(
+        PredictBondsSur, pdb, args.sur_reactive_input, args.sur_QR, args.neighbor_search, args.workers
+    )
+    arrays = {field: getattr(pdb, field) for field in PDB.ARRAY_FIELDS}
+    for prefix, pairs in (("core", core_pairs), ("sur", sur_pairs)):
+        arrays.update(zip((f"{prefix}_atom_i", f"{prefix}_atom_j", f"{prefix}_distances"), pairs))
+    template = pdb.copy_structure()
+    for field in PDB.ARRAY_FIELDS:
+        setattr(template, field, None)
+    options = {
+        key: getattr(args, key)
+        for key in ("core_reactive_input", "core_QR", "core_W", "sur_reactive_input", "sur_QR", "sur_W", "single_precision")
+    }
+
+    counts = collections.Counter()
+    with SharedArrays(arrays) as shared:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(args.jobs, 1), initializer=init_worker, initargs=(template, shared.specs, options)
+        ) as pool:
+            futures = [
+                pool.submit(
+                    sample_replicate,
+                    replicate_seed,
+                    replicate_directory(output_directory, replicate, args.replicates),
+                )
+                for replicate, replicate_seed in enumerate(np.random.SeedSequence(seed).spawn(args.replicates))
+            ]
+            for replicate, future in enumerate(futures):
+                result = future.result()
+                counts.update(("core", *pair) for pair in result["core"])
+                counts.update(("surface", *pair) for pair in result["surface"])
+                print(
+                    f"Replicate {replicate}: {len(result['core'])} core pairs, {len(result['surface'])} surface pairs, "
+                    f"{result['radicals']} radicals"
+                )
+    return counts
+
+
+def write_pair_frequencies(file, counts, replicates):
+    """Writes the fraction of the replicates selecting each pair as a tab separated table, most frequent first.
+
+    Args:
+        file (str): The path of the pair frequency table.
+        counts (Dict[tuple, int]): The number of replicates selecting each (bond type, atom1 serial, atom2 serial) pair.
+        replicates (int): The number of replicates.
+    """
+    with open(file, "w") as f:
+        f.write("bond\tatom1\tatom2\tcount\tfrequency\n")
+        for (bond, atom1, atom2), count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            f.write(f"{bond}\t{atom1}\t{atom2}\t{count}\t{count / replicates:.4f}\n")
+
+
+if __name__ == "__main__":
+    controller()
@@ -3,6 +3,12 @@
 
 import argparse
 import os
+from contextlib import nullcontext
+from tools.cache import PredictionCache, get_result_arrays, get_result_key, restore_results
+from tools.checkpoint import SelectionCheckpoint
+from tools.concurrent_prediction import predict_concurrently
+from tools.metrics import Metrics
+from tools.neighbors import NEIGHBOR_SEARCH_BACKENDS
 from tools.pdb import PDB
 from predict_polymerization import PredictBondsCore
 from predict_cycloaddition import PredictBondsSur
@@ -10,67 +16,260 @@ from predict_cycloaddition import PredictBondsSur
 
 def controller():
 
-    file_path_input, core_reactive_input, core_QR, core_W, sur_reactive_input, sur_QR, sur_W, output_directory = (
-        handle_input()
-    )
-    pdb = PDB(file_path_input)
+    args = handle_input()
+    metrics = Metrics() if args.metrics else None
+    cache = PredictionCache(args.cache_directory, int(args.cache_max_size * 2**20)) if args.cache_directory else None
+    if cache is None:
+        pdb = PDB(args.pdb_file_path, args.periodic, metrics)
+    else:
+        pdb = cache.load_structure(args.pdb_file_path, args.periodic, metrics)
+
+    base_path = os.path.splitext(os.path.basename(args.pdb_file_path))[0]
+    pair_output_files = None
+    checkpoints = None
+    if not args.concurrent:
+        # the core and surface pairs are streamed to their output files as they are selected
+        pair_output_files = tuple(
+            os.path.join(args.output_directory, base_path + suffix)
+            for suffix in ("_core_pair_output.txt", "_sur_pair_output.txt")
+        )
+    if args.checkpoint_interval is not None:
+        checkpoints = tuple(
+            SelectionCheckpoint(
+                os.path.join(args.output_directory, base_path + suffix), args.checkpoint_interval, args.resume
+            )
+            for suffix in ("_core_checkpoint.npz", "_sur_checkpoint.npz")
+        )
 
-    predict_core_bonds = PredictBondsCore(pdb, core_reactive_input, core_QR, core_W)
-    predict_sur_bonds = PredictBondsSur(pdb, sur_reactive_input, sur_QR, sur_W)
-    predict_core_bonds.predict_bonding()
-    predict_sur_bonds.predict_bonding()
+    predict_structure(
+        pdb,
+        args.core_reactive_input,
+        args.core_QR,
+        args.core_W,
+        args.sur_reactive_input,
+        args.sur_QR,
+        args.sur_W,
+        single_precision=args.single_precision,
+        neighbor_search=args.neighbor_search,
+        workers=args.workers,
+        concurrent=args.concurrent,
+        metrics=metrics,
+        pair_output_files=pair_output_files,
+        checkpoints=checkpoints,
+        component_jobs=args.component_jobs,
+        cache=cache,
+    )
 
-    handle_output(file_path_input, output_directory, pdb)
+    handle_output(args.pdb_file_path, args.output_directory, pdb)
+    if metrics is not None:
+        metrics.write_json(args.metrics)
+    # the checkpoints of a finished prediction are no longer needed
+    for checkpoint in checkpoints or ():
+        if os.path.exists(checkpoint.file):
+            os.remove(checkpoint.file)
 
     print("Finished!")
 
     return 1
 
 
-# creates the parser object and handles the input from the user (via command line inputs)
+# predicts the core and then the surface bonds of a parsed structure, storing them in the PDB object,
+# concurrent predicts both at once in two processes with the same results,
+# metrics records the stage times and counters of the core and surface predictions (only the total time when concurrent),
+# pair_output_files and checkpoints are the (core, surface) files the pairs are streamed to and the checkpoints of the
+# selection sequences (not used when concurrent), component_jobs is the number of processes the selection sequences are
+# split across by connected component (not used when concurrent), cache is the on-disk cache the results of a structure
+# without bonds and the neighbor pairs (not when concurrent) are loaded from and stored in,
+# the options after the surface weight are only taken by keyword
+def predict_structure(
+    pdb,
+    core_reactive_input,
+    core_QR,
+    core_W,
+    sur_reactive_input,
+    sur_QR,
+    sur_W,
+    *,
+    single_precision=False,
+    neighbor_search="auto",
+    workers=1,
+    concurrent=False,
+    metrics=None,
+    pair_output_files=None,
+    checkpoints=None,
+    component_jobs=None,
+    cache=None,
+):
+    result_key = None
+    if cache is not None and not pdb.bonded_pairs:
+        result_key = get_result_key(
+            pdb, core_reactive_input, core_QR, core_W, sur_reactive_input, sur_QR, sur_W, single_precision=single_precision
+        )
+        results = cache.load("results", result_key)
+        if results is not None:
+            restore_results(pdb, results)
+            if metrics is not None:
+                metrics.count("cache_hits")
+            return pdb
+
+    if concurrent:
+        options = {"single_precision": single_precision, "neighbor_search": neighbor_search, "workers": workers}
+        with nullcontext() if metrics is None else metrics.stage("concurrent_prediction"):
+            predict_concurrently(
+                pdb,
+                PredictBondsCore,
+                {"reactive_input_file": core_reactive_input, "query_radius": core_QR, "weight": core_W, **options},
+                PredictBondsSur,
+                {"reactive_input_file": sur_reactive_input, "query_radius": sur_QR, "weight": sur_W, **options},
+            )
+    else:
+        core_output_file, sur_output_file = pair_output_files or (None, None)
+        core_checkpoint, sur_checkpoint = checkpoints or (None, None)
+        predict_core_bonds = PredictBondsCore(
+            pdb,
+            core_reactive_input,
+            core_QR,
+            core_W,
+            single_precision=single_precision,
+            neighbor_search=neighbor_search,
+            workers=workers,
+            metrics=None if metrics is None else metrics.child("core"),
+            pair_output_file=core_output_file,
+            checkpoint=core_checkpoint,
+            component_jobs=component_jobs,
+            cache=cache,
+        )
+        predict_sur_bonds = PredictBondsSur(
+            pdb,
+            sur_reactive_input,
+            sur_QR,
+            sur_W,
+            single_precision=single_precision,
+            neighbor_search=neighbor_search,
+            workers=workers,
+            metrics=None if metrics is None else metrics.child("surface"),
+            pair_output_file=sur_output_file,
+            checkpoint=sur_checkpoint,
+            component_jobs=component_jobs,
+            cache=cache,
+        )
+        predict_core_bonds.predict_bonding()
+        predict_sur_bonds.predict_bonding()
+
+    if result_key is not None:
+        cache.store("results", result_key, get_result_arrays(pdb))
+    return pdb
+
+
+# creates the parser object and handles the input from the user (via command line inputs),
+# returning the parsed arguments with the output directory defaulting to the directory of the pdb file
 def handle_input():
     parser = argparse.ArgumentParser(
         description="Prediction of cross linking bonds in micelle structure."
     )
     parser.add_argument("pdb_file_path", help="The path to the pdb input file")
+    add_prediction_arguments(parser)
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="predict the core and surface bonds at once in two processes, with the same results as in sequence",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="The path of a json file to write the time of each stage and the counters of the prediction to, "
+        "in --concurrent mode only the total time of the prediction is recorded",
+    )
+    parser.add_argument(
+        "--checkpoint_interval",
+        type=float,
+        help="save the state of the selection sequences to checkpoint files in the output directory at most every this "
+        "many seconds, they are removed once the prediction finishes (default: no checkpoints, 60 with --resume)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume an interrupted prediction from its checkpoint files, with the same results as an uninterrupted one",
+    )
+    parser.add_argument(
+        "--component_jobs",
+        type=int,
+        help="number of processes to run the selection sequences of the independent groups of chains in, with the same "
+        "results as a single selection sequence, -1 uses all processors (default: a single selection sequence)",
+    )
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    if args.resume and args.checkpoint_interval is None:
+        args.checkpoint_interval = 60
+    if args.concurrent and args.checkpoint_interval is not None:
+        parser.error("checkpoints are not supported with --concurrent")
+    if args.concurrent and args.component_jobs is not None:
+        parser.error("--component_jobs is not supported with --concurrent")
+
+    if not args.output_directory:
+        args.output_directory = os.path.dirname(args.pdb_file_path)
+
+    return args
+
+
+# adds the reactive inputs, query radii, weights and options shared by the prediction command line tools,
+# value_type parses the query radii and weights
+def add_prediction_arguments(parser, value_type=float):
     parser.add_argument(
         "core_reactive_input", help="The path to the core reactive input file"
     )
     parser.add_argument(
-        "-core_QR", type=float, help="radius around each core reactive atom to perform spatial query (angstrom)"
+        "-core_QR", type=value_type, help="radius around each core reactive atom to perform spatial query (angstrom)"
     )
     parser.add_argument(
-        "-core_W", type=float, help="weight for the degree of isolation term in bond potential of core pairs (float)"
+        "-core_W", type=value_type, help="weight for the degree of isolation term in bond potential of core pairs (float)"
     )
     parser.add_argument(
         "sur_reactive_input", help="The path to the surface reactive input file"
     )
     parser.add_argument(
-        "-sur_QR", type=float, help="radius around each core reactive atom to perform spatial query (angstrom)"
+        "-sur_QR", type=value_type, help="radius around each core reactive atom to perform spatial query (angstrom)"
     )
     parser.add_argument(
-        "-sur_W", type=float, help="weight for the degree of isolation term in bond potential of surface pairs (float)"
+        "-sur_W", type=value_type, help="weight for the degree of isolation term in bond potential of surface pairs (float)"
     )
     parser.add_argument(
         "-o", "--output_directory", help="The path to the output directory"
     )
+    parser.add_argument(
+        "--single_precision",
+        action="store_true",
+        help="store the index columns of the potential pairs as int32 to reduce memory, with the same predictions",
+    )
+    parser.add_argument(
+        "--neighbor_search",
+        choices=["auto", *NEIGHBOR_SEARCH_BACKENDS],
+        default="auto",
+        help="the backend of the spatial query of reactive atoms (default: auto)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="number of threads for the spatial query, -1 uses all processors (default: 1)"
+    )
+    parser.add_argument(
+        "--periodic",
+        action="store_true",
+        help="apply periodic boundaries in the orthorhombic unit cell of the CRYST1 record, using minimum image distances",
+    )
 
-    args = parser.parse_args()
-
-    file_path_input = args.pdb_file_path
-    core_reactive_input = args.core_reactive_input
-    core_QR = args.core_QR
-    core_W = args.core_W
-    sur_reactive_input = args.sur_reactive_input
-    sur_QR = args.sur_QR
-    sur_W = args.sur_W
-
-    if args.output_directory:
-        output_dir = args.output_directory
-    else:
-        output_dir = os.path.dirname(file_path_input)
 
-    return file_path_input, core_reactive_input, core_QR, core_W, sur_reactive_input, sur_QR, sur_W, output_dir
+# adds the options of the on-disk cache of the parsed structures, neighbor pairs and results
+def add_cache_arguments(parser):
+    parser.add_argument(
+        "--cache_directory",
+        help="The path of a directory to cache the parsed structures, neighbor pairs and results in, which later runs "
+        "on the same inputs reuse instead of parsing, querying or predicting again (default: no cache)",
+    )
+    parser.add_argument(
+        "--cache_max_size",
+        type=float,
+        default=1024,
+        help="size of the cache in megabytes, above which the least recently used entries are removed (default: 1024)",
+    )
 
 
 def handle_output(file_path_input, output_directory, pdb):
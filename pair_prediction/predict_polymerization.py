@@ -2,7 +2,7 @@
 ### Modified by: Emma Stevens ###
 
 from tools.predict_bonds import PredictBonds
-from tools.constraint_validation import is_valid_core_pair
+from tools.constraint_validation import are_valid_core_pairs
 from tools.utils import calc_distance
 
 
@@ -21,39 +21,30 @@ class PredictBondsCore(PredictBonds):
     BOND_DIST_STD = 2.5
     MAX_CONNECTIVITY = 8
 
-    def __init__(self, pdb, reactive_input_file, query_radius, weight):
-        """Initializes the PredictBondsSur with a PDB object and a reactive input file.
-
-        Args:
-            pdb (PDB): The PDB object to predict bonds for.
-            reactive_input_file (str): The input file for the specific reactive atom names and residues for the structure.
-        """
-        super().__init__(pdb, reactive_input_file, query_radius, weight)
-
-    def calculate_bond_potential(self, atom1, atom2, atoms_dist):
-
-        if not is_valid_core_pair(atom1, atom2):
-            return 0
-        
-        if len(self.pdb.get_bonded_pairs_core()) > 0:
-            all_bonded_chains = []
-            # gets all the bonded chains (with duplicates) in the structure
-            for pair in self.pdb.get_bonded_pairs_core():
-                all_bonded_chains.append(pair.chain1)
-                all_bonded_chains.append(pair.chain2)
-
-            chain1_iso = all_bonded_chains.count(pair.chain1)
-            chain2_iso = all_bonded_chains.count(pair.chain2)
-            connectivity = chain1_iso + chain2_iso
-            isolatedness = self.MAX_CONNECTIVITY - connectivity
-        else:
-            isolatedness = self.MAX_CONNECTIVITY
-
-        bond_pot = self.bond_potential(
-            atoms_dist, self.IDEAL_BOND_DIST, self.BOND_DIST_STD**2, self.weight, isolatedness, self.MAX_CONNECTIVITY
+    def calculate_bond_potentials(self, pairs, pair_ids):
+        atom_i = pairs.atom_i[pair_ids]
+        atom_j = pairs.atom_j[pair_ids]
+        chain_i = pairs.chain_i[pair_ids]
+        chain_j = pairs.chain_j[pair_ids]
+
+        valid = are_valid_core_pairs(
+            self.atom_bonded, self.bonded_chain_keys, len(self.reactive_chains), atom_i, atom_j, chain_i, chain_j
         )
 
-        return bond_pot
+        connectivity = self.chain_connectivity.counts[chain_i] + self.chain_connectivity.counts[chain_j]
+        isolatedness = self.MAX_CONNECTIVITY - connectivity
+
+        bond_pots = self.bond_potentials(
+            pairs.distance[pair_ids],
+            valid,
+            self.IDEAL_BOND_DIST,
+            self.BOND_DIST_STD**2,
+            self.weight,
+            isolatedness,
+            self.MAX_CONNECTIVITY,
+            pairs.get_frequency(pair_ids),
+        )
+        return bond_pots
 
     def add_pair_pdb(self, pair):
         self.pdb.add_bonded_pair(pair)
@@ -90,7 +81,7 @@ class PredictBondsCore(PredictBonds):
             for sel_atom in atoms:
                 if sel_atom.is_paired:
                     continue
-                distance = calc_distance(cur_atom, sel_atom)
+                distance = calc_distance(cur_atom, sel_atom, self.pdb.box)
                 atom_distances.append((distance, sel_atom))
 
             atom_distances.sort(key=lambda x: x[0])
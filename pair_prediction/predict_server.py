@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures.process import BrokenProcessPool
+from tools.cache import hash_file
+from tools.pdb import PDB
+from predict_batch import record_failure
+from predict_client import DEFAULT_SOCKET
+from predict_for_single_surfactant import handle_output, predict_structure
+
+# the fields of a prediction request and their defaults, None for the required fields
+REQUEST_FIELDS = {
+    "pdb_file_path": None,
+    "core_reactive_input": None,
+    "core_QR": None,
+    "core_W": None,
+    "sur_reactive_input": None,
+    "sur_QR": None,
+    "sur_W": None,
+    "output_directory": "",
+    "single_precision": False,
+    "neighbor_search": "auto",
+    "workers": 1,
+    "periodic": False,
+}
+# the fields of a request passed on to predict_structure
+PREDICTION_OPTIONS = (
+    "core_reactive_input",
+    "core_QR",
+    "core_W",
+    "sur_reactive_input",
+    "sur_QR",
+    "sur_W",
+    "single_precision",
+    "neighbor_search",
+    "workers",
+)
+# the parsed structures of a worker process by their content hash and periodic flag, least recently used first
+structure_cache = collections.OrderedDict()
+# the options of a worker process, set once by init_server_worker
+worker_state = {}
+
+
+def controller():
+
+    args = handle_input()
+    try:
+        asyncio.run(serve(args.socket, max(args.jobs, 1), max(args.cache_size, 0)))
+    except OSError as error:
+        raise SystemExit(str(error))
+
+    return 0
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Resident server of the cross linking bond prediction, which predicts the structures requested by "
+        "predict_client.py in warm worker processes, each predicting and keeping the structures of its share of the files."
+    )
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help=f"the path of the unix socket to listen on (default: {DEFAULT_SOCKET})"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of structures predicted at once (default: number of processors)"
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=8,
+        help="number of parsed structures each worker process keeps of the files it predicts, the least recently used is "
+        "dropped first (default: 8)",
+    )
+    return parser.parse_args()
+
+
+def init_server_worker(cache_size):
+    """Sets the number of parsed structures a worker process keeps, run once by each worker process."""
+    worker_state["cache_size"] = cache_size
+
+
+def load_structure(file: str, periodic: bool, file_hash: str):
+    """Gets a copy of the parsed structure of a pdb file from the cache of the worker process, parsing it on a miss.
+
+    Args:
+        file (str): The path to the pdb file.
+        periodic (bool): Whether to apply periodic boundaries in the unit cell of the CRYST1 record.
+        file_hash (str): The hash of the contents of the file (see hash_file).
+
+    Returns:
+        Tuple[PDB, PDB, bool]: A copy of the structure without bonds to predict on, the cached structure, and whether it
+        was found in the cache.
+    """
+    key = (file_hash, periodic)
+    cached = key in structure_cache
+    if cached:
+        structure_cache.move_to_end(key)
+        pdb = structure_cache[key]
+    else:
+        pdb = PDB(file, periodic)
+        if worker_state.get("cache_size", 0) > 0:
+            structure_cache[key] = pdb
+            while len(structure_cache) > worker_state["cache_size"]:
+                structure_cache.popitem(last=False)
+    structure = pdb.copy_structure()
+    structure.file = file
+    return structure, pdb, cached
+
+
+def predict_request(request: dict, file_hash: str) -> dict:
+    """Predicts and writes the bonds of a requested structure, the task run by the server worker processes.
+
+    Args:
+        request (dict): The fields of REQUEST_FIELDS.
+        file_hash (str): The hash of the contents of the pdb file of the request.
+
+    Returns:
+        dict: The number of core pairs, surface pairs and radicals, whether the structure was cached, and the time in seconds.
+    """
+    start = time.perf_counter()
+    file = request["pdb_file_path"]
+    pdb, cached_pdb, cached = load_structure(file, request["periodic"], file_hash)
+    predict_structure(pdb, **{option: request[option] for option in PREDICTION_OPTIONS})
+    handle_output(file, request["output_directory"] or os.path.dirname(file), pdb)
+    # the reactive atoms matched on the copy are kept for the next requests of the structure
+    cached_pdb.reactive_indices.update(pdb.reactive_indices)
+    return {
+        "status": "ok",
+        "core_pairs": len(pdb.bonded_pairs_core),
+        "surface_pairs": len(pdb.bonded_pairs_surface),
+        "radicals": len(pdb.radicals),
+        "cached": cached,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def parse_request(message: bytes) -> dict:
+    """Parses a prediction request, filling in the defaults of the optional fields.
+
+    Args:
+        message (bytes): The JSON object of the request.
+
+    Returns:
+        dict: The fields of REQUEST_FIELDS.
+
+    Raises:
+        ValueError: If the request is not a JSON object or misses a required field.
+    """
+    request = json.loads(message)
+    if not isinstance(request, dict):
+        raise ValueError("A request must be a JSON object")
+    missing = [field for field, default in REQUEST_FIELDS.items() if default is None and request.get(field) is None]
+    if missing:
+        raise ValueError(f"The request is missing {', '.join(missing)}")
+    return {field: request.get(field, default) for field, default in REQUEST_FIELDS.items()}
+
+
+class PredictionServer:
+    """Serves prediction requests from a unix socket with worker processes.
+
+    Each connection sends one JSON request per line and receives one JSON response per line, in the same order. The
+    requests of different connections are predicted at once, up to the number of worker processes. The worker
+    processes live as long as the server, so the modules are imported once, and each keeps the structures it parsed
+    last (see load_structure). Every request of a file is sent to the same worker process, chosen from the hash of the
+    file contents, so a structure is parsed and kept by one worker process only and found by the next requests of it.
+
+    Attributes:
+        jobs (int): The number of worker processes.
+        cache_size (int): The number of parsed structures each worker process keeps.
+        pools (List[ProcessPoolExecutor]): The single process pool of each worker process.
+    """
+
+    def __init__(self, jobs: int, cache_size: int):
+        """Starts the worker processes.
+
+        Args:
+            jobs (int): The number of worker processes.
+            cache_size (int): The number of parsed structures each worker process keeps.
+        """
+        self.jobs = jobs
+        self.cache_size = cache_size
+        self.pools = [self.start_pool() for _ in range(jobs)]
+        concurrent.futures.wait([pool.submit(os.getpid) for pool in self.pools])
+
+    def start_pool(self):
+        """Starts the single process pool of a worker process."""
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, initializer=init_server_worker, initargs=(self.cache_size,)
+        )
+
+    async def predict(self, request: dict) -> dict:
+        """Predicts a request in the worker process of its file, replacing the worker process if it crashed.
+
+        Args:
+            request (dict): The fields of REQUEST_FIELDS.
+
+        Returns:
+            dict: The response, with the status "ok" and the results, or "failed" and the error.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            file_hash = await loop.run_in_executor(None, hash_file, request["pdb_file_path"])
+        except OSError as error:
+            response = {}
+            record_failure(response, error)
+            return response
+
+        worker = int(file_hash, 16) % self.jobs
+        pool = self.pools[worker]
+        try:
+            return await loop.run_in_executor(pool, predict_request, request, file_hash)
+        except BrokenProcessPool as error:
+            if pool is self.pools[worker]:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pools[worker] = self.start_pool()
+            response = {}
+            record_failure(response, error)
+            return response
+        except Exception as error:
+            response = {}
+            record_failure(response, error)
+            return response
+
+    async def handle_connection(self, reader, writer):
+        """Answers the requests of a connection until the client closes it."""
+        try:
+            while message := await reader.readline():
+                try:
+                    request = parse_request(message)
+                except ValueError as error:
+                    response = {}
+                    record_failure(response, error)
+                else:
+                    response = await self.predict(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        """Stops the worker processes."""
+        for pool in self.pools:
+            pool.shutdown(cancel_futures=True)
+
+
+def remove_stale_socket(socket_path: str):
+    """Removes the socket file of a server that is no longer running.
+
+    Raises:
+        OSError: If a server is listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)
+            return
+    raise OSError(f"A server is already listening on {socket_path}")
+
+
+async def serve(socket_path: str, jobs: int, cache_size: int):
+    """Serves prediction requests on a unix socket until the process is interrupted or terminated.
+
+    Args:
+        socket_path (str): The path of the unix socket.
+        jobs (int): The number of worker processes.
+        cache_size (int): The number of parsed structures each worker process keeps.
+    """
+    remove_stale_socket(socket_path)
+    prediction_server = PredictionServer(jobs, cache_size)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    try:
+        server = await asyncio.start_unix_server(prediction_server.handle_connection, socket_path)
+        print(f"Listening on {socket_path} with {jobs} worker processes", flush=True)
+        async with server:
+            await stop.wait()
+    finally:
+        prediction_server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    raise SystemExit(controller())
@@ -0,0 +1,208 @@
+import argparse
+import concurrent.futures
+import copy
+import itertools
+import os
+import time
+from tools.concurrent_prediction import RESULT_FIELDS, get_start_potentials, predict_copy
+from tools.pdb import PDB
+from predict_polymerization import PredictBondsCore
+from predict_cycloaddition import PredictBondsSur
+from predict_for_single_surfactant import add_prediction_arguments, handle_output
+
+
+def controller():
+
+    args = handle_input()
+    start = time.perf_counter()
+    pdb = PDB(args.pdb_file_path, args.periodic)
+    output_directory = args.output_directory or os.path.dirname(args.pdb_file_path)
+
+    rows = run_sweep(pdb, args, output_directory)
+    write_summary(os.path.join(output_directory, sweep_summary_filename(args.pdb_file_path)), rows)
+    print(f"Finished {len(rows)} combinations in {time.perf_counter() - start:.2f} s")
+
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Sweep of the query radii and isolation weights of the cross linking bond prediction in a micelle "
+        "structure. Each of -core_QR, -core_W, -sur_QR and -sur_W takes a comma separated list of values, and "
+        "every combination of them is predicted."
+    )
+    parser.add_argument("pdb_file_path", help="The path to the pdb input file")
+    add_prediction_arguments(parser, value_type=parse_values)
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of combinations predicted at once (default: number of processors)"
+    )
+    return parser.parse_args()
+
+
+def parse_values(text):
+    """Parses a comma separated list of floats from the command line."""
+    try:
+        return [float(value) for value in text.split(",") if value.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a comma separated list of numbers, got {text}")
+
+
+def query_neighbor_pairs(predictor_class, pdb, reactive_input_file, query_radius, neighbor_search, workers):
+    """Finds the pairs of reactive atoms of a predictor once, for the largest query radius of the sweep.
+
+    Args:
+        predictor_class (type): The PredictBonds subclass the pairs are for.
+        pdb (PDB): The parsed structure, its bonding state is not changed.
+        reactive_input_file (str): The input file of the reactive atom names and residues.
+        query_radius (float): The largest query radius of the sweep.
+        neighbor_search (str): The name of the neighbor search backend.
+        workers (int): The number of threads the neighbor search may use.
+
+    Returns:
+        tuple: The (atom_i, atom_j, distances) pairs, to be passed to predictors as neighbor_pairs.
+    """
+    predictor = predictor_class(pdb, reactive_input_file, query_radius, 0, neighbor_search=neighbor_search, workers=workers)
+    predictor.init_reactive_atoms(predictor.get_reactive_str_representation(reactive_input_file))
+    predictor.init_reactive_chains()
+    return predictor.get_neighbor_pairs()
+
+
+def merge_surface_prediction(core_pdb, surface_start, surface_pdb):
+    """Combines a core prediction with a surface prediction made on a structure with the same surface start potentials.
+
+    Args:
+        core_pdb (PDB): The structure holding the core prediction.
+        surface_start (PDB): The structure the surface prediction started from.
+        surface_pdb (PDB): The structure holding the surface prediction.
+
+    Returns:
+        PDB: A shallow copy of core_pdb whose bonded pairs and radicals are followed by those of the surface prediction.
+    """
+    merged = copy.copy(core_pdb)
+    for field in RESULT_FIELDS:
+        added = getattr(surface_pdb, field)[len(getattr(surface_start, field)) :]
+        setattr(merged, field, getattr(core_pdb, field) + added)
+    return merged
+
+
+def combination_directory(output_directory, core_QR, core_W, sur_QR, sur_W):
+    """The directory of the output files of one combination of the sweep."""
+    return os.path.join(output_directory, f"core_QR{core_QR:g}_W{core_W:g}_sur_QR{sur_QR:g}_W{sur_W:g}")
+
+
+def sweep_summary_filename(file_path_input):
+    """The name of the summary table of a sweep, following the naming of the other output files."""
+    return os.path.splitext(os.path.basename(file_path_input))[0] + "_sweep_summary.txt"
+
+
+def run_sweep(pdb, args, output_directory):
+    """Predicts every combination of the query radii and weights of the sweep and writes their output files.
+
+    The neighbors of the core and surface reactive atoms are queried once at the largest radius of each, and every
+    predictor keeps only the pairs within its own radius. Each distinct core (QR, W) is predicted once. A surface
+    prediction only depends on the core prediction before it through the potentials it starts from (see
+    get_start_potentials), so every surface (QR, W) is predicted once per distinct start potentials left by the core
+    predictions, usually once. The results are the same as predicting every combination one by one. The predictions
+    run in a pool of worker processes, each on its own copy of the structure.
+
+    Args:
+        pdb (PDB): The parsed structure without any bonds.
+        args (argparse.Namespace): The parsed command line arguments.
+        output_directory (str): The directory the combination directories are created in.
+
+    Returns:
+        List[dict]: The parameters, counts and output directory of each combination, in grid order.
+    """
+    core_pairs = query_neighbor_pairs(
+        PredictBondsCore, pdb, args.core_reactive_input, max(args.core_QR), args.neighbor_search, args.workers
+    )
+    sur_pairs = query_neighbor_pairs(
+        PredictBondsSur, pdb, args.sur_reactive_input, max(args.sur_QR), args.neighbor_search, args.workers
+    )
+    core_grid = list(itertools.product(args.core_QR, args.core_W))
+    sur_grid = list(itertools.product(args.sur_QR, args.sur_W))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        core_futures = [
+            pool.submit(
+                predict_copy,
+                PredictBondsCore,
+                pdb,
+                args.core_reactive_input,
+                core_QR,
+                core_W,
+                args.single_precision,
+                neighbor_pairs=core_pairs,
+            )
+            for core_QR, core_W in core_grid
+        ]
+        core_pdbs = [future.result() for future in core_futures]
+
+        # the first core prediction leading to each start of a surface weight is the structure its surface predictions start from
+        surface_starts = {}
+        core_starts = []
+        for core_pdb in core_pdbs:
+            starts = {}
+            for sur_W in args.sur_W:
+                start = (sur_W, get_start_potentials(
+                    PredictBondsSur, core_pdb, args.sur_reactive_input, max(args.sur_QR), sur_W, args.single_precision, sur_pairs
+                ))
+                surface_starts.setdefault(start, core_pdb)
+                starts[sur_W] = start
+            core_starts.append(starts)
+        sur_futures = {
+            (start, sur_QR): pool.submit(
+                predict_copy,
+                PredictBondsSur,
+                start_pdb,
+                args.sur_reactive_input,
+                sur_QR,
+                start[0],
+                args.single_precision,
+                neighbor_pairs=sur_pairs,
+            )
+            for start, start_pdb in surface_starts.items()
+            for sur_QR in args.sur_QR
+        }
+        sur_pdbs = {key: future.result() for key, future in sur_futures.items()}
+
+    rows = []
+    for (core_QR, core_W), core_pdb, starts in zip(core_grid, core_pdbs, core_starts):
+        for sur_QR, sur_W in sur_grid:
+            start = starts[sur_W]
+            merged = merge_surface_prediction(core_pdb, surface_starts[start], sur_pdbs[(start, sur_QR)])
+            combination_output = combination_directory(output_directory, core_QR, core_W, sur_QR, sur_W)
+            os.makedirs(combination_output, exist_ok=True)
+            handle_output(merged.file, combination_output, merged)
+            rows.append(
+                {
+                    "core_QR": core_QR,
+                    "core_W": core_W,
+                    "sur_QR": sur_QR,
+                    "sur_W": sur_W,
+                    "core_pairs": len(merged.bonded_pairs_core),
+                    "surface_pairs": len(merged.bonded_pairs_surface),
+                    "radicals": len(merged.radicals),
+                    "output_directory": combination_output,
+                }
+            )
+    return rows
+
+
+def write_summary(file, rows):
+    """Writes the counts of every combination of the sweep as a tab separated table.
+
+    Args:
+        file (str): The path of the summary table.
+        rows (List[dict]): The parameters, counts and output directory of each combination.
+    """
+    columns = ["core_QR", "core_W", "sur_QR", "sur_W", "core_pairs", "surface_pairs", "radicals", "output_directory"]
+    with open(file, "w") as f:
+        f.write("\t".join(columns) + "\n")
+        for row in rows:
+            f.write("\t".join(f"{row[column]:g}" if isinstance(row[column], float) else str(row[column]) for column in columns) + "\n")
+
+
+if __name__ == "__main__":
+    controller()
@@ -0,0 +1,231 @@
+import argparse
+import concurrent.futures
+import os
+import time
+from tools.trajectory import ContactCounter, Trajectory
+from predict_polymerization import PredictBondsCore
+from predict_cycloaddition import PredictBondsSur
+from predict_for_single_surfactant import add_prediction_arguments, handle_output, predict_structure
+
+# the topology and options of a worker process, set once by init_worker
+worker_state = {}
+
+
+def controller():
+
+    args = handle_input()
+    start = time.perf_counter()
+    trajectory = Trajectory(args.pdb_file_path, args.periodic)
+    output_directory = args.output_directory or os.path.dirname(args.pdb_file_path)
+
+    if args.mode == "frames":
+        rows = predict_frames(trajectory, args, output_directory)
+        write_frame_summary(os.path.join(output_directory, frame_summary_filename(args.pdb_file_path)), rows)
+        num_frames = len(rows)
+    else:
+        num_frames = predict_contacts(trajectory, args)
+        handle_output(args.pdb_file_path, output_directory, trajectory.topology)
+    print(f"Finished {num_frames} frames in {time.perf_counter() - start:.2f} s")
+
+    return 1
+
+
+# creates the parser object and handles the input from the user (via command line inputs)
+def handle_input():
+    parser = argparse.ArgumentParser(
+        description="Prediction of cross linking bonds for the frames of a micelle trajectory, a pdb file with one "
+        "MODEL/ENDMDL block per frame."
+    )
+    parser.add_argument("pdb_file_path", help="The path to the pdb trajectory file")
+    add_prediction_arguments(parser)
+    parser.add_argument(
+        "--mode",
+        choices=["frames", "contacts"],
+        default="frames",
+        help="frames predicts the bonds of every frame, contacts predicts the bonds of the first frame weighting the "
+        "bond potential of each pair by the fraction of the frames it is within the query radius (default: frames)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of frames predicted at once in frames mode (default: number of processors)"
+    )
+    return parser.parse_args()
+
+
+def prediction_options(args):
+    """The keyword arguments of predict_structure other than the structure, from the parsed command line arguments."""
+    return {
+        key: getattr(args, key)
+        for key in (
+            "core_reactive_input",
+            "core_QR",
+            "core_W",
+            "sur_reactive_input",
+            "sur_QR",
+            "sur_W",
+            "single_precision",
+            "neighbor_search",
+            "workers",
+        )
+    }
+
+
+def frame_directory(output_directory, frame):
+    """The directory of the output files of one frame of the trajectory."""
+    return os.path.join(output_directory, f"frame_{frame}")
+
+
+def frame_summary_filename(file_path_input):
+    """The name of the summary table of the frames, following the naming of the other output files."""
+    return os.path.splitext(os.path.basename(file_path_input))[0] + "_frame_summary.txt"
+
+
+def init_worker(trajectory, options):
+    """Keeps the trajectory and the prediction options of a worker process, run once by each worker process.
+
+    Args:
+        trajectory (Trajectory): The trajectory holding the parsed topology.
+        options (dict): The keyword arguments of predict_structure other than the structure.
+    """
+    worker_state.update(trajectory=trajectory, options=options)
+
+
+def predict_frame(coords, output_directory):
+    """Predicts and writes the bonds of one frame, the task run by the worker processes.
+
+    Args:
+        coords (np.ndarray): The coordinates of the frame.
+        output_directory (str): The directory to write the output files of the frame to.
+
+    Returns:
+        dict: The number of core pairs, surface pairs and radicals.
+    """
+    trajectory = worker_state["trajectory"]
+    pdb = predict_structure(trajectory.get_frame_structure(coords), **worker_state["options"])
+    os.makedirs(output_directory, exist_ok=True)
+    handle_output(trajectory.file, output_directory, pdb)
+    return {
+        "core_pairs": len(pdb.bonded_pairs_core),
+        "surface_pairs": len(pdb.bonded_pairs_surface),
+        "radicals": len(pdb.radicals),
+    }
+
+
+def predict_frames(trajectory, args, output_directory):
+    """Predicts the bonds of every frame of the trajectory across a pool of worker processes.
+
+    The frames are read in this process while the workers predict the previous ones, with at most one frame waiting
+    per worker, so only a few frames are in memory at once. The workers receive the topology once and the
+    coordinates of each frame.
+
+    Args:
+        trajectory (Trajectory): The trajectory.
+        args (argparse.Namespace): The parsed command line arguments.
+        output_directory (str): The directory the frame directories are created in.
+
+    Returns:
+        List[dict]: The frame, counts and output directory of each frame, in frame order.
+    """
+    jobs = max(args.jobs, 1)
+    rows = []
+    pending = {}
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker, initargs=(trajectory, prediction_options(args))
+    ) as pool:
+
+        def collect(return_when):
+            done, _ = concurrent.futures.wait(pending, return_when=return_when)
+            for future in done:
+                row = pending.pop(future)
+                row.update(future.result())
+                print(
+                    f"Frame {row['frame']}: {row['core_pairs']} core pairs, {row['surface_pairs']} surface pairs, "
+                    f"{row['radicals']} radicals"
+                )
+
+        for frame, coords in enumerate(trajectory.frames()):
+            if len(pending) >= 2 * jobs:
+                collect(concurrent.futures.FIRST_COMPLETED)
+            row = {"frame": frame, "output_directory": frame_directory(output_directory, frame)}
+            rows.append(row)
+            pending[pool.submit(predict_frame, coords, row["output_directory"])] = row
+        collect(concurrent.futures.ALL_COMPLETED)
+    return rows
+
+
+def init_reactive_predictor(predictor_class, pdb, reactive_input_file, query_radius, weight, args):
+    """Creates a predictor for a structure and initializes its reactive atoms and chains."""
+    predictor = predictor_class(
+        pdb,
+        reactive_input_file,
+        query_radius,
+        weight,
+        single_precision=args.single_precision,
+        neighbor_search=args.neighbor_search,
+        workers=args.workers,
+    )
+    predictor.init_reactive_atoms(predictor.get_reactive_str_representation(reactive_input_file))
+    predictor.init_reactive_chains()
+    return predictor
+
+
+def predict_contacts(trajectory, args):
+    """Predicts the bonds of the first frame of the trajectory from the contact frequencies of the reactive atoms.
+
+    The pairs of reactive atoms within the query radius are counted in every frame. The pairs in contact in any frame
+    are the candidate pairs, with their mean distance over the frames they are in contact, and their bond potential
+    is weighted by the fraction of the frames they are in contact. The bonds are stored in the topology of the
+    trajectory.
+
+    Args:
+        trajectory (Trajectory): The trajectory.
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        int: The number of frames.
+    """
+    pdb = trajectory.topology
+    core_contacts = ContactCounter(
+        init_reactive_predictor(PredictBondsCore, pdb, args.core_reactive_input, args.core_QR, args.core_W, args),
+        args.neighbor_search,
+        args.workers,
+    )
+    sur_contacts = ContactCounter(
+        init_reactive_predictor(PredictBondsSur, pdb, args.sur_reactive_input, args.sur_QR, args.sur_W, args),
+        args.neighbor_search,
+        args.workers,
+    )
+    for coords in trajectory.frames():
+        core_contacts.add_frame(coords)
+        sur_contacts.add_frame(coords)
+
+    for predictor_class, reactive_input, query_radius, weight, contacts in (
+        (PredictBondsCore, args.core_reactive_input, args.core_QR, args.core_W, core_contacts),
+        (PredictBondsSur, args.sur_reactive_input, args.sur_QR, args.sur_W, sur_contacts),
+    ):
+        predictor_class(
+            pdb,
+            reactive_input,
+            query_radius,
+            weight,
+            single_precision=args.single_precision,
+            neighbor_pairs=contacts.get_neighbor_pairs(),
+        ).predict_bonding()
+    return core_contacts.num_frames
+
+
+def write_frame_summary(file, rows):
+    """Writes the counts of every frame as a tab separated table.
+
+    Args:
+        file (str): The path of the summary table.
+        rows (List[dict]): The frame, counts and output directory of each frame.
+    """
+    columns = ["frame", "core_pairs", "surface_pairs", "radicals", "output_directory"]
+    with open(file, "w") as f:
+        f.write("\t".join(columns) + "\n")
+        for row in rows:
+            f.write("\t".join(str(row[column]) for column in columns) + "\n")
+
+
+if __name__ == "__main__":
+    controller()
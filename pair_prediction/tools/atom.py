@@ -22,6 +22,26 @@ class Atom:
         is_paired (bool): A boolean value indicating whether the atom is part of a radical pair. Defaults to False.
     """
 
+    # fixed attribute slots instead of a per-instance __dict__, as an Atom is created for every atom of the structure
+    __slots__ = (
+        "recordName",
+        "serial",
+        "name",
+        "res_name",
+        "chain",
+        "res_seq",
+        "i_code",
+        "x",
+        "y",
+        "z",
+        "occupancy",
+        "tempFactor",
+        "element",
+        "charge",
+        "is_bonded_external",
+        "is_paired",
+    )
+
     def __init__(
         self,
         serial,
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from tools.pair import Pair
+from tools.pdb import PDB
+
+# the version of the layout of the cache entries, part of every key so that another layout never reads an entry
+CACHE_VERSION = 1
+# the layers of the cache, each a directory of entries named by their key
+CACHE_LAYERS = ("structures", "neighbors", "results")
+# the per-atom columns of a parsed structure, stored by the structure layer and hashed into the result keys
+STRUCTURE_COLUMNS = (
+    "serials",
+    "names",
+    "res_names",
+    "res_types",
+    "res_seqs",
+    "i_codes",
+    "coords",
+    "occupancies",
+    "temp_factors",
+    "elements",
+    "charges",
+)
+# the default size of the cache entries, above which the least recently used are removed
+DEFAULT_MAX_BYTES = 1 << 30
+# the age in seconds after which an entry left unfinished by a crashed process is removed
+STALE_ENTRY_SECONDS = 3600
+
+
+def hash_file(file: str) -> str:
+    """Hashes the contents of a file, so that a cached structure is only reused while its file is unchanged.
+
+    Args:
+        file (str): The path to the file.
+
+    Returns:
+        str: The sha256 digest of the contents of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Hashes the parts of a cache key, together with the cache version.
+
+    Args:
+        *parts: Strings, numbers, bytes, numpy arrays or None.
+
+    Returns:
+        str: The sha256 digest of the parts.
+    """
+    digest = hashlib.sha256(f"lnkd-cache-{CACHE_VERSION}".encode())
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            # the dtype and shape keep arrays with the same bytes apart
+            digest.update(f"|{part.dtype.str}{part.shape}|".encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, bytes):
+            digest.update(f"|bytes{len(part)}|".encode() + part)
+        else:
+            digest.update(f"|{part!r}|".encode())
+    return digest.hexdigest()
+
+
+def get_reactive_input_bytes(reactive_input) -> bytes:
+    """Gets the contents of a reactive input file, or the JSON of a reactive atom dictionary, to hash into a result key.
+
+    Args:
+        reactive_input (str | dict[str, list[str]]): The reactive input file, or its dictionary of atom names by residue name.
+
+    Returns:
+        bytes: The contents of the file or the JSON of the dictionary.
+    """
+    if isinstance(reactive_input, dict):
+        return json.dumps(reactive_input).encode()
+    with open(reactive_input, "rb") as f:
+        return f.read()
+
+
+def get_neighbor_key(
+    coords: np.ndarray, atom_chains: np.ndarray, radius: float, box: np.ndarray = None, groups=None, group_pairs=None
+) -> str:
+    """Gets the key of the neighbor pairs of reactive atoms, from the inputs of the query and the filtering.
+
+    The backends find the same pairs in the same order, so the backend and the number of threads are not part of the key.
+
+    Args:
+        coords (np.ndarray): The coordinates of the reactive atoms.
+        atom_chains (np.ndarray): The index of the chain of each reactive atom.
+        radius (float): The query radius.
+        box (np.ndarray): The edge lengths of the periodic box, or None.
+        groups (np.ndarray): The group of each reactive atom, or None for a single group.
+        group_pairs (List[Tuple[int, int]]): The pairs of groups whose atoms can pair, or None for a single group.
+
+    Returns:
+        str: The key of the neighbor pairs.
+    """
+    group_pairs = None if group_pairs is None else [tuple(int(group) for group in pair) for pair in group_pairs]
+    return make_key("neighbors", coords, atom_chains, float(radius), box, groups, group_pairs)
+
+
+def get_result_key(
+    pdb, core_reactive_input, core_QR, core_W, sur_reactive_input, sur_QR, sur_W, single_precision=False
+) -> str:
+    """Gets the key of the results of a prediction, from the columns of the structure, the reactive inputs and the parameters.
+
+    The neighbor search backend, the threads, the concurrent mode and the component jobs do not change the results, so
+    they are not part of the key.
+
+    Args:
+        pdb (PDB): The structure, without any bonds.
+        core_reactive_input (str | dict[str, list[str]]): The core reactive input file, or its dictionary.
+        core_QR (float): The query radius of the core pairs.
+        core_W (float): The weight for the degree of isolation of the core pairs.
+        sur_reactive_input (str | dict[str, list[str]]): The surface reactive input file, or its dictionary.
+        sur_QR (float): The query radius of the surface pairs.
+        sur_W (float): The weight for the degree of isolation of the surface pairs.
+        single_precision (bool): Whether the index columns of the potential pairs are stored as int32, defaults to False.
+
+    Returns:
+        str: The key of the results.
+    """
+    return make_key(
+        "results",
+        *(getattr(pdb, column) for column in STRUCTURE_COLUMNS),
+        pdb.unit_cell,
+        pdb.box,
+        get_reactive_input_bytes(core_reactive_input),
+        float(core_QR),
+        float(core_W),
+        get_reactive_input_bytes(sur_reactive_input),
+        float(sur_QR),
+        float(sur_W),
+        bool(single_precision),
+    )
+
+
+def get_result_arrays(pdb) -> dict[str, np.ndarray]:
+    """Gets the bonded pairs and radicals of a predicted structure as arrays of atom indices, to be stored in the result layer.
+
+    Args:
+        pdb (PDB): The structure holding the predicted core bonds, then surface bonds, and radicals.
+
+    Returns:
+        dict[str, np.ndarray]: The atom indices, distances and potentials of the core and surface pairs in selection
+        order, and the atom indices of the radicals.
+    """
+    atom_indices = {id(atom): atom_idx for atom_idx, atom in pdb.atom_objects.items()}
+    arrays = {}
+    for prefix, pairs in (("core", pdb.bonded_pairs_core), ("surface", pdb.bonded_pairs_surface)):
+        arrays[f"{prefix}_atoms"] = np.array(
+            [(atom_indices[id(pair.atom1)], atom_indices[id(pair.atom2)]) for pair in pairs], dtype=np.int64
+        ).reshape(-1, 2)
+        arrays[f"{prefix}_distances"] = np.array([pair.distance for pair in pairs], dtype=np.float64)
+        arrays[f"{prefix}_potentials"] = np.array([pair.probability for pair in pairs], dtype=np.float64)
+    arrays["radicals"] = np.array([atom_indices[id(atom)] for atom in pdb.radicals], dtype=np.int64)
+    return arrays
+
+
+def restore_results(pdb, arrays: dict[str, np.ndarray]):
+    """Adds the bonded pairs and radicals of the result layer to a structure without bonds.
+
+    Only the bonded pairs and radicals are restored, which is all the output files and PredictionResult use, not the
+    bonding state of the atoms and chains.
+
+    Args:
+        pdb (PDB): The structure, without any bonds.
+        arrays (dict[str, np.ndarray]): The arrays of get_result_arrays.
+    """
+    for prefix, target in (("core", pdb.bonded_pairs_core), ("surface", pdb.bonded_pairs_surface)):
+        for (atom_i, atom_j), distance, potential in zip(
+            arrays[f"{prefix}_atoms"].tolist(),
+            arrays[f"{prefix}_distances"].tolist(),
+            arrays[f"{prefix}_potentials"].tolist(),
+        ):
+            pair = Pair(pdb.get_atom(atom_i), pdb.get_atom(atom_j), distance)
+            pair.set_probability(potential)
+            pdb.add_bonded_pair(pair)
+            target.append(pair)
+    for atom_idx in arrays["radicals"].tolist():
+        pdb.add_radical(pdb.get_atom(atom_idx))
+
+
+class PredictionCache:
+    """An on-disk cache of parsed structures, neighbor pairs and prediction results, addressed by content hashes.
+
+    The cache has three layers: the columns of parsed structures keyed by the hash of their pdb file (skipping
+    PDB.parse), the neighbor pairs of reactive atoms keyed by their coordinates, chains, query radius and periodic box
+    (skipping the radius query), and the bonded pairs and radicals of whole predictions keyed by the structure, the
+    reactive inputs and the parameters (skipping the prediction).
+
+    Each entry is a directory of uncompressed .npy files, which are memory-mapped copy-on-write when loaded, so a hit
+    only reads the pages that are used and never changes the entry. An entry is written to a temporary directory and
+    renamed into place, and evicted by renaming it away before it is removed, so a reader sees a whole entry or none
+    and does not need the lock. The writers and the eviction of all processes sharing the cache are serialized by a
+    lock file. The modification time of an entry is its last use, and once the entries exceed max_bytes the least
+    recently used are removed.
+
+    Attributes:
+        directory (str): The directory of the cache.
+        max_bytes (int): The size of the entries above which the least recently used are removed.
+        hits (dict[str, int]): The number of entries found in each layer by this process.
+        misses (dict[str, int]): The number of entries not found in each layer by this process.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Opens the cache in a directory, creating it if it does not exist.
+
+        Args:
+            directory (str): The directory of the cache.
+            max_bytes (int): The size of the entries above which the least recently used are removed, defaults to DEFAULT_MAX_BYTES.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = dict.fromkeys(CACHE_LAYERS, 0)
+        self.misses = dict.fromkeys(CACHE_LAYERS, 0)
+        for layer in CACHE_LAYERS:
+            os.makedirs(os.path.join(directory, layer), exist_ok=True)
+
+    def lock(self):
+        """The lock file serializing the writers and the eviction of all processes sharing the cache."""
+        # filelock is only imported once an entry is written
+        from filelock import FileLock
+
+        return FileLock(os.path.join(self.directory, "cache.lock"))
+
+    def load(self, layer: str, key: str):
+        """Loads an entry, marking it as the most recently used.
+
+        Args:
+            layer (str): The layer in CACHE_LAYERS.
+            key (str): The key of the entry.
+
+        Returns:
+            dict[str, np.ndarray]: The memory-mapped arrays of the entry by name, or None if the cache has no such entry.
+        """
+        path = os.path.join(self.directory, layer, key)
+        try:
+            arrays = {
+                os.path.splitext(name)[0]: np.load(os.path.join(path, name), mmap_mode="c")
+                for name in os.listdir(path)
+            }
+            os.utime(path)
+        except FileNotFoundError:
+            # never written, or evicted while it was read
+            self.misses[layer] += 1
+            return None
+        self.hits[layer] += 1
+        return arrays
+
+    def store(self, layer: str, key: str, arrays: dict):
+        """Stores an entry, then removes the least recently used entries while the cache exceeds its size.
+
+        Args:
+            layer (str): The layer in CACHE_LAYERS.
+            key (str): The key of the entry.
+            arrays (dict[str, np.ndarray]): The arrays of the entry by name, the None values are left out.
+        """
+        layer_directory = os.path.join(self.directory, layer)
+        path = os.path.join(layer_directory, key)
+        temporary_path = tempfile.mkdtemp(prefix=".", dir=layer_directory)
+        try:
+            for name, array in arrays.items():
+                if array is not None:
+                    np.save(os.path.join(temporary_path, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+            with self.lock():
+                if not os.path.exists(path):
+                    os.rename(temporary_path, path)
+                # an entry stored by another process in the meantime has the same contents
+                os.utime(path)
+                self.evict()
+        finally:
+            if os.path.exists(temporary_path):
+                shutil.rmtree(temporary_path, ignore_errors=True)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is within max_bytes, with the lock held.
+
+        The temporary directories of entries older than STALE_ENTRY_SECONDS, left by crashed processes, are removed too.
+        """
+        entries = []
+        now = time.time()
+        for layer in CACHE_LAYERS:
+            layer_directory = os.path.join(self.directory, layer)
+            for name in os.listdir(layer_directory):
+                path = os.path.join(layer_directory, name)
+                try:
+                    last_use = os.stat(path).st_mtime
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                except FileNotFoundError:
+                    continue
+                if name.startswith("."):
+                    if now - last_use > STALE_ENTRY_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                entries.append((last_use, size, path))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            evicted_path = os.path.join(os.path.dirname(path), f".evicted-{os.path.basename(path)}")
+            os.rename(path, evicted_path)
+            shutil.rmtree(evicted_path, ignore_errors=True)
+            total -= size
+
+    def load_structure(self, file: str, periodic: bool = False, metrics=None):
+        """Gets the structure of a pdb file from the structure layer, parsing and storing it on a miss.
+
+        Args:
+            file (str): The path to the pdb file.
+            periodic (bool): Whether to apply periodic boundaries in the unit cell of the CRYST1 record, defaults to False.
+            metrics (Metrics): The metrics to record the parse time, the number of atoms and residues and a cache hit in, defaults to None to not record them.
+
+        Returns:
+            PDB: The structure.
+        """
+        key = make_key("structure", hash_file(file))
+        columns = self.load("structures", key)
+        if columns is not None:
+            if metrics is not None:
+                metrics.count("cache_hits")
+            return PDB(file, periodic, metrics, columns)
+
+        pdb = PDB(file, periodic, metrics)
+        self.store(
+            "structures",
+            key,
+            {**{column: getattr(pdb, column) for column in STRUCTURE_COLUMNS}, "unit_cell": pdb.unit_cell},
+        )
+        return pdb
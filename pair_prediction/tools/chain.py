@@ -1,5 +1,8 @@
 ### Author: Bradford Derby ###
 
+import numpy as np
+
+
 class Chain:
     """Represents a chain/molecule in a PDB file or structure.
 
@@ -10,6 +13,8 @@ class Chain:
         chain_type (str): The type of the chain.
     """
 
+    __slots__ = ("chain_id", "atoms", "bonded_chains", "chain_type")
+
     def __init__(self, chain_id, chain_type):
         """Initializes a Chain object.
 
@@ -44,3 +49,33 @@ class Chain:
             chain (Chain): The chain to be added to the list of bonded chains.
         """
         self.bonded_chains.append(chain)
+
+
+class ChainConnectivity:
+    """Counts the bonds formed by each chain of a numbered list of chains.
+
+    The counts can be read and written per Chain like a Counter, and are backed by a numpy array so they can be read for many chain indices at once.
+
+    Attributes:
+        chain_index (dict[int, int]): A dictionary where the key is the chain_id of a chain and the value is its index in the counts array.
+        counts (np.ndarray): The number of bonds formed by each chain.
+    """
+
+    def __init__(self, chain_index):
+        """Initializes a ChainConnectivity with no bonds formed.
+
+        Args:
+            chain_index (dict[int, int]): A dictionary where the key is the chain_id of a chain and the value is its index in the counts array.
+        """
+        self.chain_index = chain_index
+        self.counts = np.zeros(len(chain_index), dtype=np.int64)
+
+    def __getitem__(self, chain):
+        """Gets the number of bonds formed by a chain, chains that are not numbered have formed none."""
+        if chain.chain_id not in self.chain_index:
+            return 0
+        return int(self.counts[self.chain_index[chain.chain_id]])
+
+    def __setitem__(self, chain, count):
+        """Sets the number of bonds formed by a numbered chain."""
+        self.counts[self.chain_index[chain.chain_id]] = count
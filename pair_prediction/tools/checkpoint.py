@@ -0,0 +1,122 @@
+import hashlib
+import os
+import time
+import numpy as np
+
+# the version of the layout of the checkpoint files
+CHECKPOINT_VERSION = 1
+
+
+class SelectionCheckpoint:
+    """Periodically saves the state of the bond selection sequence of a predictor, so that an interrupted prediction can be resumed.
+
+    A checkpoint is an uncompressed npz file of numpy arrays holding the indices of the selected pairs in selection
+    order, a bit mask of the pairs still queued, the current bond potential of every pair, the bond counts of the
+    chains, a bit mask of the bonded atoms and the keys of the bonded chain pairs. The file is written next to the
+    checkpoint and then renamed over it, so a crash while saving leaves the previous checkpoint intact.
+
+    Resuming replays the selected pairs through the same methods as the selection sequence, which restores the state
+    of the atoms, chains and structure, and then restores the potentials and the queue. The pairs selected after
+    resuming are therefore the same as in an uninterrupted prediction. A fingerprint of the initial potential pairs
+    guards against resuming with another structure, reactive input, query radius or weight.
+
+    Attributes:
+        file (str): The path of the checkpoint file.
+        interval (float): The minimum number of seconds between two checkpoints.
+        resume (bool): Whether to resume from the checkpoint file if it exists.
+        fingerprint (str): The sha256 digest of the initial potential pairs of the predictor, set by start.
+        last_save (float): The time.monotonic() of the last checkpoint, or of the start of the selection sequence.
+    """
+
+    def __init__(self, file: str, interval: float = 60, resume: bool = False):
+        """Initializes a SelectionCheckpoint.
+
+        Args:
+            file (str): The path of the checkpoint file.
+            interval (float): The minimum number of seconds between two checkpoints, defaults to 60.
+            resume (bool): Whether to resume from the checkpoint file if it exists, defaults to False.
+        """
+        self.file = file
+        self.interval = interval
+        self.resume = resume
+        self.fingerprint = None
+        self.last_save = time.monotonic()
+
+    def start(self, predictor):
+        """Fingerprints the initial potential pairs of a predictor and, when resuming, restores the saved selections.
+
+        Args:
+            predictor (PredictBonds): The predictor, with its potential pairs and queue initialized and no pair selected.
+
+        Raises:
+            ValueError: If the checkpoint file is not a checkpoint of the same prediction.
+        """
+        store = predictor.potential_pairs
+        digest = hashlib.sha256(type(predictor).__name__.encode())
+        for column in (store.atom_i, store.atom_j, store.distance, store.potential):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        self.fingerprint = digest.hexdigest()
+        if self.resume and os.path.exists(self.file):
+            self.restore(predictor)
+        self.last_save = time.monotonic()
+
+    def due(self) -> bool:
+        """Whether the interval since the last checkpoint has passed."""
+        return time.monotonic() - self.last_save >= self.interval
+
+    def save(self, predictor):
+        """Saves the state of the selection sequence of a predictor.
+
+        Args:
+            predictor (PredictBonds): The predictor in its selection sequence.
+        """
+        temporary_file = f"{self.file}.tmp"
+        with open(temporary_file, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(CHECKPOINT_VERSION),
+                fingerprint=np.array(self.fingerprint),
+                selected=np.array(predictor.selected_pair_ids, dtype=np.int64),
+                queued=np.packbits(predictor.probability_heap.queued),
+                potential=predictor.potential_pairs.potential,
+                connectivity=predictor.chain_connectivity.counts,
+                atom_bonded=np.packbits(predictor.atom_bonded),
+                bonded_chain_keys=predictor.bonded_chain_keys,
+            )
+        os.replace(temporary_file, self.file)
+        self.last_save = time.monotonic()
+
+    def restore(self, predictor):
+        """Replays the selections saved in the checkpoint file and restores the potentials and the queue of a predictor.
+
+        Args:
+            predictor (PredictBonds): The predictor, with its potential pairs and queue initialized and no pair selected.
+
+        Raises:
+            ValueError: If the checkpoint file is not a checkpoint of the same prediction.
+        """
+        with np.load(self.file) as checkpoint:
+            state = {name: checkpoint[name] for name in checkpoint.files}
+        if int(state["version"]) != CHECKPOINT_VERSION or str(state["fingerprint"]) != self.fingerprint:
+            raise ValueError(
+                f"The checkpoint {self.file} was saved by another prediction, of another structure, reactive input, "
+                "query radius or weight"
+            )
+
+        selected = state["selected"].tolist()
+        for root_idx in selected:
+            predictor.add_pair_pdb(predictor.bond_selected_pair(root_idx))
+        # the queue is rebuilt over the saved potentials, it selects the same pairs as the queue it replaces
+        predictor.potential_pairs.potential[:] = state["potential"]
+        predictor.rebuild_prob_heap()
+
+        num_pairs = len(predictor.potential_pairs)
+        if not (
+            np.array_equal(np.unpackbits(state["queued"], count=num_pairs).astype(bool), predictor.probability_heap.queued)
+            and np.array_equal(state["connectivity"], predictor.chain_connectivity.counts)
+            and np.array_equal(
+                np.unpackbits(state["atom_bonded"], count=len(predictor.atom_bonded)).astype(bool), predictor.atom_bonded
+            )
+            and np.array_equal(state["bonded_chain_keys"], predictor.bonded_chain_keys)
+        ):
+            raise ValueError(f"Replaying the selections of the checkpoint {self.file} did not restore its state")
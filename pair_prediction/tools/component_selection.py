@@ -0,0 +1,145 @@
+import concurrent.futures
+import copy
+import heapq
+import os
+import numpy as np
+
+# the predictor and potential pairs of a worker process, set once by init_component_worker
+worker_state = {}
+
+
+def find_components(pairs, pair_ids: np.ndarray, num_chains: int) -> list[np.ndarray]:
+    """Splits potential pairs into the connected components of the graph of the chains they link.
+
+    Selecting a pair only changes the bond potentials of the pairs sharing one of its chains, so the selection sequences
+    of two components do not affect each other.
+
+    Args:
+        pairs (PairStore): The store of the potential pairs.
+        pair_ids (np.ndarray): The indices of the pairs to split.
+        num_chains (int): The number of chains in the reactive chain list.
+
+    Returns:
+        List[np.ndarray]: The sorted pair indices of each component, largest component first.
+    """
+    # scipy.sparse is only imported once the components are used
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    if len(pair_ids) == 0:
+        return []
+    chain_i = pairs.chain_i[pair_ids]
+    chain_j = pairs.chain_j[pair_ids]
+    graph = coo_matrix((np.ones(len(pair_ids), dtype=np.int8), (chain_i, chain_j)), shape=(num_chains, num_chains))
+    _, chain_labels = connected_components(graph, directed=False)
+    pair_labels = chain_labels[chain_i]
+    # the stable sort keeps the pairs of each component in index order
+    order = np.argsort(pair_labels, kind="stable")
+    components = np.split(pair_ids[order], np.flatnonzero(np.diff(pair_labels[order])) + 1)
+    components.sort(key=len, reverse=True)
+    return components
+
+
+def init_component_worker(predictor):
+    """Keeps the copy of a predictor that the selection sequences of the components are run on, run once by each worker process.
+
+    Args:
+        predictor (PredictBonds): The predictor with its potential pairs initialized.
+    """
+    worker_state.update(predictor=predictor, pairs=predictor.potential_pairs)
+
+
+def select_component(pair_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Runs the selection sequence of the worker's predictor on the pairs of one component, the task of the worker processes.
+
+    The components are disjoint in their atoms and chains, so the bonds of the components run earlier on the same
+    predictor leave the bond potentials of this component unchanged.
+
+    Args:
+        pair_ids (np.ndarray): The sorted indices of the pairs of the component.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The indices of the selected pairs in selection order, and the bond potential of
+        every pair of the component at the end of its sequence, which for the selected pairs is their potential when
+        they were selected.
+    """
+    predictor = worker_state["predictor"]
+    predictor.potential_pairs = worker_state["pairs"].take(pair_ids)
+    predictor.potential_pairs.index_chains(len(predictor.reactive_chains))
+    predictor.probability_heap = predictor.init_prob_heap()
+    predictor.selected_pair_ids = []
+    predictor.bond_selection_loop()
+    return pair_ids[np.array(predictor.selected_pair_ids, dtype=np.int64)], predictor.potential_pairs.potential
+
+
+def merge_selections(sequences, potential: np.ndarray):
+    """Merges the selection sequences of the components into the order of the selection sequence of all pairs.
+
+    Each step of the selection sequence of all pairs selects the pair with the highest potential and then the lower
+    index, which is the next pair of one of the components, so the merge takes the next pair of the component whose
+    next pair has the highest (potential, -index).
+
+    Args:
+        sequences (Iterable[np.ndarray]): The indices of the selected pairs of each component, in selection order.
+        potential (np.ndarray): The bond potential of every pair when it was selected.
+
+    Yields:
+        int: The index of the next selected pair.
+    """
+    keyed = (zip((-potential[sequence].astype(np.float64)).tolist(), sequence.tolist()) for sequence in sequences)
+    for _, pair_idx in heapq.merge(*keyed):
+        yield pair_idx
+
+
+def select_components(predictor, jobs: int):
+    """Runs the selection sequences of the connected components of the queued pairs of a predictor in worker processes.
+
+    The workers run bond_selection_loop on a copy of the predictor for one component at a time. The selected pairs are
+    then bonded in the predictor in the order of the selection sequence of all pairs (see merge_selections), so the
+    results are the same as those of bond_selection_loop.
+
+    Args:
+        predictor (PredictBonds): The predictor, with its potential pairs and queue initialized.
+        jobs (int): The number of worker processes, -1 uses all processors.
+
+    Returns:
+        int: The number of components whose pairs could be selected.
+    """
+    pairs = predictor.potential_pairs
+    queued = np.flatnonzero(predictor.probability_heap.queued)
+    components = [
+        pair_ids
+        for pair_ids in find_components(pairs, queued, len(predictor.reactive_chains))
+        if pairs.potential[pair_ids].max() > predictor.MIN_BOND_POTENTIAL
+    ]
+    if not components:
+        return 0
+
+    # the workers neither record metrics nor write the pairs and checkpoints of the predictor
+    worker_predictor = copy.copy(predictor)
+    worker_predictor.metrics = None
+    worker_predictor.pair_output_file = None
+    worker_predictor.pair_stream = None
+    worker_predictor.checkpoint = None
+    worker_predictor.probability_heap = None
+    max_workers = min((os.cpu_count() or 1) if jobs == -1 else jobs, len(components))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, initializer=init_component_worker, initargs=(worker_predictor,)
+    ) as pool:
+        results = list(
+            pool.map(select_component, components, chunksize=max(1, len(components) // (4 * max_workers)))
+        )
+
+    sequences = []
+    for pair_ids, (selected, potential) in zip(components, results):
+        pairs.potential[pair_ids] = potential
+        sequences.append(selected)
+    for pair_idx in merge_selections(sequences, pairs.potential):
+        predictor.add_pair_pdb(predictor.bond_selected_pair(pair_idx))
+        if predictor.metrics is not None:
+            predictor.metrics.count("selected_pairs")
+        predictor.stream_pairs()
+
+    # the queue is rebuilt over the final potentials, as after the selection sequence of all pairs
+    predictor.rebuild_prob_heap()
+    return len(components)
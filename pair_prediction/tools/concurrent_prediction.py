@@ -0,0 +1,195 @@
+import concurrent.futures
+import pickle
+from tools.pair import Pair
+
+# the fields of a PDB object holding the results of the predictions, in the order they are filled
+RESULT_FIELDS = ("bonded_pairs", "bonded_pairs_core", "bonded_pairs_surface", "radicals")
+
+
+def predict_copy(
+    predictor_class,
+    pdb,
+    reactive_input_file,
+    query_radius,
+    weight,
+    single_precision=False,
+    neighbor_search="auto",
+    workers=1,
+    neighbor_pairs=None,
+    start_potentials=False,
+):
+    """Predicts the bonds of one predictor on a structure, the task run by worker processes on their copy of the structure.
+
+    Args:
+        predictor_class (type): The PredictBonds subclass to predict with.
+        pdb (PDB): The structure.
+        reactive_input_file (str): The input file of the reactive atom names and residues.
+        query_radius (float): The query radius of the predictor.
+        weight (float): The weight for the degree of isolation of the predictor.
+        single_precision (bool): Whether to store the index columns of the potential pairs as int32, defaults to False.
+        neighbor_search (str): The name of the neighbor search backend, defaults to "auto".
+        workers (int): The number of threads the neighbor search may use, defaults to 1.
+        neighbor_pairs (tuple): The pairs of reactive atoms of an earlier query, defaults to None to query them.
+        start_potentials (bool): Whether to also return the start potentials of the structure (see get_start_potentials)
+            and the neighbor pairs they were calculated from, defaults to False.
+
+    Returns:
+        PDB: The structure holding the predicted bonds, followed by the start potentials and the neighbor pairs if
+        start_potentials is set.
+    """
+    predictor = predictor_class(
+        pdb,
+        reactive_input_file,
+        query_radius,
+        weight,
+        single_precision=single_precision,
+        neighbor_search=neighbor_search,
+        workers=workers,
+        neighbor_pairs=neighbor_pairs,
+    )
+    if not start_potentials:
+        predictor.predict_bonding()
+        return pdb
+
+    start, predictor.neighbor_pairs = get_predictor_start(predictor)
+    predictor.predict_bonding()
+    return pdb, start, predictor.neighbor_pairs
+
+
+def get_predictor_start(predictor):
+    """Gets the start potentials of a predictor that has not predicted yet (see get_start_potentials).
+
+    Args:
+        predictor (PredictBonds): The predictor.
+
+    Returns:
+        Tuple[bytes, tuple]: The start potentials, and the neighbor pairs they were calculated from.
+    """
+    predictor.init_reactive_atoms(predictor.get_reactive_str_representation(predictor.reactive_input_file))
+    predictor.init_reactive_chains()
+    neighbor_pairs = predictor.get_neighbor_pairs()
+    pairs = predictor.initialize_potential_pairs(*neighbor_pairs)
+    return pairs.atom_i.tobytes() + pairs.atom_j.tobytes() + pairs.potential.tobytes(), neighbor_pairs
+
+
+def get_start_potentials(
+    predictor_class,
+    pdb,
+    reactive_input_file,
+    query_radius,
+    weight,
+    single_precision=False,
+    neighbor_pairs=None,
+    neighbor_search="auto",
+    workers=1,
+):
+    """Gets the pairs and bond potentials a predictor would start its selection sequence from, without changing the structure.
+
+    The bond potential of a pair never increases during the selection sequence and the pairs without a positive
+    potential are dropped, so a predictor makes the same predictions on two structures with the same start potentials.
+
+    Args:
+        predictor_class (type): The PredictBonds subclass.
+        pdb (PDB): The structure.
+        reactive_input_file (str): The input file of the reactive atom names and residues.
+        query_radius (float): The query radius of the predictor.
+        weight (float): The weight for the degree of isolation of the predictor.
+        single_precision (bool): Whether to store the index columns of the potential pairs as int32, defaults to False.
+        neighbor_pairs (tuple): The pairs of reactive atoms of an earlier query, defaults to None to query them.
+        neighbor_search (str): The name of the neighbor search backend, defaults to "auto".
+        workers (int): The number of threads the neighbor search may use, defaults to 1.
+
+    Returns:
+        bytes: The reactive atom indices and the bond potentials of the pairs with a positive potential.
+    """
+    predictor = predictor_class(
+        pdb,
+        reactive_input_file,
+        query_radius,
+        weight,
+        single_precision=single_precision,
+        neighbor_search=neighbor_search,
+        workers=workers,
+        neighbor_pairs=neighbor_pairs,
+    )
+    return get_predictor_start(predictor)[0]
+
+
+def apply_prediction(pdb, start, result):
+    """Applies the predictions made on a copy of a structure to the structure itself.
+
+    The bonded pairs and radicals the predictions added to the copy are appended to the structure, referring to the
+    structure's own Atom objects, and the bonding state of its atoms and chains is updated to match.
+
+    Args:
+        pdb (PDB): The structure to apply the predictions to.
+        start (PDB): A copy of the structure before the predictions.
+        result (PDB): The copy of the structure holding the predictions.
+    """
+    atom_indices = {id(atom): atom_idx for atom_idx, atom in result.atom_objects.items()}
+
+    def get_atom(atom):
+        return pdb.get_atom(atom_indices[id(atom)])
+
+    # bonded_pairs and the core/surface lists share their Pair objects
+    pairs = {}
+    for field in RESULT_FIELDS:
+        target = getattr(pdb, field)
+        for item in getattr(result, field)[len(getattr(start, field)) :]:
+            if field == "radicals":
+                target.append(get_atom(item))
+                continue
+            if id(item) not in pairs:
+                pair = Pair(get_atom(item.atom1), get_atom(item.atom2), item.distance)
+                pair.set_probability(item.probability)
+                pairs[id(item)] = pair
+            target.append(pairs[id(item)])
+
+    for atom_idx, atom in result.atom_objects.items():
+        if atom.is_bonded_external or atom.is_paired:
+            target = pdb.get_atom(atom_idx)
+            target.is_bonded_external |= atom.is_bonded_external
+            target.is_paired |= atom.is_paired
+    for chain_id, chain in result.chains.items():
+        start_chain = start.chains.get(chain_id)
+        num_start_bonds = len(start_chain.bonded_chains) if start_chain is not None else 0
+        for bonded_chain in chain.bonded_chains[num_start_bonds:]:
+            pdb.get_chain(chain_id).add_bonded_chain(pdb.get_chain(bonded_chain.chain_id))
+
+
+def predict_concurrently(pdb, first_class, first_options, second_class, second_options):
+    """Predicts the bonds of two predictors at once in two worker processes, with the same results as predicting in sequence.
+
+    Both predictors start from their own copy of the structure. The second predictor only depends on the first through
+    the potentials it starts from (see get_start_potentials), so its prediction is kept when the bonds of the first
+    predictor leave them unchanged, and otherwise made again on the result of the first. The bonds do not move any
+    atom, so the neighbor pairs of the second predictor are reused for the start potentials on the result of the first
+    and for the prediction made again. The results are then applied to the structure in sequence order.
+
+    Args:
+        pdb (PDB): The structure.
+        first_class (type): The PredictBonds subclass that predicts first in sequence.
+        first_options (dict): The keyword arguments of predict_copy for the first predictor.
+        second_class (type): The PredictBonds subclass that predicts second in sequence.
+        second_options (dict): The keyword arguments of predict_copy for the second predictor.
+
+    Returns:
+        PDB: The structure holding the bonds of both predictors.
+    """
+    start = pickle.loads(pickle.dumps(pdb))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        first_future = pool.submit(predict_copy, first_class, pdb, **first_options)
+        second_future = pool.submit(predict_copy, second_class, pdb, **second_options, start_potentials=True)
+        first_result = first_future.result()
+        second_result, second_start_potentials, neighbor_pairs = second_future.result()
+
+    second_options = {**second_options, "neighbor_pairs": neighbor_pairs}
+    if get_start_potentials(second_class, first_result, **second_options) == second_start_potentials:
+        second_start = start
+    else:
+        second_start = first_result
+        second_result = predict_copy(second_class, pickle.loads(pickle.dumps(first_result)), **second_options)
+
+    apply_prediction(pdb, start, first_result)
+    apply_prediction(pdb, second_start, second_result)
+    return pdb
@@ -1,97 +1,115 @@
 ###  Author: Bradford Derby   ###
 ### Modified by: Emma Stevens ###
 
-def are_atoms_bonded(atom1, atom2):
-    """Checks if either of the given atoms are bonded.
+import numpy as np
+
+
+def get_chain_pair_keys(chain_i, chain_j, num_chains):
+    """Encodes unordered pairs of chain indices as single integers.
 
     Args:
-        atom1 (Atom): The first atom to be checked.
-        atom2 (Atom): The second atom to be checked.
+        chain_i (np.ndarray): The chain indices of the first atoms.
+        chain_j (np.ndarray): The chain indices of the second atoms.
+        num_chains (int): The number of numbered chains.
 
     Returns:
-        bool: True if either atom is bonded, False otherwise.
+        np.ndarray: The key of each chain pair, equal for (a, b) and (b, a).
     """
-    return atom1.is_bonded_external or atom2.is_bonded_external
+    chain_i = np.asarray(chain_i, dtype=np.int64)
+    chain_j = np.asarray(chain_j, dtype=np.int64)
+    return np.minimum(chain_i, chain_j) * num_chains + np.maximum(chain_i, chain_j)
 
 
-def are_chains_bonded(chain1, chain2):
-    """Checks if the first chain is in the list of chains bonded to the second chain.
+def are_atom_indices_bonded(atom_bonded, atom_i, atom_j):
+    """Checks for each pair if either of its atoms is bonded.
 
     Args:
-        chain1 (Chain): The chain to be checked.
-        chain2 (Chain): The chain whose bonded chains will be checked.
+        atom_bonded (np.ndarray): A boolean mask of the bonded reactive atoms.
+        atom_i (np.ndarray): The indices of the first atoms.
+        atom_j (np.ndarray): The indices of the second atoms.
 
     Returns:
-        bool: True if the first chain is in the list of chains bonded to the second chain, False otherwise.
+        np.ndarray: True where either atom is bonded, False otherwise.
     """
-    return chain1 in chain2.bonded_chains
+    return atom_bonded[atom_i] | atom_bonded[atom_j]
 
 
-def are_chains_same_type(chain1, chain2):
-    """Checks if the two chains are of the same type.
+def are_chain_indices_bonded(bonded_chain_keys, chain_i, chain_j, num_chains):
+    """Checks for each pair if its chains are bonded to each other.
 
     Args:
-        chain1 (Chain): The first chain to be checked.
-        chain2 (Chain): The second chain to be checked.
+        bonded_chain_keys (np.ndarray): The sorted keys of the bonded chain pairs, see get_chain_pair_keys.
+        chain_i (np.ndarray): The chain indices of the first atoms.
+        chain_j (np.ndarray): The chain indices of the second atoms.
+        num_chains (int): The number of numbered chains.
 
     Returns:
-        bool: True if the chains are of the same type, False otherwise.
+        np.ndarray: True where the chains are bonded to each other, False otherwise.
     """
-    return chain1.chain_type == chain2.chain_type
+    keys = get_chain_pair_keys(chain_i, chain_j, num_chains)
+    if len(bonded_chain_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.minimum(np.searchsorted(bonded_chain_keys, keys), len(bonded_chain_keys) - 1)
+    return bonded_chain_keys[positions] == keys
 
 
-def are_atoms_same_chain(atom1, atom2):
-    """Checks if the two atoms are part of the same chain.
+def are_chain_indices_same_type(chain_types, chain_i, chain_j):
+    """Checks for each pair if its chains are of the same type.
 
     Args:
-        atom1 (Atom): The first atom to be checked.
-        atom2 (Atom): The second atom to be checked.
+        chain_types (np.ndarray): An integer code of the type of each chain.
+        chain_i (np.ndarray): The chain indices of the first atoms.
+        chain_j (np.ndarray): The chain indices of the second atoms.
 
     Returns:
-        bool: True if the atoms are part of the same chain, False otherwise.
+        np.ndarray: True where the chains are of the same type, False otherwise.
     """
-    return atom1.chain == atom2.chain
+    return chain_types[chain_i] == chain_types[chain_j]
+
 
+def are_valid_LN2_surface_pairs(atom_bonded, bonded_chain_keys, chain_types, atom_i, atom_j, chain_i, chain_j):
+    """Checks for each pair if it is a valid surface pair.
 
-def is_valid_surface_pair(atom1, atom2):
-    """Checks if the given atoms form a valid surface pair.
+    A surface pair is valid when neither atom is bonded yet, the chains are of different types and the chains
+    have not bonded to each other, so that two alkynes of one surfactant do not bond to two azides of the same linker.
 
     Args:
-        atom1 (Atom): The first atom to be validated.
-        atom2 (Atom): The second atom to be validated.
+        atom_bonded (np.ndarray): A boolean mask of the bonded reactive atoms.
+        bonded_chain_keys (np.ndarray): The sorted keys of the bonded chain pairs, see get_chain_pair_keys.
+        chain_types (np.ndarray): An integer code of the type of each chain.
+        atom_i (np.ndarray): The indices of the first atoms.
+        atom_j (np.ndarray): The indices of the second atoms.
+        chain_i (np.ndarray): The chain indices of the first atoms.
+        chain_j (np.ndarray): The chain indices of the second atoms.
 
     Returns:
-        bool: False if the atoms are already bonded or are in the same chain. True otherwise.
+        np.ndarray: False where the atoms are already bonded or the chains are of the same type or already bonded. True otherwise.
     """
-    return (not are_atoms_bonded(atom1, atom2)) and (
-        not are_chains_same_type(atom1.chain, atom2.chain)
+    return ~(
+        are_atom_indices_bonded(atom_bonded, atom_i, atom_j)
+        | are_chain_indices_same_type(chain_types, chain_i, chain_j)
+        | are_chain_indices_bonded(bonded_chain_keys, chain_i, chain_j, len(chain_types))
     )
 
-def is_valid_LN2_surface_pair(atom1, atom2):
-    """Similar to is_valid_surface_pair but also checks to see if the chains have already formed a bond to avoid 2 alkynes on 1 surfactant bound to 2 azides on the same linker
-    
-    Args:
-        atom1 (Atom): The first atom to be validated.
-        atom2 (Atom): The second atom to be validated.
 
-    Returns:
-        bool: False if the atoms are already bonded or are in the same chain or if the chains are already bonded. True otherwise.
-    """
-    return (not are_atoms_bonded(atom1, atom2)) and (
-        not are_chains_same_type(atom1.chain, atom2.chain)) and (
-        not are_chains_bonded(atom1.chain, atom2.chain)
-     )
+def are_valid_core_pairs(atom_bonded, bonded_chain_keys, num_chains, atom_i, atom_j, chain_i, chain_j):
+    """Checks for each pair if it is a valid core pair.
 
-def is_valid_core_pair(atom1, atom2):
-    """Checks if the given atoms form a valid core pair.
+    A core pair is valid when neither atom is bonded yet and the chains have not bonded to each other.
 
     Args:
-        atom1 (Atom): The first atom to be validated.
-        atom2 (Atom): The second atom to be validated.
+        atom_bonded (np.ndarray): A boolean mask of the bonded reactive atoms.
+        bonded_chain_keys (np.ndarray): The sorted keys of the bonded chain pairs, see get_chain_pair_keys.
+        num_chains (int): The number of numbered chains.
+        atom_i (np.ndarray): The indices of the first atoms.
+        atom_j (np.ndarray): The indices of the second atoms.
+        chain_i (np.ndarray): The chain indices of the first atoms.
+        chain_j (np.ndarray): The chain indices of the second atoms.
 
     Returns:
-        bool: False if the atoms are bonded or if the chains that the atoms are a part of have already bonded. True otherwise.
+        np.ndarray: False where the atoms are bonded or the chains have already bonded. True otherwise.
     """
-    return (not are_atoms_bonded(atom1, atom2)) and (
-        not are_chains_bonded(atom1.chain, atom2.chain)
+    return ~(
+        are_atom_indices_bonded(atom_bonded, atom_i, atom_j)
+        | are_chain_indices_bonded(bonded_chain_keys, chain_i, chain_j, num_chains)
     )
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+import json
+import time
+
+
+class Metrics:
+    """Records the wall time of the stages and the counters of a prediction, to find where the time of a run goes.
+
+    The structure and each predictor record into their own Metrics, created with child, so the metrics of the core and
+    surface predictions are kept apart. A callback attached to the root is called by every child for each recorded
+    value, e.g. to log the progress of a long run. Code recording metrics keeps None instead of a Metrics when the
+    instrumentation is disabled, so a disabled run only pays for the checks of that None.
+
+    Attributes:
+        name (str): The dotted path of the metrics from the root, "" for the root.
+        stages (Dict[str, float]): The wall time of each stage in seconds, summed over the times it ran.
+        counters (Dict[str, int]): The value of each counter.
+        observations (Dict[str, Dict[str, float]]): The count, total, min and max of the values of each observed quantity.
+        children (Dict[str, Metrics]): The metrics of the parts of the run, by name.
+        callback (Callable[[str, str, str, float], None]): The function called with the name of the metrics, the kind of the value ("stage", "counter" or "observation"), its name and the value, or None.
+    """
+
+    def __init__(self, callback=None, name: str = ""):
+        """Initializes empty metrics.
+
+        Args:
+            callback (Callable[[str, str, str, float], None]): The function called for each recorded value, defaults to None.
+            name (str): The dotted path of the metrics from the root, defaults to "" for the root.
+        """
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+        self.observations = {}
+        self.children = {}
+        self.callback = callback
+
+    def child(self, name: str):
+        """Gets the metrics of a part of the run, creating them on first use.
+
+        Args:
+            name (str): The name of the part, e.g. "core".
+
+        Returns:
+            Metrics: The metrics of the part, sharing the callback of these metrics.
+        """
+        if name not in self.children:
+            self.children[name] = Metrics(self.callback, f"{self.name}.{name}" if self.name else name)
+        return self.children[name]
+
+    @contextmanager
+    def stage(self, name: str):
+        """Adds the wall time of the enclosed block to a stage.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            if self.callback is not None:
+                self.callback(self.name, "stage", name, elapsed)
+
+    def count(self, name: str, value: int = 1):
+        """Adds to a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The amount added, defaults to 1.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback(self.name, "counter", name, value)
+
+    def observe(self, name: str, value: float):
+        """Records a value of a quantity that varies over the run, keeping only its count, total, min and max.
+
+        Args:
+            name (str): The name of the quantity, e.g. the number of pairs recalculated per selection step.
+            value (float): The value.
+        """
+        summary = self.observations.get(name)
+        if summary is None:
+            self.observations[name] = {"count": 1, "total": value, "min": value, "max": value}
+        else:
+            summary["count"] += 1
+            summary["total"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+        if self.callback is not None:
+            self.callback(self.name, "observation", name, value)
+
+    def to_dict(self) -> dict:
+        """The metrics and those of their children as nested dictionaries, with the mean of each observed quantity."""
+        return {
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+            "observations": {
+                name: {**summary, "mean": summary["total"] / summary["count"]}
+                for name, summary in self.observations.items()
+            },
+            **{name: child.to_dict() for name, child in self.children.items()},
+        }
+
+    def write_json(self, file: str):
+        """Writes the metrics as a json file.
+
+        Args:
+            file (str): The path of the json file.
+        """
+        with open(file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
@@ -0,0 +1,454 @@
+from abc import ABC, abstractmethod
+import os
+import numpy as np
+
+# the tree backends import scipy and scikit-learn once they are used, which takes longer than most small queries
+
+# below this number of atoms a single threaded query is faster than starting threads
+SMALL_SYSTEM_ATOMS = 5000
+# up to this expected number of pairs the numpy cell list is at most about 50 ms slower than the cKDTree, a fraction of
+# the import of scipy.spatial it saves (about 0.35 s), above it the cKDTree is faster by more than the import
+CELL_LIST_MAX_PAIRS = 500000
+# above this expected number of neighbors per atom, building the per-atom neighbor lists of the threaded query costs more than it saves
+MAX_THREADED_NEIGHBORS = 256
+# the number of atoms whose candidate pairs the cell list gathers at once, bounding its temporary memory
+CELL_CHUNK_SIZE = 65536
+
+
+def pair_distances(coords: np.ndarray, atom_i: np.ndarray, atom_j: np.ndarray, box: np.ndarray = None) -> np.ndarray:
+    """Calculates the Euclidean distance of many pairs of atoms, with the same rounding for every backend.
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms.
+        atom_i (np.ndarray): The index of the first atom of each pair.
+        atom_j (np.ndarray): The index of the second atom of each pair.
+        box (np.ndarray): The edge lengths of an orthorhombic periodic box to take the minimum image distance in, defaults to None for no periodic boundaries.
+
+    Returns:
+        np.ndarray: The distance of each pair.
+    """
+    diff = coords[atom_i] - coords[atom_j]
+    if box is not None:
+        diff -= box * np.round(diff / box)
+    return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+
+def wrap_coords(coords: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """Wraps coordinates into the periodic box [0, box) along each axis.
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms.
+        box (np.ndarray): The edge lengths of the orthorhombic periodic box.
+
+    Returns:
+        np.ndarray: The wrapped coordinates.
+    """
+    wrapped = np.mod(coords, box)
+    # the modulo of a tiny negative coordinate rounds to the box length itself
+    return np.where(wrapped >= box, 0.0, wrapped)
+
+
+def sort_pairs(
+    coords: np.ndarray, atom_i: np.ndarray, atom_j: np.ndarray, box: np.ndarray = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Orders the atoms of each pair so that atom_i < atom_j and sorts the pairs by (atom_i, atom_j).
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms.
+        atom_i (np.ndarray): The index of the first atom of each pair.
+        atom_j (np.ndarray): The index of the second atom of each pair.
+        box (np.ndarray): The edge lengths of the periodic box, defaults to None for no periodic boundaries.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower atom indices, the higher atom indices and the distances of the pairs.
+    """
+    # a single integer key per pair sorts much faster than a lexsort of both columns
+    num_atoms = max(len(coords), 1)
+    keys = np.minimum(atom_i, atom_j).astype(np.int64) * num_atoms + np.maximum(atom_i, atom_j)
+    keys.sort()
+    atom_i, atom_j = np.divmod(keys, num_atoms)
+    return atom_i, atom_j, pair_distances(coords, atom_i, atom_j, box)
+
+
+def flatten_neighbor_lists(nn_indices) -> tuple[np.ndarray, np.ndarray]:
+    """Flattens the neighbor list of every query atom from a radius query into (query atom, neighbor) index pairs.
+
+    Args:
+        nn_indices (Sequence[np.ndarray]): The indices of the neighbors of each query atom.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The query atom index and the neighbor index of each pair.
+    """
+    counts = np.fromiter(map(len, nn_indices), dtype=np.int64, count=len(nn_indices))
+    query_indices = np.repeat(np.arange(len(nn_indices)), counts)
+    if len(nn_indices) == 0:
+        return query_indices, np.empty(0, dtype=np.int64)
+    return query_indices, np.concatenate(nn_indices).astype(np.int64, copy=False)
+
+
+def neighbor_lists_to_pairs(
+    coords: np.ndarray, nn_indices, box: np.ndarray = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Converts the neighbor list of every atom from a radius query into sorted unique pairs.
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms.
+        nn_indices (Sequence[np.ndarray]): The indices of the neighbors of each atom, including the atom itself.
+        box (np.ndarray): The edge lengths of the periodic box, defaults to None for no periodic boundaries.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower atom indices, the higher atom indices and the distances of the pairs.
+    """
+    query_indices, nn_indices = flatten_neighbor_lists(nn_indices)
+    keep = query_indices < nn_indices
+    return sort_pairs(coords, query_indices[keep], nn_indices[keep], box)
+
+
+class NeighborSearch(ABC):
+    """Functions as a super class for the backends finding all pairs of atoms within a query radius.
+
+    Every backend returns the same pairs in the same order: each unordered pair once as (i, j) with i < j, sorted by
+    (i, j), with the distance calculated by pair_distances. The backends can therefore be swapped without changing the
+    predicted bonds. With a periodic box, the backends that support it find the pairs within the query radius in the
+    minimum image convention. The backends built on a tree also split find_pairs into build_tree and query_tree, so
+    that the two steps can be timed apart.
+
+    When only the atoms of certain groups can pair, such as the alkynes of the surfactants with the azides of the
+    linkers, query_pairs takes the group of each atom and the pairs of groups that can pair. Each pair of different
+    groups is then found by find_cross_pairs, which queries the atoms of one group against a search structure of the
+    atoms of the other, so the pairs within a group are never generated.
+
+    Attributes:
+        workers (int): The number of threads a backend may use, -1 uses all processors.
+        box (np.ndarray): The edge lengths of the orthorhombic periodic box, or None for no periodic boundaries.
+    """
+
+    name = None
+    supports_periodic = False
+
+    def __init__(self, workers: int = 1, box: np.ndarray = None):
+        """Initializes a NeighborSearch.
+
+        Args:
+            workers (int): The number of threads a backend may use, -1 uses all processors. Defaults to 1.
+            box (np.ndarray): The edge lengths of the orthorhombic periodic box, defaults to None for no periodic boundaries.
+
+        Raises:
+            ValueError: If a periodic box is given to a backend that does not support periodic boundaries.
+        """
+        if box is not None and not self.supports_periodic:
+            raise ValueError(f"The {self.name} neighbor search does not support periodic boundaries")
+        self.workers = workers
+        self.box = None if box is None else np.asarray(box, dtype=np.float64)
+
+    def query_pairs(
+        self, coords: np.ndarray, radius: float, groups: np.ndarray = None, group_pairs=None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds all pairs of atoms within the query radius of each other, optionally only those of groups that can pair.
+
+        Args:
+            coords (np.ndarray): The coordinates of the atoms.
+            radius (float): The query radius.
+            groups (np.ndarray): The group of each atom, defaults to None for a single group in which every pair is found.
+            group_pairs (Iterable[Tuple[int, int]]): Each unordered pair of groups whose atoms can pair once, including
+                (a, a) for the pairs within group a. Only used with groups.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower atom indices, the higher atom indices and the distances
+            of the pairs, the same as those of the query without groups whose atoms are in a pair of groups.
+
+        Raises:
+            ValueError: If the query radius is not below half of the shortest edge of the periodic box.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        if self.box is not None and radius >= self.box.min() / 2:
+            # beyond half of the box an atom can be within the radius of more than one image of another atom
+            raise ValueError(
+                f"The query radius {radius} must be below half of the shortest edge of the periodic box {self.box.tolist()}"
+            )
+        if len(coords) < 2 or radius <= 0:
+            empty = np.empty(0, dtype=np.int64)
+            return sort_pairs(coords, empty, empty, self.box)
+        if groups is None:
+            return self.find_pairs(coords, radius)
+
+        pairs_i = [np.empty(0, dtype=np.int64)]
+        pairs_j = [np.empty(0, dtype=np.int64)]
+        for group, other_group in group_pairs:
+            atoms = np.flatnonzero(groups == group)
+            if group == other_group:
+                if len(atoms) >= 2:
+                    atom_i, atom_j, _ = self.find_pairs(coords[atoms], radius)
+                    pairs_i.append(atoms[atom_i])
+                    pairs_j.append(atoms[atom_j])
+                continue
+            other_atoms = np.flatnonzero(groups == other_group)
+            if len(atoms) > 0 and len(other_atoms) > 0:
+                atom_i, atom_j = self.find_cross_pairs(coords[atoms], coords[other_atoms], radius)
+                pairs_i.append(atoms[atom_i])
+                pairs_j.append(other_atoms[atom_j])
+        return sort_pairs(coords, np.concatenate(pairs_i), np.concatenate(pairs_j), self.box)
+
+    @abstractmethod
+    def find_pairs(
+        self, coords: np.ndarray, radius: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds all pairs of atoms within the query radius of each other, for at least two atoms and a positive radius.
+
+        Args:
+            coords (np.ndarray): The (n, 3) float64 coordinates of the atoms.
+            radius (float): The query radius.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower atom indices, the higher atom indices and the distances of the pairs.
+        """
+        pass
+
+    @abstractmethod
+    def find_cross_pairs(
+        self, coords: np.ndarray, other_coords: np.ndarray, radius: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Finds all pairs of an atom of one set and an atom of another within the query radius, for non-empty sets and a positive radius.
+
+        Args:
+            coords (np.ndarray): The (n, 3) float64 coordinates of the atoms of the first set.
+            other_coords (np.ndarray): The (m, 3) float64 coordinates of the atoms of the second set.
+            radius (float): The query radius.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The index in the first set and the index in the second set of the atoms of each pair, in any order.
+        """
+        pass
+
+
+class SklearnNeighborSearch(NeighborSearch):
+    """Finds the pairs with a radius query on a scikit-learn KDTree. This backend is single threaded."""
+
+    name = "sklearn"
+
+    def build_tree(self, coords):
+        from sklearn.neighbors import KDTree
+
+        return KDTree(coords, leaf_size=30)
+
+    def query_tree(self, tree, coords, radius):
+        return neighbor_lists_to_pairs(coords, tree.query_radius(coords, r=radius))
+
+    def find_pairs(self, coords, radius):
+        return self.query_tree(self.build_tree(coords), coords, radius)
+
+    def find_cross_pairs(self, coords, other_coords, radius):
+        return flatten_neighbor_lists(self.build_tree(other_coords).query_radius(coords, r=radius))
+
+
+class CKDTreeNeighborSearch(NeighborSearch):
+    """Finds the pairs with a scipy cKDTree.
+
+    A single worker uses query_pairs, which emits each pair once. Multiple workers run a parallel query_ball_point
+    instead and drop the mirrored pairs. The pairs of two sets are found by a sparse_distance_matrix between the trees
+    of the two sets with a single worker, and by a parallel query_ball_point of the atoms of the first set against the
+    tree of the second with multiple workers. Periodic boundaries use the boxsize of the tree on the wrapped coordinates.
+    """
+
+    name = "ckdtree"
+    supports_periodic = True
+
+    def build_tree(self, coords):
+        from scipy.spatial import cKDTree
+
+        if self.box is not None:
+            return cKDTree(wrap_coords(coords, self.box), boxsize=self.box)
+        return cKDTree(coords)
+
+    def query_tree(self, tree, coords, radius):
+        if self.workers == 1:
+            pairs = tree.query_pairs(radius, output_type="ndarray")
+            return sort_pairs(coords, pairs[:, 0], pairs[:, 1], self.box)
+        # the tree holds the wrapped coordinates of a periodic box
+        indices = tree.query_ball_point(tree.data, radius, workers=self.workers, return_sorted=False)
+        return neighbor_lists_to_pairs(coords, indices, self.box)
+
+    def find_pairs(self, coords, radius):
+        return self.query_tree(self.build_tree(coords), coords, radius)
+
+    def find_cross_pairs(self, coords, other_coords, radius):
+        other_tree = self.build_tree(other_coords)
+        if self.workers == 1:
+            pairs = self.build_tree(coords).sparse_distance_matrix(other_tree, radius, output_type="ndarray")
+            return pairs["i"].astype(np.int64), pairs["j"].astype(np.int64)
+        if self.box is not None:
+            coords = wrap_coords(coords, self.box)
+        indices = other_tree.query_ball_point(coords, radius, workers=self.workers, return_sorted=False)
+        return flatten_neighbor_lists(indices)
+
+
+class CellListNeighborSearch(NeighborSearch):
+    """Finds the pairs by binning the atoms into a uniform grid of cubic cells with the query radius as edge length.
+
+    Only the atoms of the same and the 26 adjacent cells are compared, which is O(n) for the near uniform densities of
+    micelle cores. The pairs of two sets bin both sets into the same grid and compare the atoms of the first set with
+    the atoms of the second in their 27 cells. This backend is single threaded.
+    """
+
+    name = "cell_list"
+
+    def find_pairs(self, coords, radius):
+        strides, (cell_keys,) = self.bin_atoms(radius, coords)
+        # the atoms are processed in cell order so that the atoms of a cell are contiguous
+        order = np.argsort(cell_keys, kind="stable")
+        sorted_coords = coords[order]
+        # half of the neighbor cells, so that every pair of different cells is compared once
+        offset_keys = self.get_offset_keys(strides)[13:]
+        query, candidates = self.compare_cells(
+            sorted_coords, cell_keys[order], sorted_coords, cell_keys[order], offset_keys, radius, same_atoms=True
+        )
+        return sort_pairs(coords, order[query], order[candidates])
+
+    def find_cross_pairs(self, coords, other_coords, radius):
+        strides, (cell_keys, other_cell_keys) = self.bin_atoms(radius, coords, other_coords)
+        order = np.argsort(other_cell_keys, kind="stable")
+        query, candidates = self.compare_cells(
+            coords,
+            cell_keys,
+            other_coords[order],
+            other_cell_keys[order],
+            self.get_offset_keys(strides),
+            radius,
+            same_atoms=False,
+        )
+        return query, order[candidates]
+
+    def bin_atoms(self, radius, *coord_sets):
+        """Bins one or more sets of atoms into the same grid of cells.
+
+        Args:
+            radius (float): The edge length of the cells.
+            *coord_sets (np.ndarray): The coordinates of the atoms of each set.
+
+        Returns:
+            Tuple[np.ndarray, List[np.ndarray]]: The strides of the cell keys along each axis, and the cell key of each
+            atom of each set.
+        """
+        origin = np.min([coords.min(axis=0) for coords in coord_sets], axis=0)
+        # a margin of one empty cell on every side lets every neighbor cell key be computed without bound checks
+        cell_sets = [np.floor((coords - origin) / radius).astype(np.int64) + 1 for coords in coord_sets]
+        shape = np.max([cells.max(axis=0) for cells in cell_sets], axis=0) + 2
+        strides = np.array([shape[1] * shape[2], shape[2], 1], dtype=np.int64)
+        return strides, [cells @ strides for cells in cell_sets]
+
+    def get_offset_keys(self, strides):
+        """The key offsets of a cell and its 26 adjacent cells, sorted so that the last 14 are the cell and half of the others."""
+        offsets = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing="ij"), axis=-1).reshape(-1, 3)
+        return offsets[np.lexsort(offsets.T[::-1])] @ strides
+
+    def compare_cells(self, coords, cell_keys, sorted_coords, sorted_keys, offset_keys, radius, same_atoms):
+        """Compares query atoms with the atoms in their cell and the cells at the given offsets.
+
+        Args:
+            coords (np.ndarray): The coordinates of the query atoms.
+            cell_keys (np.ndarray): The cell key of each query atom.
+            sorted_coords (np.ndarray): The coordinates of the candidate atoms in cell order.
+            sorted_keys (np.ndarray): The sorted cell key of each candidate atom.
+            offset_keys (np.ndarray): The key offsets of the cells compared with the cell of each query atom.
+            radius (float): The query radius.
+            same_atoms (bool): Whether the query and candidate atoms are the same atoms in cell order, in which case
+                each pair of atoms in the same cell is compared once.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The index of the query atom and the cell order position of the candidate
+            atom of each pair within the radius.
+        """
+        x, y, z = (np.ascontiguousarray(column) for column in coords.T)
+        other_x, other_y, other_z = (np.ascontiguousarray(column) for column in sorted_coords.T)
+        pairs_i = [np.empty(0, dtype=np.int64)]
+        pairs_j = [np.empty(0, dtype=np.int64)]
+        radius_sq = radius * radius
+        for chunk_start in range(0, len(coords), CELL_CHUNK_SIZE):
+            atoms = np.arange(chunk_start, min(chunk_start + CELL_CHUNK_SIZE, len(coords)))
+            for offset_key in offset_keys:
+                neighbor_keys = cell_keys[atoms] + offset_key
+                starts = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+                counts = np.searchsorted(sorted_keys, neighbor_keys, side="right") - starts
+                query = np.repeat(atoms, counts)
+                # the candidates of each query atom are the contiguous positions of its neighbor cell
+                candidates = np.arange(len(query)) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+                if same_atoms and offset_key == 0:
+                    keep = query < candidates
+                    query, candidates = query[keep], candidates[keep]
+                dist_sq = (x[query] - other_x[candidates]) ** 2
+                dist_sq += (y[query] - other_y[candidates]) ** 2
+                dist_sq += (z[query] - other_z[candidates]) ** 2
+                keep = dist_sq <= radius_sq
+                pairs_i.append(query[keep])
+                pairs_j.append(candidates[keep])
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+NEIGHBOR_SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (SklearnNeighborSearch, CKDTreeNeighborSearch, CellListNeighborSearch)
+}
+
+
+def estimate_pairs(coords: np.ndarray, radius: float) -> float:
+    """Estimates the number of pairs of atoms within a radius from the number of atoms in each cube of that edge length.
+
+    The atoms of a cube are taken to be spread evenly within it, which unlike the density of the bounding box holds
+    for clustered systems such as micelles.
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms.
+        radius (float): The query radius.
+
+    Returns:
+        float: The expected number of pairs.
+    """
+    if len(coords) == 0 or radius <= 0:
+        return 0.0
+    cells = np.floor((coords - coords.min(axis=0)) / radius).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    _, counts = np.unique((cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2], return_counts=True)
+    return 2 / 3 * np.pi * float(np.dot(counts, counts))
+
+
+def select_neighbor_search(
+    coords: np.ndarray, radius: float, backend: str = "auto", workers: int = 1, box: np.ndarray = None
+) -> NeighborSearch:
+    """Creates the neighbor search backend for a query.
+
+    With backend "auto" the cKDTree is used, which was the fastest backend for both micelle sized and larger uniform
+    systems and supports periodic boundaries. Its threaded query is only used for systems of at least
+    SMALL_SYSTEM_ATOMS atoms, where the expected number of neighbors within the radius is small enough that building
+    the per-atom neighbor lists stays cheap. A single threaded query without periodic boundaries of at most
+    CELL_LIST_MAX_PAIRS expected pairs (see estimate_pairs) uses the cell list instead, which is slower than the
+    cKDTree by less than the import of scipy.spatial it saves there. All backends find the same pairs.
+
+    Args:
+        coords (np.ndarray): The coordinates of the atoms to be queried.
+        radius (float): The query radius.
+        backend (str): The name of a backend in NEIGHBOR_SEARCH_BACKENDS, or "auto". Defaults to "auto".
+        workers (int): The number of threads the backend may use, -1 uses all processors. Defaults to 1.
+        box (np.ndarray): The edge lengths of the orthorhombic periodic box, defaults to None for no periodic boundaries.
+
+    Returns:
+        NeighborSearch: The backend.
+    """
+    if backend != "auto":
+        if backend not in NEIGHBOR_SEARCH_BACKENDS:
+            raise ValueError(
+                f"Unknown neighbor search backend {backend}, expected one of {['auto', *NEIGHBOR_SEARCH_BACKENDS]}"
+            )
+        return NEIGHBOR_SEARCH_BACKENDS[backend](workers, box)
+
+    num_threads = workers if workers > 0 else os.cpu_count() or 1
+    threaded = num_threads > 1 and len(coords) >= SMALL_SYSTEM_ATOMS and radius > 0
+    if threaded:
+        # the number of neighbors expected from the density of the periodic box or the bounding box of the atoms
+        volume = np.prod(box) if box is not None else max(np.prod(np.ptp(coords, axis=0) + radius), radius**3)
+        expected_neighbors = len(coords) / volume * 4 / 3 * np.pi * radius**3
+        threaded = expected_neighbors <= MAX_THREADED_NEIGHBORS
+    if threaded:
+        return CKDTreeNeighborSearch(workers, box)
+    if box is None and estimate_pairs(coords, radius) <= CELL_LIST_MAX_PAIRS:
+        return CellListNeighborSearch(1)
+    return CKDTreeNeighborSearch(1, box)
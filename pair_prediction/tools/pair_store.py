@@ -0,0 +1,155 @@
+from tools.pair import Pair
+import numpy as np
+
+
+class PairStore:
+    """Stores the potential pairs of a prediction column-wise in numpy arrays.
+
+    A Pair object is only created for a pair once it is needed, e.g. when it is selected in the bond selection sequence.
+
+    Attributes:
+        atom_i (np.ndarray): The index of the first atom of each pair in the reactive atom list.
+        atom_j (np.ndarray): The index of the second atom of each pair in the reactive atom list.
+        chain_i (np.ndarray): The index of the chain of the first atom of each pair in the reactive chain list.
+        chain_j (np.ndarray): The index of the chain of the second atom of each pair in the reactive chain list.
+        distance (np.ndarray): The distance between the two atoms of each pair.
+        potential (np.ndarray): The bond potential of each pair.
+        frequency (np.ndarray): The contact frequency of each pair over the frames of a trajectory, or None if the pairs are from a single structure.
+        chain_offsets (np.ndarray): The offsets into chain_pair_ids where the pairs of each chain start.
+        chain_pair_ids (np.ndarray): The indices of the pairs with an atom in each chain, grouped by chain.
+    """
+
+    def __init__(
+        self,
+        atom_i: np.ndarray,
+        atom_j: np.ndarray,
+        chain_i: np.ndarray,
+        chain_j: np.ndarray,
+        distance: np.ndarray,
+        potential: np.ndarray,
+        single_precision: bool = False,
+        frequency: np.ndarray = None,
+    ):
+        """Initializes a PairStore from the columns of the potential pairs.
+
+        Args:
+            atom_i (np.ndarray): The index of the first atom of each pair in the reactive atom list.
+            atom_j (np.ndarray): The index of the second atom of each pair in the reactive atom list.
+            chain_i (np.ndarray): The index of the chain of the first atom of each pair in the reactive chain list.
+            chain_j (np.ndarray): The index of the chain of the second atom of each pair in the reactive chain list.
+            distance (np.ndarray): The distance between the two atoms of each pair.
+            potential (np.ndarray): The bond potential of each pair.
+            single_precision (bool): Whether to store the index columns as int32 instead of int64, defaults to False. The
+                distances, potentials and frequencies the potentials are calculated from are always float64, so the
+                predictions do not depend on the precision.
+            frequency (np.ndarray): The contact frequency of each pair, defaults to None for the pairs of a single structure.
+        """
+        int_type = np.int32 if single_precision else np.int64
+        self.atom_i = np.asarray(atom_i, dtype=int_type)
+        self.atom_j = np.asarray(atom_j, dtype=int_type)
+        self.chain_i = np.asarray(chain_i, dtype=int_type)
+        self.chain_j = np.asarray(chain_j, dtype=int_type)
+        self.distance = np.asarray(distance, dtype=np.float64)
+        self.potential = np.asarray(potential, dtype=np.float64)
+        self.frequency = None if frequency is None else np.asarray(frequency, dtype=np.float64)
+        self.chain_offsets = np.zeros(1, dtype=np.int64)
+        self.chain_pair_ids = np.empty(0, dtype=int_type)
+
+    def __len__(self):
+        return len(self.distance)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes held by the columns and the chain index of the store."""
+        return sum(
+            column.nbytes
+            for column in (
+                self.atom_i,
+                self.atom_j,
+                self.chain_i,
+                self.chain_j,
+                self.distance,
+                self.potential,
+                self.chain_offsets,
+                self.chain_pair_ids,
+            )
+        ) + (self.frequency.nbytes if self.frequency is not None else 0)
+
+    def take(self, pair_ids: np.ndarray):
+        """Creates a store holding only the given pairs, in the given order.
+
+        Args:
+            pair_ids (np.ndarray): The indices of the pairs to keep.
+
+        Returns:
+            PairStore: The store of the given pairs, with the same precision and without a chain index.
+        """
+        return PairStore(
+            self.atom_i[pair_ids],
+            self.atom_j[pair_ids],
+            self.chain_i[pair_ids],
+            self.chain_j[pair_ids],
+            self.distance[pair_ids],
+            self.potential[pair_ids],
+            self.atom_i.dtype == np.int32,
+            self.frequency[pair_ids] if self.frequency is not None else None,
+        )
+
+    def get_frequency(self, pair_ids: np.ndarray):
+        """Gets the contact frequency of the given pairs.
+
+        Args:
+            pair_ids (np.ndarray): The indices of the pairs in the store.
+
+        Returns:
+            np.ndarray | float: The contact frequency of each pair, or 1 if the pairs are from a single structure.
+        """
+        if self.frequency is None:
+            return 1
+        return self.frequency[pair_ids]
+
+    def index_chains(self, num_chains: int):
+        """Builds the index from each chain to the pairs that have an atom in that chain.
+
+        Args:
+            num_chains (int): The number of chains in the reactive chain list.
+        """
+        chains = np.concatenate((self.chain_i, self.chain_j))
+        pair_ids = np.tile(np.arange(len(self), dtype=self.atom_i.dtype), 2)
+        self.chain_pair_ids = pair_ids[np.argsort(chains, kind="stable")]
+        self.chain_offsets = np.zeros(num_chains + 1, dtype=np.int64)
+        np.cumsum(np.bincount(chains, minlength=num_chains), out=self.chain_offsets[1:])
+
+    def get_chain_pairs(self, chains) -> np.ndarray:
+        """Gets the pairs that have an atom in any of the given chains.
+
+        Args:
+            chains (Iterable[int]): The indices of the chains in the reactive chain list.
+
+        Returns:
+            np.ndarray: The sorted indices of the pairs with an atom in any of the given chains.
+        """
+        offsets = self.chain_offsets
+        return np.unique(
+            np.concatenate(
+                [self.chain_pair_ids[offsets[chain] : offsets[chain + 1]] for chain in chains]
+            )
+        )
+
+    def get_pair(self, pair_idx: int, reactive_atoms) -> Pair:
+        """Creates the Pair object of a stored pair.
+
+        Args:
+            pair_idx (int): The index of the pair in the store.
+            reactive_atoms (List[Atom]): The reactive atom list the atom indices of the store refer to.
+
+        Returns:
+            Pair: The pair with its distance and bond potential set.
+        """
+        pair = Pair(
+            reactive_atoms[self.atom_i[pair_idx]],
+            reactive_atoms[self.atom_j[pair_idx]],
+            float(self.distance[pair_idx]),
+        )
+        pair.set_probability(float(self.potential[pair_idx]))
+        return pair
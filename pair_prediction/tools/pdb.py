@@ -3,40 +3,484 @@
 
 from tools.atom import Atom
 from tools.chain import Chain
+from contextlib import nullcontext
+import copy
+import mmap
+import sys
+import numpy as np
+
+# the fixed-width columns of an ATOM record as (start, end) offsets
+ATOM_RECORD_COLUMNS = {
+    "serial": (6, 11),
+    "name": (12, 17),
+    "res_name": (17, 21),
+    "res_type": (17, 20),
+    "res_seq": (22, 26),
+    "i_code": (26, 27),
+    "x": (30, 38),
+    "y": (38, 46),
+    "z": (46, 54),
+    "occupancy": (54, 60),
+    "temp_factor": (60, 66),
+    "element": (76, 78),
+    "charge": (78, 80),
+}
+# the (start, end) offsets of a, b, c, alpha, beta and gamma in the CRYST1 record
+CRYST1_COLUMNS = ((6, 15), (15, 24), (24, 33), (33, 40), (40, 47), (47, 54))
+# the number of records gathered at once, bounding the temporary memory of the parser
+RECORD_CHUNK_SIZE = 32768
+# the value of each digit of the hybrid-36 encoding, 0-9 followed by A-Z or a-z
+HYBRID36_DIGITS = np.full(256, -1, dtype=np.int64)
+HYBRID36_DIGITS[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+HYBRID36_DIGITS[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)] = np.arange(10, 36)
+HYBRID36_DIGITS[np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)] = np.arange(10, 36)
+
+
+def read_atom_records(file: str) -> dict[str, np.ndarray]:
+    """Reads the ATOM records of a PDB file into one numpy array per fixed-width column.
+
+    The file is memory-mapped and the columns of all records are decoded at once, without splitting the file into line strings.
+    Only the first model of a file with several models (MODEL/ENDMDL) is read, the others are frames of a Trajectory.
+
+    Args:
+        file (str): The path to the pdb file.
+
+    Returns:
+        dict[str, np.ndarray]: The raw (unstripped) bytes of each column in ATOM_RECORD_COLUMNS, one entry per ATOM record.
+    """
+    with open(file, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be memory-mapped
+            mapped = b""
+        end = find_model_end(mapped, 0)
+        buffer = np.frombuffer(mapped, dtype=np.uint8, count=end if end < len(mapped) else -1)
+        try:
+            records = decode_atom_records(buffer)
+        finally:
+            del buffer
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+    return records
+
+
+def read_unit_cell(file: str):
+    """Reads the unit cell of the CRYST1 record of a PDB file, which comes before its ATOM records.
+
+    Args:
+        file (str): The path to the pdb file.
+
+    Returns:
+        np.ndarray: The edge lengths a, b, c (angstrom) and the angles alpha, beta, gamma (degrees) of the unit cell, or None if the file has none.
+    """
+    with open(file, "rb") as f:
+        for line in f:
+            if line.startswith(b"CRYST1"):
+                try:
+                    unit_cell = np.array([float(line[start:end]) for start, end in CRYST1_COLUMNS])
+                except ValueError:
+                    return None
+                # a 1 x 1 x 1 angstrom cell is the placeholder of structures without a unit cell
+                if np.all(unit_cell[:3] == 1):
+                    return None
+                return unit_cell
+            if line.startswith((b"ATOM", b"HETATM", b"MODEL")):
+                return None
+    return None
+
+
+def find_model_end(mapped, start: int) -> int:
+    """Finds the end of the model starting at an offset of a PDB file, the start of its ENDMDL record.
+
+    Args:
+        mapped (mmap.mmap | bytes): The text of the pdb file.
+        start (int): The offset the model starts at.
+
+    Returns:
+        int: The offset of the ENDMDL record ending the model, or the length of the file if there is none.
+    """
+    if mapped[start : start + 6] == b"ENDMDL":
+        return start
+    end = mapped.find(b"\nENDMDL", start)
+    return end + 1 if end != -1 else len(mapped)
+
+
+def decode_atom_records(buffer: np.ndarray, columns=None) -> dict[str, np.ndarray]:
+    """Decodes the fixed-width columns of the ATOM records in a buffer holding the text of a PDB file.
+
+    Args:
+        buffer (np.ndarray): The bytes of the pdb file.
+        columns (Iterable[str]): The names of the columns in ATOM_RECORD_COLUMNS to decode, defaults to None for all of them.
+
+    Returns:
+        dict[str, np.ndarray]: The raw (unstripped) bytes of each decoded column, one entry per ATOM record.
+    """
+    columns = ATOM_RECORD_COLUMNS if columns is None else {column: ATOM_RECORD_COLUMNS[column] for column in columns}
+    newlines = np.flatnonzero(buffer == ord("\n"))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+    # drop the carriage return of CRLF line endings
+    has_cr = ends > starts
+    has_cr[has_cr] = buffer[ends[has_cr] - 1] == ord("\r")
+    ends = ends - has_cr
+
+    is_atom = ends - starts >= 4
+    for offset, char in enumerate(b"ATOM"):
+        is_atom[is_atom] = buffer[starts[is_atom] + offset] == char
+    starts = starts[is_atom]
+    ends = ends[is_atom]
+
+    # gather the span of the decoded columns of the records into a space padded character matrix chunk by chunk
+    first = min(start for start, _ in columns.values())
+    last = max(end for _, end in columns.values())
+    chars = np.full((len(starts), last - first), ord(" "), dtype=np.uint8)
+    offsets = np.arange(first, last)
+    for chunk_start in range(0, len(starts), RECORD_CHUNK_SIZE):
+        chunk = slice(chunk_start, chunk_start + RECORD_CHUNK_SIZE)
+        positions = starts[chunk, None] + offsets
+        inside = positions < ends[chunk, None]
+        chars[chunk][inside] = buffer[positions[inside]]
+
+    records = {}
+    for column, (start, end) in columns.items():
+        records[column] = np.ascontiguousarray(chars[:, start - first : end - first]).view(f"S{end - start}").reshape(-1)
+    return records
+
+
+def decode_hybrid36(fields: np.ndarray) -> np.ndarray:
+    """Decodes a fixed-width column of integers that may use the hybrid-36 encoding of large structures.
+
+    Serial numbers above 99999 and residue numbers above 9999 do not fit their columns as decimals. The hybrid-36
+    encoding continues them in base 36, first with upper case (A000-ZZZZ) and then with lower case (a000-zzzz) letters,
+    so a field starting with a letter is decoded in base 36 and the others as decimals.
+
+    Args:
+        fields (np.ndarray): The raw bytes of the column, one fixed-width field per record.
+
+    Returns:
+        np.ndarray: The integer value of each field.
+
+    Raises:
+        ValueError: If a field starting with a letter is not a valid hybrid-36 number.
+    """
+    width = fields.dtype.itemsize
+    chars = np.ascontiguousarray(fields).view(np.uint8).reshape(-1, width)
+    upper = (chars[:, 0] >= ord("A")) & (chars[:, 0] <= ord("Z"))
+    lower = (chars[:, 0] >= ord("a")) & (chars[:, 0] <= ord("z"))
+    encoded = upper | lower
+    if not encoded.any():
+        return fields.astype(np.int64)
+
+    values = np.empty(len(fields), dtype=np.int64)
+    values[~encoded] = fields[~encoded].astype(np.int64)
+    encoded_chars = chars[encoded]
+    digits = HYBRID36_DIGITS[encoded_chars]
+    # upper and lower case digits cannot be mixed within a field
+    upper_chars = (encoded_chars >= ord("A")) & (encoded_chars <= ord("Z"))
+    mixed = np.where(lower[encoded, None], upper_chars, encoded_chars >= ord("a"))
+    invalid = (digits < 0) | mixed
+    if invalid.any():
+        invalid = fields[encoded][invalid.any(axis=1)][0]
+        raise ValueError(f"Invalid hybrid-36 number {invalid.decode(errors='replace')!r}")
+    encoded_values = digits @ 36 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    # A000 follows the largest decimal, and a000 follows ZZZZ
+    encoded_values += 10**width - 10 * 36 ** (width - 1) + lower[encoded] * 26 * 36 ** (width - 1)
+    values[encoded] = encoded_values
+    return values
 
 
 class PDB:
     """Represents the PDB structure from the given pdb file.
 
+    The ATOM records are parsed into numpy arrays with one entry per atom. The Atom and Chain objects of a residue
+    are only created once the residue is accessed, e.g. for the reactive residues of a prediction. A structure can
+    also be built from arrays held in memory (see from_arrays) or from a Biopython Structure (see from_biopython).
+
     Attributes:
-        file (str): The path to the pdb file.
-        atoms (List[Atom]): The list of Atom objects in the structure.
-        chains (Dict[int, Chain]): A dictionary where the key is the res_seq number and the value is the Chain object. This represents all the molecules/chains in the structure.
+        file (str): The path to the pdb file, or the name of a structure built from arrays.
+        serials (np.ndarray): The serial number of each atom.
+        names (np.ndarray): The name of each atom as bytes.
+        res_names (np.ndarray): The name of the residue of each atom as bytes.
+        res_types (np.ndarray): The three letter residue name of each atom as bytes, used as the chain type.
+        res_seqs (np.ndarray): The sequence number of the residue of each atom.
+        i_codes (np.ndarray): The insertion code of each atom as bytes.
+        coords (np.ndarray): The (x, y, z) coordinates of each atom.
+        occupancies (np.ndarray): The occupancy column of each atom as bytes.
+        temp_factors (np.ndarray): The temperature factor column of each atom as bytes.
+        elements (np.ndarray): The element symbol of each atom as bytes.
+        charges (np.ndarray): The charge column of each atom as bytes.
+        residue_ids (np.ndarray): The sorted distinct res_seq numbers of the structure.
+        residue_offsets (np.ndarray): The offsets into residue_atoms where the atoms of each residue in residue_ids start.
+        residue_atoms (np.ndarray): The atom indices grouped by residue, in file order within each residue.
+        unit_cell (np.ndarray): The edge lengths and angles of the unit cell of the CRYST1 record, or None if there is none.
+        box (np.ndarray): The edge lengths of the periodic box the distances are measured in, or None for no periodic boundaries.
+        atom_codes (Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]): The distinct three letter residue names and atom names of the structure, and the code of each atom in both, built on first use.
+        reactive_indices (Dict[tuple, np.ndarray]): The indices of the reactive atoms of each reactive atom dictionary used so far, keyed by its contents.
+        atom_objects (Dict[int, Atom]): A dictionary where the key is the index of an atom in the structure and the value is its Atom object, for the atoms created so far.
+        chains (Dict[int, Chain]): A dictionary where the key is the res_seq number and the value is the Chain object. This represents the molecules/chains of the structure created so far.
         bonded_pairs (List[Pair]): Represents all the bonded pairs in the structure.
         bonded_pairs_core (List[Pair]): Represents all the core bonded pairs in the structure.
         bonded_pairs_surface (List[Pair]): Represents all the surface bonded pairs in the structure.
         radicals (List[Atom]): Represents the radical atoms in the structure after the bond selection sequence.
+        ARRAY_FIELDS (Tuple[str]): The names of the attributes holding the parsed arrays of the structure.
     """
 
-    def __init__(self, file):
+    ARRAY_FIELDS = (
+        "serials",
+        "names",
+        "res_names",
+        "res_types",
+        "res_seqs",
+        "i_codes",
+        "coords",
+        "occupancies",
+        "temp_factors",
+        "elements",
+        "charges",
+        "residue_ids",
+        "residue_offsets",
+        "residue_atoms",
+    )
+
+    def __init__(self, file, periodic=False, metrics=None, columns=None):
+        """Parses the structure of a pdb file.
+
+        Args:
+            file (str): The path to the pdb file.
+            periodic (bool): Whether to apply periodic boundaries in the orthorhombic unit cell of the CRYST1 record, defaults to False.
+            metrics (Metrics): The metrics to record the parse time and the number of atoms and residues in, defaults to None to not record them.
+            columns (dict): The keyword arguments of set_columns to build the structure from instead of parsing the file, defaults to None to parse it.
+
+        Raises:
+            ValueError: If periodic boundaries are requested for a structure without an orthorhombic unit cell.
+        """
         self.file = file
-        self.atoms = []
+        self.atom_objects = {}
         self.chains = {}
+        self.atom_codes = None
+        self.reactive_indices = {}
         self.bonded_pairs = []
         self.bonded_pairs_core = []
         self.bonded_pairs_surface = []
-        self.parse()
+        with nullcontext() if metrics is None else metrics.stage("parse"):
+            if columns is None:
+                self.parse()
+            else:
+                self.set_columns(**columns)
+        if metrics is not None:
+            metrics.count("atoms", len(self.serials))
+            metrics.count("residues", len(self.residue_ids))
         self.radicals = []
+        self.box = None
+        if periodic:
+            if self.unit_cell is None:
+                raise ValueError(f"No CRYST1 unit cell in {file} for periodic boundaries")
+            if not np.allclose(self.unit_cell[3:], 90):
+                raise ValueError(
+                    f"Periodic boundaries need an orthorhombic unit cell, the angles of {file} are {self.unit_cell[3:].tolist()}"
+                )
+            self.box = self.unit_cell[:3].copy()
+
+    @property
+    def atoms(self):
+        """The list of Atom objects in the structure, creating all of them on first access."""
+        return self.get_atoms()
 
     def parse(self):
         """Parses the PDB file and stores the atoms in the structure.
 
-        This method reads the PDB file line by line. If a line starts with "ATOM", it assigns the atom data from that line to the structure.
+        This method decodes the columns of every line starting with "ATOM" into numpy arrays and groups the atoms by residue.
+        """
+        records = read_atom_records(self.file)
+        self.set_columns(
+            serials=decode_hybrid36(records["serial"]),
+            names=np.char.strip(records["name"]),
+            res_names=np.char.strip(records["res_name"]),
+            res_types=np.char.strip(records["res_type"]),
+            res_seqs=decode_hybrid36(records["res_seq"]),
+            i_codes=np.char.strip(records["i_code"]),
+            coords=np.column_stack(
+                (
+                    records["x"].astype(np.float64),
+                    records["y"].astype(np.float64),
+                    records["z"].astype(np.float64),
+                )
+            ).reshape(-1, 3),
+            occupancies=np.char.strip(records["occupancy"]),
+            temp_factors=np.char.strip(records["temp_factor"]),
+            elements=np.char.strip(records["element"]),
+            charges=np.char.strip(records["charge"]),
+            unit_cell=read_unit_cell(self.file),
+        )
+
+    def set_columns(
+        self,
+        serials,
+        names,
+        res_names,
+        res_types,
+        res_seqs,
+        i_codes,
+        coords,
+        occupancies,
+        temp_factors,
+        elements,
+        charges,
+        unit_cell=None,
+    ):
+        """Sets the per-atom arrays of the structure and groups the atoms by residue.
+
+        Args:
+            serials (np.ndarray): The serial number of each atom.
+            names (np.ndarray): The name of each atom as bytes.
+            res_names (np.ndarray): The name of the residue of each atom as bytes.
+            res_types (np.ndarray): The three letter residue name of each atom as bytes.
+            res_seqs (np.ndarray): The sequence number of the residue of each atom.
+            i_codes (np.ndarray): The insertion code of each atom as bytes.
+            coords (np.ndarray): The (x, y, z) coordinates of each atom.
+            occupancies (np.ndarray): The occupancy column of each atom as bytes.
+            temp_factors (np.ndarray): The temperature factor column of each atom as bytes.
+            elements (np.ndarray): The element symbol of each atom as bytes.
+            charges (np.ndarray): The charge column of each atom as bytes.
+            unit_cell (np.ndarray): The edge lengths and angles of the unit cell, defaults to None for no unit cell.
+        """
+        self.unit_cell = unit_cell
+        self.serials = serials
+        self.names = names
+        self.res_names = res_names
+        self.res_types = res_types
+        self.res_seqs = res_seqs
+        self.i_codes = i_codes
+        self.coords = coords
+        self.occupancies = occupancies
+        self.temp_factors = temp_factors
+        self.elements = elements
+        self.charges = charges
+
+        # atoms are grouped into chains by res_seq, like the chains dictionary
+        self.residue_atoms = np.argsort(self.res_seqs, kind="stable")
+        self.residue_ids, counts = np.unique(self.res_seqs, return_counts=True)
+        self.residue_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def from_arrays(
+        cls,
+        coords,
+        res_seqs,
+        names,
+        res_names,
+        elements=None,
+        serials=None,
+        unit_cell=None,
+        file="structure",
+        periodic=False,
+        metrics=None,
+    ):
+        """Builds a structure from per-atom arrays held in memory, without reading or writing any file.
+
+        Args:
+            coords (np.ndarray): The (x, y, z) coordinates of each atom.
+            res_seqs (np.ndarray): The sequence number of the residue of each atom, which groups the atoms into chains.
+            names (Sequence[str]): The name of each atom, as str or bytes.
+            res_names (Sequence[str]): The name of the residue of each atom, as str or bytes.
+            elements (Sequence[str]): The element symbol of each atom, defaults to None for the first character of its name.
+            serials (np.ndarray): The serial number of each atom, defaults to None to number the atoms from 1.
+            unit_cell (Sequence[float]): The edge lengths (angstrom) and angles (degrees) of the unit cell, defaults to None for no unit cell.
+            file (str): The name of the structure used in messages, defaults to "structure".
+            periodic (bool): Whether to apply periodic boundaries in the orthorhombic unit cell, defaults to False.
+            metrics (Metrics): The metrics to record the number of atoms and residues in, defaults to None to not record them.
+
+        Returns:
+            PDB: The structure.
+
+        Raises:
+            ValueError: If the arrays differ in length, or periodic boundaries are requested without an orthorhombic unit cell.
         """
-        with open(self.file, "r") as f:
-            for line in f:
-                if line.startswith("ATOM"):
-                    self.assign_atom(line)
+        coords = np.array(coords, dtype=np.float64).reshape(-1, 3)
+        num_atoms = len(coords)
+
+        def as_bytes(values):
+            return np.char.strip(np.asarray(values).astype(np.bytes_).reshape(-1))
+
+        names = as_bytes(names)
+        res_names = as_bytes(res_names)
+        res_seqs = np.asarray(res_seqs, dtype=np.int64).reshape(-1)
+        elements = np.char.strip(names.astype("S1")) if elements is None else as_bytes(elements)
+        serials = np.arange(1, num_atoms + 1) if serials is None else np.asarray(serials, dtype=np.int64).reshape(-1)
+        lengths = {len(column) for column in (names, res_names, res_seqs, elements, serials)}
+        if lengths != {num_atoms}:
+            raise ValueError(f"The arrays of {file} must hold one entry for each of its {num_atoms} atoms")
+        blank = np.zeros(num_atoms, dtype="S1")
+        columns = {
+            "serials": serials,
+            "names": names,
+            "res_names": res_names,
+            # the first three characters of the residue name, like the res_type column of a pdb file
+            "res_types": np.char.strip(res_names.astype("S3")),
+            "res_seqs": res_seqs,
+            "i_codes": blank,
+            "coords": coords,
+            "occupancies": blank,
+            "temp_factors": blank,
+            "elements": elements,
+            "charges": blank,
+            "unit_cell": None if unit_cell is None else np.asarray(unit_cell, dtype=np.float64),
+        }
+        return cls(file, periodic, metrics, columns)
+
+    @classmethod
+    def from_biopython(cls, structure, model=0, unit_cell=None, periodic=False, metrics=None):
+        """Builds a structure from the standard residues of a Biopython Structure or Model, without reading or writing any file.
+
+        Like the ATOM records of a pdb file, the hetero residues (HETATM records and waters) are left out, and the atoms
+        are grouped into chains by their residue sequence number.
+
+        Args:
+            structure (Bio.PDB.Structure.Structure | Bio.PDB.Model.Model): The Biopython structure, or one of its models.
+            model (int): The index of the model of a Structure, defaults to 0.
+            unit_cell (Sequence[float]): The edge lengths (angstrom) and angles (degrees) of the unit cell, defaults to None for no unit cell.
+            periodic (bool): Whether to apply periodic boundaries in the orthorhombic unit cell, defaults to False.
+            metrics (Metrics): The metrics to record the number of atoms and residues in, defaults to None to not record them.
+
+        Returns:
+            PDB: The structure.
+        """
+        entity = structure.get_list()[model] if structure.get_level() == "S" else structure
+        atoms = [
+            (atom, residue)
+            for residue in entity.get_residues()
+            if residue.get_id()[0] == " "
+            for atom in residue
+        ]
+        return cls.from_arrays(
+            coords=np.array([atom.get_coord() for atom, _ in atoms], dtype=np.float64).reshape(-1, 3),
+            res_seqs=[residue.get_id()[1] for _, residue in atoms],
+            names=[atom.get_name() for atom, _ in atoms],
+            res_names=[residue.get_resname() for _, residue in atoms],
+            elements=[atom.element or atom.get_name()[:1] for atom, _ in atoms],
+            serials=[atom.get_serial_number() or atom_idx + 1 for atom_idx, (atom, _) in enumerate(atoms)],
+            unit_cell=unit_cell,
+            file=str(structure.get_full_id()[0]),
+            periodic=periodic,
+            metrics=metrics,
+        )
+
+    def copy_structure(self):
+        """Creates a copy of the structure sharing its parsed arrays, without any Atom or Chain objects, bonds or radicals.
+
+        Returns:
+            PDB: The copy of the structure.
+        """
+        structure = copy.copy(self)
+        structure.atom_objects = {}
+        structure.chains = {}
+        structure.reactive_indices = dict(self.reactive_indices)
+        structure.bonded_pairs = []
+        structure.bonded_pairs_core = []
+        structure.bonded_pairs_surface = []
+        structure.radicals = []
+        return structure
 
     def write_pymol_pairs(self, file: str, pairs):
         """Formats the pairs for viewing in pymol easily.
@@ -123,12 +567,78 @@ class PDB:
         self.radicals.append(radical)
 
     def get_atoms(self):
-        """Gets the list of atoms in the PDB structure.
+        """Gets the list of atoms in the PDB structure, creating the Atom objects that do not exist yet.
 
         Returns:
             List[Atom]: The list of atoms in the PDB structure.
         """
-        return self.atoms
+        for res_seq in self.residue_ids:
+            self.get_chain(int(res_seq))
+        return [self.atom_objects[atom_idx] for atom_idx in range(len(self.serials))]
+
+    def get_atom(self, atom_idx: int):
+        """Gets the Atom object of an atom, creating its chain on first access.
+
+        Args:
+            atom_idx (int): The index of the atom in the structure.
+
+        Returns:
+            Atom: The Atom object of the atom.
+        """
+        if atom_idx not in self.atom_objects:
+            self.get_chain(int(self.res_seqs[atom_idx]))
+        return self.atom_objects[atom_idx]
+
+    def get_reactive_indices(self, reactive_atoms_dict: dict[str, list[str]]) -> np.ndarray:
+        """Gets the indices of the atoms matching a reactive atom dictionary, in file order.
+
+        The dictionary is compiled into a lookup table over the (residue, atom name) codes of the structure, which is
+        evaluated as one mask over all atoms. The result is cached, so predictors sharing the structure and reactive
+        atoms only match them once.
+
+        Args:
+            reactive_atoms_dict (dict[str, list[str]]): A dictionary with residue names as the keys and arrays of atom names as the values.
+
+        Returns:
+            np.ndarray: The read-only indices of the reactive atoms in the structure.
+        """
+        key = tuple(
+            sorted((res_name, tuple(sorted(atom_names))) for res_name, atom_names in reactive_atoms_dict.items())
+        )
+        if key in self.reactive_indices:
+            return self.reactive_indices[key]
+
+        if self.atom_codes is None:
+            # the first three characters of the residue name are matched, as the chain_type of the atom
+            residue_names, residue_codes = np.unique(self.res_names.astype("S3"), return_inverse=True)
+            atom_names, name_codes = np.unique(self.names, return_inverse=True)
+            self.atom_codes = (residue_names, atom_names, residue_codes.reshape(-1), name_codes.reshape(-1))
+        residue_names, atom_names, residue_codes, name_codes = self.atom_codes
+
+        table = np.zeros((len(residue_names), len(atom_names)), dtype=bool)
+        for res_name, names in reactive_atoms_dict.items():
+            residue = np.searchsorted(residue_names, res_name.encode())
+            if residue == len(residue_names) or residue_names[residue] != res_name.encode():
+                continue
+            table[residue] = np.isin(atom_names, [name.encode() for name in names])
+
+        indices = np.flatnonzero(table[residue_codes, name_codes])
+        indices.flags.writeable = False
+        self.reactive_indices[key] = indices
+        return indices
+
+    def get_chain(self, res_seq: int):
+        """Gets the Chain object of a residue, creating it and all of its atoms on first access.
+
+        Args:
+            res_seq (int): The sequence number of the residue.
+
+        Returns:
+            Chain: The Chain object of the residue.
+        """
+        if res_seq in self.chains:
+            return self.chains[res_seq]
+        return self.assign_chain(res_seq)
 
     def get_bonded_pairs(self):
         """Gets the list of bonded pairs in the PDB structure.
@@ -150,64 +660,55 @@ class PDB:
 
         return self.bonded_pairs_surface
 
-    def assign_chain(self, line: str):
-        """Initializes a Chain object and adds it to the dictionary of chains.
+    def assign_chain(self, res_seq: int):
+        """Initializes the Chain object of a residue with all of its atoms and adds it to the dictionary of chains.
 
-        This method parses a line from a PDB file to extract chain information, creates a Chain object
-        with this information if it doesn't already exist, and adds the chain to the dictionary of chains.
+        The chain type is taken from the first atom of the residue in the file.
 
         Args:
-            line (str): A line from a PDB file containing chain information.
+            res_seq (int): The sequence number of the residue.
 
         Returns:
-            Chain: The Chain object corresponding to the given line.
+            Chain: The Chain object of the residue.
         """
-        res_name = line[17:20].strip()
-        res_seq = int(line[22:26].strip())
-        # if the chain is already initialized just return it as we don't want to reinitialize it
-        if res_seq in self.chains:
-            return self.chains[res_seq]
-        else:
-            self.chains[res_seq] = Chain(res_seq, res_name)
-            return self.chains[res_seq]
+        residue = np.searchsorted(self.residue_ids, res_seq)
+        if residue == len(self.residue_ids) or self.residue_ids[residue] != res_seq:
+            raise KeyError(f"No residue with res_seq {res_seq} in {self.file}")
+        atom_indices = self.residue_atoms[self.residue_offsets[residue] : self.residue_offsets[residue + 1]]
 
-    def assign_atom(self, line: str):
-        """Initializes an Atom object and adds it to the chain and the list of atoms.
+        chain = Chain(res_seq, self.res_types[atom_indices[0]].decode())
+        self.chains[res_seq] = chain
+        for atom_idx in atom_indices:
+            self.assign_atom(int(atom_idx), chain)
+        return chain
 
-        This method parses a line from a PDB file to extract atom information, creates an Atom object
-        with this information, adds the atom to its chain, and appends the atom to the list of atoms.
+    def assign_atom(self, atom_idx: int, chain):
+        """Initializes the Atom object of an atom from the parsed columns and adds it to the chain.
 
         Args:
-            line (str): A line from a PDB file containing atom information.
+            atom_idx (int): The index of the atom in the structure.
+            chain (Chain): The Chain object of the residue of the atom.
 
+        Returns:
+            Atom: The Atom object of the atom.
         """
-        serial = int(line[6:11].strip())
-        name = line[12:17].strip()
-        res_name = line[17:21].strip()
-        chain = self.assign_chain(line)
-        res_seq = int(line[22:26].strip())
-        i_code = line[26:27].strip()
-        x = float(line[30:38].strip())
-        y = float(line[38:46].strip())
-        z = float(line[46:54].strip())
-        occupancy = line[54:60].strip()
-        tempFactor = line[60:66].strip()
-        element = line[76:78].strip()
-        charge = line[78:80].strip()
+        x, y, z = self.coords[atom_idx].tolist()
+        # the repeated name columns are interned so that atoms share their strings
         atom = Atom(
-            serial,
-            name,
-            res_name,
+            int(self.serials[atom_idx]),
+            sys.intern(self.names[atom_idx].decode()),
+            sys.intern(self.res_names[atom_idx].decode()),
             chain,
-            res_seq,
-            i_code,
+            int(self.res_seqs[atom_idx]),
+            sys.intern(self.i_codes[atom_idx].decode()),
             x,
             y,
             z,
-            occupancy,
-            tempFactor,
-            element,
-            charge,
+            self.occupancies[atom_idx].decode(),
+            self.temp_factors[atom_idx].decode(),
+            sys.intern(self.elements[atom_idx].decode()),
+            sys.intern(self.charges[atom_idx].decode()),
         )
         chain.add_atom(atom)
-        self.atoms.append(atom)
+        self.atom_objects[atom_idx] = atom
+        return atom
@@ -2,57 +2,146 @@
 ### Modified by: Emma Stevens ###
 
 # Super class for bond prediction containing common methods and attributes
-from sklearn.neighbors import KDTree
 from abc import ABC, abstractmethod
-from tools.pair import Pair
-from tools.utils import atoms_to_coords, remove_1st_and_chain
+from contextlib import nullcontext
+from tools.cache import get_neighbor_key
+from tools.chain import ChainConnectivity
+from tools.component_selection import select_components
+from tools.constraint_validation import get_chain_pair_keys
+from tools.neighbors import select_neighbor_search
+from tools.pair_store import PairStore
+from tools.priority_queue import AddressablePriorityQueue
+from tools.sum_tree import SumTree
+from tools.utils import extract_neighbor_pairs
 import numpy as np
-import heapq
 
 
 class PredictBonds(ABC):
     """Functions as a super class for different implementations of crosslinking prediction.
 
     Attributes:
-        pdb (str): The pdb file of the structure.
+        pdb (PDB): The parsed structure.
         atoms (list): The atoms of the structure.
-        probability_heap (list): The heap structure used to store potential pairs.
-        potential_pairs (list): A list to store potential pairs of atoms for bonding.
+        probability_heap (AddressablePriorityQueue | SumTree): The max priority queue of the potential pairs that have not been selected, or their sum tree in the sampling mode.
+        potential_pairs (PairStore): The column-wise store of the potential pairs of atoms for bonding.
         reactive_atoms (list): The reactive atoms in the structure denoted by the user.
+        reactive_indices (np.ndarray): The index of each reactive atom in the structure.
+        reactive_chains (list): The chains of the reactive atoms, the chain indices of the potential pairs refer to this list.
+        chain_index (dict[int, int]): A dictionary where the key is the res_seq of a reactive chain and the value is its index in reactive_chains.
+        reactive_atom_chains (np.ndarray): The index of the chain of each reactive atom in reactive_chains.
+        chain_types (np.ndarray): An integer code of the chain_type of each chain in reactive_chains.
+        atom_bonded (np.ndarray): A boolean mask of the reactive atoms that are bonded, mirroring Atom.is_bonded_external.
+        bonded_chain_keys (np.ndarray): The sorted keys of the pairs of reactive chains that are bonded to each other, mirroring Chain.bonded_chains.
         query_radius (float): The float value used for the spatial query of reactive atoms.
-        reactive_input_file (str): The input file for the specific reactive atom names and residues for the structure.
+        reactive_input_file (str | dict[str, list[str]]): The input file for the specific reactive atom names and residues for the structure, or its dictionary of atom names by residue name.
+        chain_connectivity (ChainConnectivity): The number of bonds each reactive chain has formed in the selection sequence.
+        single_precision (bool): Whether the index columns of the potential pairs are stored as int32 instead of int64.
+        neighbor_search (str): The name of the neighbor search backend used for the spatial query, or "auto".
+        workers (int): The number of threads the neighbor search may use, -1 uses all processors.
+        neighbor_pairs (tuple): The (atom_i, atom_j, distances) pairs of reactive atoms found by an earlier query with a radius of at least query_radius, optionally followed by the contact frequency of each pair, or None to query them.
+        seed (int | np.random.SeedSequence): The seed of the sampling mode, or None for the deterministic selection of the highest potential pair.
+        rng (np.random.Generator): The random number generator of the sampling mode, created from the seed when the prediction starts.
+        metrics (Metrics): The metrics the stage times and counters of the prediction are recorded in, or None to not record them.
+        pair_output_file (str): The path of the file the selected pairs are streamed to as they are selected, or None to not stream them.
+        checkpoint (SelectionCheckpoint): The checkpoint the state of the selection sequence is periodically saved to and resumed from, or None for no checkpoints.
+        selected_pair_ids (List[int]): The index in potential_pairs of each selected pair, in selection order.
+        pair_stream (TextIO): The open pair output file during the selection sequence, or None.
+        num_streamed (int): The number of bonded pairs of the structure that precede the unstreamed pairs.
+        component_jobs (int): The number of worker processes the selection sequence is split across by connected component of the potential pairs, or None to run it in this process.
+        cache (PredictionCache): The on-disk cache the neighbor pairs are loaded from and stored in, or None to always query them.
+        BONDS_PER_PAIR (int): The number of bonds formed when a pair is selected.
+        MIN_BOND_POTENTIAL (float): The bond potential a pair has to exceed to be selected.
     """
 
-    def __init__(self, pdb: str, reactive_input_file: str, query_radius: float, weight: float):
+    BONDS_PER_PAIR = 1
+    MIN_BOND_POTENTIAL = 0.001
+
+    def __init__(
+        self,
+        pdb: str,
+        reactive_input_file,
+        query_radius: float,
+        weight: float,
+        *,
+        single_precision: bool = False,
+        neighbor_search: str = "auto",
+        workers: int = 1,
+        neighbor_pairs: tuple = None,
+        seed=None,
+        metrics=None,
+        pair_output_file: str = None,
+        checkpoint=None,
+        component_jobs: int = None,
+        cache=None,
+    ):
         """Inits PredictBonds with pdb and reactive_input_file.
 
         Args:
             pdb (str): The pdb file of the structure.
-            reactive_input_file (str): The input file for the specific reactive atom names and residues for the structure.
+            reactive_input_file (str | dict[str, list[str]]): The input file for the specific reactive atom names and residues for the structure, or a dictionary with residue names as the keys and lists of atom names as the values, which is used without reading a file.
+            single_precision (bool): Whether to store the index columns of the potential pairs as int32, defaults to False.
+            neighbor_search (str): The name of the neighbor search backend in tools.neighbors, defaults to "auto".
+            workers (int): The number of threads the neighbor search may use, -1 uses all processors. Defaults to 1.
+            neighbor_pairs (tuple): The pairs of reactive atoms found by get_neighbor_pairs with a radius of at least query_radius, optionally followed by the contact frequency of each pair. Defaults to None to query them.
+            seed (int | np.random.SeedSequence): The seed of the sampling mode, which selects the pairs at random with a probability proportional to their bond potential. Defaults to None to always select the pair with the highest bond potential.
+            metrics (Metrics): The metrics to record the stage times and counters of the prediction in, defaults to None to not record them.
+            pair_output_file (str): The path of a file to stream the selected pairs to in the format of the core and surface pair output files, defaults to None to not stream them.
+            checkpoint (SelectionCheckpoint): The checkpoint to periodically save the state of the selection sequence to and resume it from, defaults to None for no checkpoints.
+            component_jobs (int): The number of worker processes to run the selection sequences of the connected components of the potential pairs in, -1 uses all processors. The results are the same as those of a single selection sequence. Defaults to None to run the selection sequence in this process.
+            cache (PredictionCache): The on-disk cache to load the neighbor pairs from, storing them on a miss, defaults to None to always query them.
+
+        Raises:
+            ValueError: If a checkpoint or component jobs are given in the sampling mode.
         """
+        if checkpoint is not None and seed is not None:
+            raise ValueError("Checkpoints are not supported in the sampling mode")
+        if component_jobs is not None and seed is not None:
+            raise ValueError("Component jobs are not supported in the sampling mode")
         self.pdb = pdb
-        self.atoms = pdb.get_atoms()
-        self.probability_heap = []
-        self.potential_pairs = []
+        self.probability_heap = None
+        self.potential_pairs = None
         self.reactive_atoms = []
+        self.reactive_indices = np.empty(0, dtype=np.int64)
+        self.reactive_chains = []
+        self.chain_index = {}
+        self.reactive_atom_chains = np.empty(0, dtype=np.int64)
+        self.chain_types = np.empty(0, dtype=np.int64)
+        self.atom_bonded = np.empty(0, dtype=bool)
+        self.bonded_chain_keys = np.empty(0, dtype=np.int64)
         self.query_radius = query_radius
         self.weight = weight
         self.reactive_input_file = reactive_input_file
+        self.chain_connectivity = ChainConnectivity(self.chain_index)
+        self.single_precision = single_precision
+        self.neighbor_search = neighbor_search
+        self.workers = workers
+        self.neighbor_pairs = neighbor_pairs
+        self.seed = seed
+        self.rng = None
+        self.metrics = metrics
+        self.pair_output_file = pair_output_file
+        self.checkpoint = checkpoint
+        self.selected_pair_ids = []
+        self.pair_stream = None
+        self.num_streamed = 0
+        self.component_jobs = component_jobs
+        self.cache = cache
+
+    @property
+    def atoms(self):
+        """The atoms of the structure."""
+        return self.pdb.get_atoms()
 
     @abstractmethod
-    def calculate_bond_potential(
-        self, atom1, atom2, atoms_dist: float, ideal_distance: float, weight: float, isolatedness: float, Cmax: int
-    ) -> float:
-        """Calculate the bond potential between two atoms.
+    def calculate_bond_potentials(self, pairs: PairStore, pair_ids: np.ndarray) -> np.ndarray:
+        """Calculate the bond potentials of many pairs at once.
 
         Args:
-            atom1 (Atom): The first atom of the pair.
-            atom2 (Atom): The second atom of the pair.
-            atoms_dist (float): The distance between the two atoms.
-            ideal_distance (float): The bonding equilibrium distance.
+            pairs (PairStore): The store holding the pairs.
+            pair_ids (np.ndarray): The indices of the pairs in the store.
 
         Returns:
-            float: The bond potential between the two atoms.
+            np.ndarray: The bond potential of each pair.
         """
         pass
 
@@ -75,16 +164,18 @@ class PredictBonds(ABC):
         pass
 
     def get_reactive_str_representation(
-        self, reactive_input_file: str
+        self, reactive_input_file
     ) -> dict[str, list[str]]:
         """From the reactive atom/residue input file, extract the string representation.
 
         Args:
-            reactive_input (str): The file containing the formatted atom names and residue names.
+            reactive_input (str | dict[str, list[str]]): The file containing the formatted atom names and residue names, or the dictionary it represents, which is returned as a copy.
 
         Returns:
             dict[str, list[str]]: A dictionary where the keys are residue names and the values are an array of atom names corresponding to the residue name.
         """
+        if isinstance(reactive_input_file, dict):
+            return {residue_name: list(atom_names) for residue_name, atom_names in reactive_input_file.items()}
         reactive_atom_dict = {}
         with open(reactive_input_file, "r") as f:
             for line in f:
@@ -100,166 +191,400 @@ class PredictBonds(ABC):
         return reactive_atom_dict
 
     # the bond potential function to "rank" potential pairs
-    def bond_potential(
-        self, atom_dist: float, dist_equilibrium: float, dist_variance: float, iso_weight: float, isolatedness: float, Cmax: int
-    ) -> float:
-        """Calculate the bond potential between two atoms.
+    def bond_potentials(
+        self, atom_dists: np.ndarray, valid: np.ndarray, dist_equilibrium: float, dist_variance: float, iso_weight: float, isolatedness: np.ndarray, Cmax: int, frequency=1
+    ) -> np.ndarray:
+        """Calculate the bond potentials of many pairs at once, the potential of the invalid pairs is 0.
 
         Args:
-            atom_dist (float): The distance between the two atoms.
+            atom_dists (np.ndarray): The distance between the two atoms of each pair.
+            valid (np.ndarray): A boolean mask of the pairs that are allowed to bond.
             dist_equilibrium (float): The bonding distance equilibrium.
             dist_variance (float): The acceptable variance allowed for the bonding to occur.
+            iso_weight (float): The weight for the degree of isolation.
+            isolatedness (np.ndarray): The degree of isolation of each pair.
+            Cmax (int): The maximum connectivity of a pair.
+            frequency (np.ndarray | float): The contact frequency of each pair over the frames of a trajectory, weighting the potentials. Defaults to 1.
 
         Returns:
-            float: The bond potential between the two atoms.
+            np.ndarray: The bond potential of each pair.
         """
-        return ((np.exp(-((atom_dist - dist_equilibrium) ** 2) / (2 * dist_variance)) + (iso_weight*isolatedness)) / (1 + iso_weight*Cmax)
+        return np.where(
+            valid,
+            frequency * (np.exp(-((atom_dists - dist_equilibrium) ** 2) / (2 * dist_variance)) + (iso_weight*isolatedness)) / (1 + iso_weight*Cmax),
+            0,
         )
-        
+
 
     def predict_bonding(self):
         """The predicting sequence for identifying preferred bonding sites for cross-linking.
 
         This method performs the following steps:
         1. Gets the reactive atoms from the input file.
-        2. Initializes the reactive atoms.
-        3. Converts the reactive atoms to coordinates.
-        4. Creates a KDTree from the reactive atom coordinates.
-        5. Performs a radius query on the KDTree to find nearby atoms.
-        6. Filters out the first atom and same chain atoms from the query results.
+        2. Initializes the reactive atoms and their chains.
+        3-6. Finds each pair of reactive atoms in different chains within the query radius once (see get_neighbor_pairs).
         7. Initializes the potential pairs of atoms for bonding.
-        8. Stores the potential pairs in a max heap for quick access to the pair with the highest potential.
-        9. Performs the bond selection sequence.
+        8. Stores the potential pairs in a max priority queue for quick access to the pair with the highest potential,
+           or in a sum tree for sampling the pairs in the sampling mode.
+        9. Performs the bond selection sequence, or the bond sampling sequence in the sampling mode.
         10. Finds the radicals in the structure that weren't bonded in the selection sequence.
-        """
-        reactive_atoms_dict = self.get_reactive_str_representation(
-            self.reactive_input_file
-        )
 
-        self.init_reactive_atoms(reactive_atoms_dict)
+        With metrics, the wall time of each of these stages is recorded in them. With a pair output file, the selected pairs
+        are written to it as they are selected. With a checkpoint, the selection sequence resumes from it and is
+        periodically saved to it. With component jobs, the selection sequence is split across worker processes (see
+        tools.component_selection.select_components), and only saved to the checkpoint once it ends.
+        """
+        with self.stage("reactive_selection"):
+            reactive_atoms_dict = self.get_reactive_str_representation(
+                self.reactive_input_file
+            )
 
-        reactive_bonding_coords = atoms_to_coords(self.reactive_atoms)
+            self.init_reactive_atoms(reactive_atoms_dict)
+            self.init_reactive_chains()
 
-        tree = KDTree(reactive_bonding_coords, leaf_size=30)
-        # create a matrix of spatial query distances
-        indices, distance = tree.query_radius(
-            reactive_bonding_coords, r=self.query_radius, return_distance=True
-        )
-        # filter out the first atom and same chain atoms from the matrices
-        indices_filtered, distances_filtered = remove_1st_and_chain(
-            indices, distance, self.reactive_atoms
-        )
+        neighbor_pairs = self.get_neighbor_pairs()
         # initialize the pairs calculating their bond potential
-        self.potential_pairs = self.initialize_potential_pairs(
-            indices_filtered, distances_filtered
-        )
-        # store the potential pairs in a max heap for quick access to highest potential
-        self.probability_heap = self.init_prob_heap()
+        with self.stage("pair_initialization"):
+            self.potential_pairs = self.initialize_potential_pairs(*neighbor_pairs)
+        # store the potential pairs in a max priority queue for quick access to highest potential
+        with self.stage("heap_init"):
+            self.probability_heap = self.init_prob_heap()
+        self.num_streamed = len(self.pdb.bonded_pairs)
+        if self.checkpoint is not None:
+            self.checkpoint.start(self)
         # the selection sequence for bond pairs
-        self.bond_selection_loop()
+        with self.stage("selection_loop"):
+            with open(self.pair_output_file, "w", buffering=1) if self.pair_output_file else nullcontext() as pair_stream:
+                self.pair_stream = pair_stream
+                # the pairs of a resumed checkpoint
+                self.stream_pairs()
+                if self.seed is not None:
+                    self.bond_sampling_loop()
+                elif self.component_jobs is not None:
+                    num_components = select_components(self, self.component_jobs)
+                    if self.metrics is not None:
+                        self.metrics.count("components", num_components)
+                else:
+                    self.bond_selection_loop()
+                self.pair_stream = None
+            if self.checkpoint is not None:
+                self.checkpoint.save(self)
         # find the radicals of the structure that weren't bonded in the selection sequence
-        self.find_radicals(reactive_atoms_dict)
+        with self.stage("radicals"):
+            self.find_radicals(reactive_atoms_dict)
+        if self.metrics is not None:
+            self.metrics.count("unselected_pairs", len(self.probability_heap))
+            self.metrics.count("heap_rebuilds", self.probability_heap.num_rebuilds)
+
+    def stream_pairs(self):
+        """Writes the pairs added to the structure since the last call to the pair output file, if it is streamed."""
+        if self.pair_stream is not None:
+            self.pdb.write_columned_pairs(self.pair_stream, self.pdb.bonded_pairs[self.num_streamed :])
+            self.num_streamed = len(self.pdb.bonded_pairs)
+
+    def stage(self, name: str):
+        """Times a stage of the prediction in the metrics, or does nothing without metrics.
+
+        Args:
+            name (str): The name of the stage.
+
+        Returns:
+            ContextManager: The context timing the enclosed block.
+        """
+        return nullcontext() if self.metrics is None else self.metrics.stage(name)
+
+    def get_reactive_groups(self):
+        """Gets the groups of the reactive atoms and the pairs of groups whose atoms can pair, for the spatial query.
+
+        Subclasses whose validity rules never pair the atoms of certain groups override this method, so that the
+        spatial query only generates the pairs of groups that can pair (see NeighborSearch.query_pairs).
+
+        Returns:
+            Tuple[np.ndarray, List[Tuple[int, int]]]: The group of each reactive atom and the unordered pairs of groups
+            whose atoms can pair, or (None, None) when any two reactive atoms can pair.
+        """
+        return None, None
+
+    def get_neighbor_pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds each pair of reactive atoms in different chains within the query radius once.
+
+        This method performs the following steps:
+        1. Gets the coordinates of the reactive atoms.
+        2. Selects the neighbor search backend for the reactive atoms and the query radius.
+        3. Finds each pair of reactive atoms within the query radius once, only across the groups that can pair (see get_reactive_groups).
+        4. Keeps the pairs of atoms in different chains.
+
+        If the pairs of an earlier query with a larger radius were given as neighbor_pairs, they are filtered down to the
+        query radius instead, so that one query serves many radii. With a cache, the pairs of an earlier prediction with
+        the same reactive atoms, chains, query radius and periodic box are loaded from it instead of queried.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower reactive atom indices, the higher reactive atom indices and the distances of the pairs, followed by their contact frequencies if neighbor_pairs holds them.
+        """
+        if self.neighbor_pairs is not None:
+            with self.stage("filtering"):
+                within = self.neighbor_pairs[2] <= self.query_radius
+                return tuple(column[within] for column in self.neighbor_pairs)
+
+        with self.stage("radius_query"):
+            reactive_bonding_coords = self.pdb.coords[self.reactive_indices]
+            reactive_groups = self.get_reactive_groups()
+            if self.cache is not None:
+                cache_key = get_neighbor_key(
+                    reactive_bonding_coords, self.reactive_atom_chains, self.query_radius, self.pdb.box, *reactive_groups
+                )
+                cached_pairs = self.cache.load("neighbors", cache_key)
+                if cached_pairs is not None:
+                    if self.metrics is not None:
+                        self.metrics.count("cache_hits")
+                    return cached_pairs["atom_i"], cached_pairs["atom_j"], cached_pairs["distances"]
+
+            neighbor_search = select_neighbor_search(
+                reactive_bonding_coords, self.query_radius, self.neighbor_search, self.workers, self.pdb.box
+            )
+            # find every pair of atoms within the query radius
+            query_pairs = neighbor_search.query_pairs(reactive_bonding_coords, self.query_radius, *reactive_groups)
+        # then filter out the same chain pairs
+        with self.stage("filtering"):
+            pairs = extract_neighbor_pairs(*query_pairs, self.reactive_atom_chains)
+        if self.cache is not None:
+            self.cache.store("neighbors", cache_key, dict(zip(("atom_i", "atom_j", "distances"), pairs)))
+        if self.metrics is not None:
+            self.metrics.count("neighbor_pairs", len(query_pairs[0]))
+        return pairs
 
     # from the reactive atom and residue names return the atom objects from the structure
     def init_reactive_atoms(self, reactive_atoms_dict: dict[str, list[str]]):
         """Adds the reactive atoms to the self.reactive_atoms list.
 
+        The reactive atoms are matched on the parsed columns of the structure, so Atom objects are only created for the reactive residues.
+        The match is cached by the structure and shared with other predictors using the same reactive atoms.
+
         Args:
             reactive_atoms_dict (Dict[str, List[str]]): A dictionary with residue name as the key and an array of atom names as the values. These represent the reactive aspects of the structure.
         """
-        for atom in self.atoms:
-            if atom.name in reactive_atoms_dict.get(atom.res_name[:3], []):
-                self.reactive_atoms.append(atom)
+        self.reactive_indices = self.pdb.get_reactive_indices(reactive_atoms_dict)
+        self.reactive_atoms = [self.pdb.get_atom(int(atom_idx)) for atom_idx in self.reactive_indices]
+
+    def init_reactive_chains(self):
+        """Numbers the chains of the reactive atoms so that the potential pairs can refer to them by index.
+
+        This method also copies the bonding state of the reactive atoms and chains into the arrays used by the vectorized validity rules.
+        """
+        self.reactive_chains = []
+        self.chain_index = {}
+        self.reactive_atom_chains = np.empty(len(self.reactive_atoms), dtype=np.int64)
+        for atom_idx, atom in enumerate(self.reactive_atoms):
+            if atom.chain.chain_id not in self.chain_index:
+                self.chain_index[atom.chain.chain_id] = len(self.reactive_chains)
+                self.reactive_chains.append(atom.chain)
+            self.reactive_atom_chains[atom_idx] = self.chain_index[atom.chain.chain_id]
+
+        _, self.chain_types = np.unique(
+            [chain.chain_type for chain in self.reactive_chains], return_inverse=True
+        )
+        self.chain_types = self.chain_types.reshape(-1)
+        self.chain_connectivity = ChainConnectivity(self.chain_index)
+        self.atom_bonded = np.array(
+            [atom.is_bonded_external for atom in self.reactive_atoms], dtype=bool
+        )
+        bonded_chains = [
+            (chain_idx, self.chain_index[bonded_chain.chain_id])
+            for chain_idx, chain in enumerate(self.reactive_chains)
+            for bonded_chain in chain.bonded_chains
+            if bonded_chain.chain_id in self.chain_index
+        ]
+        self.bonded_chain_keys = np.unique(
+            get_chain_pair_keys(
+                [chain_i for chain_i, _ in bonded_chains],
+                [chain_j for _, chain_j in bonded_chains],
+                len(self.reactive_chains),
+            )
+        )
 
-    def recal_probability_map(self, recalc_pairs: list):
+    def recal_probability_map(self, recalc_pairs: np.ndarray):
         """Recalculates and sets the probability of the pairs in the recalculate pair list.
 
+        Only the queue entries of the recalculated pairs are updated, the rest of the queue is left untouched. The pairs
+        whose bond potential drops to 0 are removed from the queue, since their bonded atoms or chains stay bonded and
+        they can never be selected, so later selections no longer recalculate them.
+
         Args:
-            recalc_pairs (list[Pair]): The list of potential pairs that need to be recalculated based on the previous selected pair.
+            recalc_pairs (np.ndarray): The indices of the potential pairs that need to be recalculated based on the previous selected pair.
         """
-        for pair in recalc_pairs:
-            new_probability = self.calculate_bond_potential(
-                pair.atom1, pair.atom2, pair.distance
-            )
-            pair.set_probability(new_probability)
+        new_probabilities = self.calculate_bond_potentials(self.potential_pairs, recalc_pairs)
+        pruned = new_probabilities <= 0
+        if self.metrics is not None:
+            self.metrics.count("pruned_pairs", int(np.count_nonzero(pruned)))
+            self.metrics.observe("recalculated_pairs", len(recalc_pairs))
+        self.potential_pairs.potential[recalc_pairs[pruned]] = new_probabilities[pruned]
+        self.probability_heap.remove_many(recalc_pairs[pruned])
+        num_updated = self.probability_heap.update_many(recalc_pairs[~pruned], new_probabilities[~pruned])
+        if self.metrics is not None:
+            self.metrics.count("heap_updates", num_updated)
 
     def select_highest_probability_pair(self):
-        """Selects the root node of the heap and removes it from the potential pair set.
+        """Selects the root node of the priority queue and removes it from the potential pair set.
 
         This method also sets the properties of the pair to denote that they are bonded.
 
         Returns:
-            Pair: The root node of the heap.
+            Pair: The root node of the priority queue.
         """
-        root_pair = heapq.heappop(self.probability_heap)
-        self.potential_pairs.remove(root_pair)
-        root_pair.bond_pair()
+        return self.bond_selected_pair(self.probability_heap.pop())
+
+    def select_sampled_pair(self):
+        """Samples a pair from the sum tree with a probability proportional to its bond potential and removes it.
+
+        This method also sets the properties of the pair to denote that they are bonded.
+
+        Returns:
+            Pair: The sampled pair.
+        """
+        return self.bond_selected_pair(self.probability_heap.pop(self.rng))
+
+    def bond_selected_pair(self, root_idx: int):
+        """Sets the properties of a pair removed from the queue to denote that they are bonded.
+
+        Args:
+            root_idx (int): The index of the selected pair in the store.
+
+        Returns:
+            Pair: The selected pair.
+        """
+        store = self.potential_pairs
+        self.selected_pair_ids.append(root_idx)
+        root_pair = store.get_pair(root_idx, self.reactive_atoms)
+        root_pair.bond_pair(self.chain_connectivity, self.BONDS_PER_PAIR)
+
+        self.atom_bonded[store.atom_i[root_idx]] = True
+        self.atom_bonded[store.atom_j[root_idx]] = True
+        root_key = get_chain_pair_keys(
+            store.chain_i[root_idx], store.chain_j[root_idx], len(self.reactive_chains)
+        )
+        position = np.searchsorted(self.bonded_chain_keys, root_key)
+        if position == len(self.bonded_chain_keys) or self.bonded_chain_keys[position] != root_key:
+            self.bonded_chain_keys = np.insert(self.bonded_chain_keys, position, root_key)
         return root_pair
 
     def init_prob_heap(self):
-        """Initializes a heap of bonded pairs based on their bond potential.
+        """Initializes a max priority queue of potential pairs based on their bond potential.
+
+        In the sampling mode a sum tree of the potential pairs is initialized instead, along with the random number generator.
 
         Returns:
-            list[Pair]: A heap with the potential pairs.
+            AddressablePriorityQueue | SumTree: A priority queue or sum tree with the potential pairs.
         """
-        probability_heap = []
-        for pair in self.potential_pairs:
-            heapq.heappush(probability_heap, pair)
-        return probability_heap
+        if self.seed is not None:
+            self.rng = np.random.default_rng(self.seed)
+            return SumTree(self.potential_pairs.potential, self.MIN_BOND_POTENTIAL)
+        return AddressablePriorityQueue(self.potential_pairs.potential)
 
-    def initialize_potential_pairs(
-        self, indices_filtered: np.ndarray, distances_filtered: np.ndarray
-    ):
-        """Initializes a list of potential pairs from the filtered indices and distances.
+    def rebuild_prob_heap(self):
+        """Rebuilds the queue over the current potentials of the potential pairs, after selections made without it.
+
+        The selected pairs and the pairs whose potential dropped to 0 are left out, as in the queue of the selection
+        sequence (see recal_probability_map).
+        """
+        self.probability_heap = self.init_prob_heap()
+        self.probability_heap.remove_many(np.array(self.selected_pair_ids, dtype=np.int64))
+        self.probability_heap.remove_many(
+            np.flatnonzero(self.probability_heap.queued & (self.potential_pairs.potential <= 0))
+        )
+
+    def get_chain_branching_pairs(self, pair) -> np.ndarray:
+        """Finds the unselected potential pairs that share a chain in common with the given pair using the chain index of the store.
 
         Args:
-            indices_filtered (np.ndarray): A numpy array of atom indices relating to the reactive_atoms instance variable list.
-            distances_filtered (np.ndarray): A numpy array where each element is the distance between the atom at the corresponding index in the indices_filtered array and the atom at the index of that element.
+            pair (Pair): The pair whose chains are looked up.
 
         Returns:
-            list[Pair]: A list of potential pairs.
+            np.ndarray: The indices of the unselected potential pairs with an atom in either chain of the given pair.
         """
-        potential_pairs = set()
-        # iterate through the bond matrix and initialize the potential pairs
-        for query_atom_idx, inner_array in enumerate(indices_filtered):
-            current_atom = self.reactive_atoms[query_atom_idx]
-            for idx_in_list, cur_nn_idx in enumerate(inner_array):
+        pair_ids = self.potential_pairs.get_chain_pairs(
+            (self.chain_index[pair.chain1.chain_id], self.chain_index[pair.chain2.chain_id])
+        )
+        return pair_ids[self.probability_heap.queued[pair_ids]]
 
-                cur_nn_atom = self.reactive_atoms[cur_nn_idx]
+    def initialize_potential_pairs(
+        self, atom_i: np.ndarray, atom_j: np.ndarray, distances: np.ndarray, frequencies: np.ndarray = None
+    ):
+        """Initializes the store of potential pairs from the filtered neighbor pairs.
 
-                pair_distance = distances_filtered[query_atom_idx][idx_in_list]
+        Only the pairs with a positive bond potential are stored, and the chain index of the store is built from their chains.
 
-                probability_of_pair = self.calculate_bond_potential(
-                    current_atom, cur_nn_atom, pair_distance
-                )
-                if probability_of_pair > 0:
-                    bonded_pair = Pair(current_atom, cur_nn_atom, pair_distance)
-                    bonded_pair.set_probability(probability_of_pair)
-                    potential_pairs.add(bonded_pair)
-        return list(potential_pairs)
+        Args:
+            atom_i (np.ndarray): The index of the first atom of each pair in the reactive_atoms instance variable list.
+            atom_j (np.ndarray): The index of the second atom of each pair in the reactive_atoms instance variable list.
+            distances (np.ndarray): The distance between the two atoms of each pair.
+            frequencies (np.ndarray): The contact frequency of each pair over the frames of a trajectory, defaults to None for a single structure.
+
+        Returns:
+            PairStore: The store of potential pairs.
+        """
+        candidate_pairs = PairStore(
+            atom_i,
+            atom_j,
+            self.reactive_atom_chains[atom_i],
+            self.reactive_atom_chains[atom_j],
+            distances,
+            np.zeros(len(atom_i)),
+            self.single_precision,
+            frequencies,
+        )
+        candidate_pairs.potential[:] = self.calculate_bond_potentials(
+            candidate_pairs, np.arange(len(candidate_pairs))
+        )
+        potential_pairs = candidate_pairs.take(np.flatnonzero(candidate_pairs.potential > 0))
+        potential_pairs.index_chains(len(self.reactive_chains))
+        if self.metrics is not None:
+            self.metrics.count("candidate_pairs", len(candidate_pairs))
+            self.metrics.count("zero_potential_pairs", len(candidate_pairs) - len(potential_pairs))
+        return potential_pairs
 
     def bond_selection_loop(self):
         """Iteratively selects the potential pairs based on the highest bond potential and adds them to the respective field.
 
         This method performs the following steps:
-        1. While the highest bond potential is greater than 0.001, continue the loop.
+        1. While the highest bond potential is greater than MIN_BOND_POTENTIAL, continue the loop.
         2. Select the pair with the highest bond potential and add it to the PDB object.
         3. Find the pairs that need to be recalculated based on the selected pair.
-        4. Recalculate the bond potential for the pairs that need to be recalculated.
-        5. If there are pairs that were recalculated, reinitialize the heap of potential pairs.
+        4. Recalculate the bond potential for the pairs that need to be recalculated, updating their entries in the priority queue.
+        5. Stream the pairs added to the structure and save a checkpoint once its interval has passed.
         """
-        while self.probability_heap[0].probability > 0.001:
-            # reinitialize everytime since the last check (len(pair_to_recalc)) won't work correctly otherwise
-            pairs_to_recalculate = []
+        while (
+            self.probability_heap
+            and self.potential_pairs.potential[self.probability_heap.peek()] > self.MIN_BOND_POTENTIAL
+        ):
             selected_pair = self.select_highest_probability_pair()
             self.add_pair_pdb(selected_pair)
+            if self.metrics is not None:
+                self.metrics.count("selected_pairs")
 
             # finds the pairs that need to be recalculated
-            pairs_to_recalculate = selected_pair.get_chain_branching_pairs(
-                self.potential_pairs
-            )
-            # recalculates the probability of the pairs in the recalculate pair list by mutating the pair objects in the potential_pair_list
+            pairs_to_recalculate = self.get_chain_branching_pairs(selected_pair)
+            # recalculates the probability of the pairs in the recalculate pair list by updating their potentials in the store
+            self.recal_probability_map(pairs_to_recalculate)
+
+            self.stream_pairs()
+            if self.checkpoint is not None and self.checkpoint.due():
+                self.checkpoint.save(self)
+
+    def bond_sampling_loop(self):
+        """Iteratively samples the potential pairs with a probability proportional to their bond potential and adds them to the respective field.
+
+        This method performs the following steps:
+        1. While any pair has a bond potential greater than MIN_BOND_POTENTIAL, continue the loop.
+        2. Sample a pair from the sum tree and add it to the PDB object.
+        3. Find the pairs that need to be recalculated based on the sampled pair.
+        4. Recalculate the bond potential for the pairs that need to be recalculated, updating their weights in the sum tree.
+        """
+        while self.probability_heap.num_weighted:
+            selected_pair = self.select_sampled_pair()
+            self.add_pair_pdb(selected_pair)
+            if self.metrics is not None:
+                self.metrics.count("selected_pairs")
+
+            pairs_to_recalculate = self.get_chain_branching_pairs(selected_pair)
             self.recal_probability_map(pairs_to_recalculate)
-            # reheapify the probability_heap with the updated probabilities only if you need, to optimize compute
-            if len(pairs_to_recalculate) > 0:
-                self.probability_heap = self.init_prob_heap()
+            self.stream_pairs()
@@ -0,0 +1,161 @@
+import heapq
+import numpy as np
+
+
+class AddressablePriorityQueue:
+    """A max priority queue over the items 0..n-1 whose priorities can be updated without rebuilding the heap.
+
+    The initial priorities are sorted once into a static order. Updating the priority of an item bumps its version
+    stamp and pushes a new entry onto a dynamic heap, which invalidates the entries holding its older priorities.
+    Stale entries are discarded lazily once they surface. Ties in priority are broken by the lower item index.
+
+    Attributes:
+        priorities (np.ndarray): The current priority of every item, updated priorities are written into this array.
+        versions (np.ndarray): The version stamp of every item, incremented each time its priority is updated.
+        queued (np.ndarray): A boolean mask of the items that are still in the queue.
+        order (np.ndarray): The items sorted by their initial priority (highest first).
+        cursor (int): The position of the first entry in the static order that has not been discarded.
+        heap (list): The heap of (negated priority, item, version) entries for the items whose priority was updated.
+        size (int): The number of items still in the queue.
+        num_rebuilds (int): The number of times the dynamic heap was compacted.
+    """
+
+    def __init__(self, priorities: np.ndarray):
+        """Initializes the queue with a sort of the initial priorities.
+
+        Args:
+            priorities (np.ndarray): The initial priority of every item. The array is kept by reference.
+        """
+        self.priorities = priorities
+        self.versions = np.zeros(len(priorities), dtype=np.int32)
+        self.queued = np.ones(len(priorities), dtype=bool)
+        self.order = np.argsort(-priorities, kind="stable")
+        self.cursor = 0
+        self.heap = []
+        self.size = len(priorities)
+        self.num_rebuilds = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, item: int):
+        return bool(self.queued[item])
+
+    def update(self, item: int, priority: float):
+        """Sets the priority of a queued item, skipping the heap push if its priority is unchanged.
+
+        Args:
+            item (int): The queued item.
+            priority (float): The new priority of the item.
+        """
+        if self.priorities[item] == priority:
+            return
+        self.priorities[item] = priority
+        self.versions[item] += 1
+        heapq.heappush(
+            self.heap,
+            (-float(self.priorities[item]), int(item), int(self.versions[item])),
+        )
+        # stale entries are only dropped when they surface, so compact once they outnumber the live ones
+        if len(self.heap) > 2 * self.size + 32:
+            self.compact()
+
+    def update_many(self, items: np.ndarray, priorities: np.ndarray):
+        """Sets the priorities of many distinct queued items, pushing heap entries only for the priorities that changed.
+
+        Args:
+            items (np.ndarray): The distinct queued items.
+            priorities (np.ndarray): The new priority of each item.
+
+        Returns:
+            int: The number of items whose priority changed.
+        """
+        priorities = np.asarray(priorities, dtype=self.priorities.dtype)
+        changed = self.priorities[items] != priorities
+        items = items[changed]
+        self.priorities[items] = priorities[changed]
+        self.versions[items] += 1
+        for entry in zip(
+            (-self.priorities[items]).tolist(), items.tolist(), self.versions[items].tolist()
+        ):
+            heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * self.size + 32:
+            self.compact()
+        return len(items)
+
+    def remove(self, item: int):
+        """Removes an item from the queue.
+
+        Args:
+            item (int): The queued item to be removed.
+        """
+        self.queued[item] = False
+        self.size -= 1
+
+    def remove_many(self, items: np.ndarray):
+        """Removes many distinct queued items from the queue.
+
+        Args:
+            items (np.ndarray): The distinct queued items to be removed.
+        """
+        self.queued[items] = False
+        self.size -= len(items)
+
+    def peek(self) -> int:
+        """Returns the item with the highest priority without removing it.
+
+        Returns:
+            int: The item with the highest priority.
+        """
+        if self.size == 0:
+            raise IndexError("peek from an empty priority queue")
+        static_item = self.static_top()
+        dynamic_entry = self.dynamic_top()
+        if dynamic_entry is None:
+            return static_item
+        if static_item is None:
+            return dynamic_entry[1]
+        if (-float(self.priorities[static_item]), int(static_item)) < dynamic_entry[:2]:
+            return static_item
+        return dynamic_entry[1]
+
+    def pop(self) -> int:
+        """Removes and returns the item with the highest priority.
+
+        Returns:
+            int: The item with the highest priority.
+        """
+        item = self.peek()
+        self.remove(item)
+        return item
+
+    def static_top(self):
+        """Advances past the stale entries of the static order and returns its first live item, if any."""
+        order = self.order
+        while self.cursor < len(order):
+            item = order[self.cursor]
+            # an item leaves the static order once it is removed or its priority is updated
+            if self.queued[item] and self.versions[item] == 0:
+                return item
+            self.cursor += 1
+        return None
+
+    def dynamic_top(self):
+        """Pops the stale entries at the top of the dynamic heap and returns its first live entry, if any."""
+        heap = self.heap
+        while heap:
+            _, item, version = heap[0]
+            if self.queued[item] and self.versions[item] == version:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def compact(self):
+        """Rebuilds the dynamic heap from its live entries only."""
+        self.num_rebuilds += 1
+        self.heap = [
+            entry
+            for entry in self.heap
+            if self.queued[entry[1]] and self.versions[entry[1]] == entry[2]
+        ]
+        heapq.heapify(self.heap)
@@ -0,0 +1,71 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedArrays:
+    """Places numpy arrays in shared memory blocks, so that worker processes can map them instead of receiving copies.
+
+    The process creating the blocks owns them and frees them with close. The worker processes map them from the
+    picklable specs with attach_shared_arrays.
+
+    Attributes:
+        blocks (Dict[str, SharedMemory]): The shared memory block of each array.
+        specs (Dict[str, tuple]): The (block name, shape, dtype) of each array.
+        arrays (Dict[str, np.ndarray]): The arrays backed by the shared memory blocks.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        """Copies the arrays into new shared memory blocks.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): The arrays by name.
+        """
+        self.blocks = {}
+        self.specs = {}
+        self.arrays = {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                # a block cannot be empty
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks[name] = block
+                self.specs[name] = (block.name, array.shape, array.dtype.str)
+                self.arrays[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                self.arrays[name][...] = array
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Releases the arrays and frees the shared memory blocks."""
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+def attach_shared_arrays(specs: dict[str, tuple]) -> tuple[dict[str, np.ndarray], list]:
+    """Maps the arrays placed in shared memory by SharedArrays in another process.
+
+    Args:
+        specs (Dict[str, tuple]): The (block name, shape, dtype) of each array, from SharedArrays.specs.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], List[SharedMemory]]: The read-only arrays by name, and the mapped blocks, which have to be kept referenced while the arrays are used.
+    """
+    arrays = {}
+    blocks = []
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays, blocks
@@ -0,0 +1,198 @@
+import numpy as np
+
+
+class SumTree:
+    """A Fenwick tree over the weights of the items 0..n-1 for sampling an item with probability proportional to its weight.
+
+    It has the same interface as AddressablePriorityQueue for updating and removing items, so the selection sequence
+    can sample pairs instead of popping the one with the highest priority. The weight of a queued item is its priority
+    if that is above min_priority and 0 otherwise, so the items at or below min_priority are never sampled. Sampling,
+    updating and removing an item take O(log n).
+
+    Attributes:
+        priorities (np.ndarray): The current priority of every item, updated priorities are written into this array.
+        min_priority (float): The priority an item has to exceed to be sampled.
+        queued (np.ndarray): A boolean mask of the items that are still in the tree.
+        weights (np.ndarray): The current weight of every item, 0 for the removed items.
+        tree (np.ndarray): The Fenwick tree of the weights, tree[k] holds the sum of the weights of the items k - (k & -k) to k - 1.
+        size (int): The number of items still in the tree.
+        num_weighted (int): The number of items in the tree with a positive weight.
+        num_updates (int): The number of weight changes since the tree sums were last rebuilt.
+        num_rebuilds (int): The number of times the tree sums were rebuilt after they were built.
+    """
+
+    def __init__(self, priorities: np.ndarray, min_priority: float = 0):
+        """Initializes the tree from the initial priorities.
+
+        Args:
+            priorities (np.ndarray): The initial priority of every item. The array is kept by reference.
+            min_priority (float): The priority an item has to exceed to be sampled, defaults to 0.
+        """
+        self.priorities = priorities
+        self.min_priority = min_priority
+        self.queued = np.ones(len(priorities), dtype=bool)
+        self.weights = self.get_weights(priorities)
+        self.tree = np.zeros(len(priorities) + 1, dtype=np.float64)
+        self.size = len(priorities)
+        self.num_weighted = int(np.count_nonzero(self.weights))
+        self.rebuild()
+        self.num_rebuilds = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, item: int):
+        return bool(self.queued[item])
+
+    @property
+    def total(self) -> float:
+        """The sum of the weights of the items in the tree."""
+        return self.prefix_sum(len(self.weights))
+
+    def get_weights(self, priorities: np.ndarray) -> np.ndarray:
+        """The weights of items with the given priorities."""
+        return np.where(priorities > self.min_priority, priorities, 0).astype(np.float64)
+
+    def rebuild(self):
+        """Recomputes the tree sums from the weights, discarding the rounding errors accumulated by the updates."""
+        positions = np.arange(1, len(self.tree))
+        cumulative = np.concatenate(([0], np.cumsum(self.weights)))
+        self.tree[1:] = cumulative[positions] - cumulative[positions - (positions & -positions)]
+        self.num_updates = 0
+
+    def prefix_sum(self, count: int) -> float:
+        """The sum of the weights of the items 0 to count - 1."""
+        total = 0.0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def add(self, items: np.ndarray, deltas: np.ndarray):
+        """Adds to the weights of distinct items in the tree sums.
+
+        Args:
+            items (np.ndarray): The distinct items.
+            deltas (np.ndarray): The change of the weight of each item.
+        """
+        positions = np.asarray(items, dtype=np.int64) + 1
+        while len(positions):
+            np.add.at(self.tree, positions, deltas)
+            positions = positions + (positions & -positions)
+            inside = positions < len(self.tree)
+            positions = positions[inside]
+            deltas = deltas[inside]
+        self.num_updates += len(items)
+        # the sums drift as the updates accumulate rounding errors, so they are rebuilt once per len(tree) updates
+        if self.num_updates > len(self.tree):
+            self.num_rebuilds += 1
+            self.rebuild()
+
+    def set_weights(self, items: np.ndarray, weights: np.ndarray):
+        """Sets the weights of distinct items, updating the tree sums and the number of weighted items."""
+        old_weights = self.weights[items]
+        self.num_weighted += int(np.count_nonzero(weights)) - int(np.count_nonzero(old_weights))
+        self.weights[items] = weights
+        self.add(items, weights - old_weights)
+
+    def update(self, item: int, priority: float):
+        """Sets the priority of a queued item.
+
+        Args:
+            item (int): The queued item.
+            priority (float): The new priority of the item.
+        """
+        self.update_many(np.array([item]), np.array([priority]))
+
+    def update_many(self, items: np.ndarray, priorities: np.ndarray):
+        """Sets the priorities of many distinct queued items, updating the tree only for the weights that changed.
+
+        Args:
+            items (np.ndarray): The distinct queued items.
+            priorities (np.ndarray): The new priority of each item.
+
+        Returns:
+            int: The number of items whose weight changed.
+        """
+        priorities = np.asarray(priorities, dtype=self.priorities.dtype)
+        self.priorities[items] = priorities
+        weights = self.get_weights(priorities)
+        changed = self.weights[items] != weights
+        self.set_weights(items[changed], weights[changed])
+        return int(np.count_nonzero(changed))
+
+    def remove(self, item: int):
+        """Removes an item from the tree.
+
+        Args:
+            item (int): The queued item to be removed.
+        """
+        self.queued[item] = False
+        self.size -= 1
+        if self.weights[item] != 0:
+            self.set_weights(np.array([item]), np.zeros(1))
+
+    def remove_many(self, items: np.ndarray):
+        """Removes many distinct queued items from the tree.
+
+        Args:
+            items (np.ndarray): The distinct queued items to be removed.
+        """
+        self.queued[items] = False
+        self.size -= len(items)
+        items = items[self.weights[items] != 0]
+        self.set_weights(items, np.zeros(len(items)))
+
+    def find(self, value: float) -> int:
+        """Finds the first item whose cumulative weight exceeds a value, by descending the tree.
+
+        Args:
+            value (float): A value between 0 and the total weight.
+
+        Returns:
+            int: The item, len(weights) if the value is not below the total weight.
+        """
+        tree = self.tree
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            if position + step < len(tree) and tree[position + step] <= value:
+                position += step
+                value -= tree[position]
+            step >>= 1
+        return position
+
+    def sample(self, rng: np.random.Generator) -> int:
+        """Samples an item with probability proportional to its weight, without removing it.
+
+        Args:
+            rng (np.random.Generator): The random number generator.
+
+        Returns:
+            int: The sampled item.
+        """
+        if self.num_weighted == 0:
+            raise IndexError("sample from a sum tree without weighted items")
+        fraction = rng.random()
+        item = self.find(fraction * self.total)
+        if item == len(self.weights) or self.weights[item] == 0:
+            # rounding errors in the tree sums can land next to the weighted items, so the sums are rebuilt exactly
+            self.num_rebuilds += 1
+            self.rebuild()
+            item = self.find(fraction * self.total)
+            if item == len(self.weights) or self.weights[item] == 0:
+                item = int(np.flatnonzero(self.weights)[-1])
+        return int(item)
+
+    def pop(self, rng: np.random.Generator) -> int:
+        """Removes and returns an item sampled with probability proportional to its weight.
+
+        Args:
+            rng (np.random.Generator): The random number generator.
+
+        Returns:
+            int: The sampled item.
+        """
+        item = self.sample(rng)
+        self.remove(item)
+        return item
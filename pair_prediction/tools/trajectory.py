@@ -0,0 +1,162 @@
+from tools.neighbors import select_neighbor_search
+from tools.pdb import PDB, decode_atom_records, find_model_end
+from tools.utils import extract_neighbor_pairs
+import mmap
+import numpy as np
+
+
+class Trajectory:
+    """Streams the frames of a PDB file with several models (MODEL/ENDMDL), such as a molecular dynamics trajectory.
+
+    The topology is parsed once from the first model. For every frame only the coordinate columns are decoded, so
+    the frames are read one at a time from the memory-mapped file and never held in memory together.
+
+    Attributes:
+        file (str): The path to the pdb file.
+        topology (PDB): The structure parsed from the first model, holding the coordinates of the first frame.
+    """
+
+    def __init__(self, file: str, periodic: bool = False):
+        """Parses the topology of the trajectory from its first model.
+
+        Args:
+            file (str): The path to the pdb file.
+            periodic (bool): Whether to apply periodic boundaries in the unit cell of the CRYST1 record before the first model, defaults to False.
+        """
+        self.file = file
+        self.topology = PDB(file, periodic)
+
+    def __iter__(self):
+        return self.frames()
+
+    def frames(self):
+        """Reads the coordinates of each frame of the trajectory in turn.
+
+        Yields:
+            np.ndarray: The (x, y, z) coordinates of each atom of a frame, in the order of the topology.
+
+        Raises:
+            ValueError: If a frame does not have the same number of atoms as the topology.
+        """
+        num_atoms = len(self.topology.serials)
+        with open(self.file, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be memory-mapped
+                return
+            try:
+                start = 0
+                frame = 0
+                while start < len(mapped):
+                    end = find_model_end(mapped, start)
+                    buffer = np.frombuffer(mapped, dtype=np.uint8, count=end - start, offset=start)
+                    records = decode_atom_records(buffer, ("x", "y", "z"))
+                    del buffer
+                    # the text after the last ENDMDL holds no atoms
+                    if len(records["x"]) or frame == 0:
+                        if len(records["x"]) != num_atoms:
+                            raise ValueError(
+                                f"Frame {frame} of {self.file} has {len(records['x'])} atoms, expected {num_atoms}"
+                            )
+                        yield np.column_stack(
+                            (
+                                records["x"].astype(np.float64),
+                                records["y"].astype(np.float64),
+                                records["z"].astype(np.float64),
+                            )
+                        ).reshape(-1, 3)
+                        frame += 1
+                    # continue after the ENDMDL line, releasing the pages of the frames read so far
+                    newline = mapped.find(b"\n", end)
+                    start = newline + 1 if newline != -1 else len(mapped)
+                    released = start - start % mmap.PAGESIZE
+                    if released and hasattr(mapped, "madvise"):
+                        mapped.madvise(mmap.MADV_DONTNEED, 0, released)
+            finally:
+                mapped.close()
+
+    def get_frame_structure(self, coords: np.ndarray) -> PDB:
+        """Creates a structure of a frame, sharing the parsed arrays of the topology.
+
+        Args:
+            coords (np.ndarray): The coordinates of the frame.
+
+        Returns:
+            PDB: The structure of the frame without any bonds.
+        """
+        structure = self.topology.copy_structure()
+        structure.coords = coords
+        return structure
+
+
+class ContactCounter:
+    """Counts how often each pair of reactive atoms in different chains is within the query radius over the frames of a trajectory.
+
+    Attributes:
+        reactive_indices (np.ndarray): The index of each reactive atom in the structure.
+        reactive_atom_chains (np.ndarray): The index of the chain of each reactive atom.
+        query_radius (float): The radius of a contact.
+        neighbor_search (str): The name of the neighbor search backend used for the spatial query, or "auto".
+        workers (int): The number of threads the neighbor search may use, -1 uses all processors.
+        box (np.ndarray): The edge lengths of the periodic box of the structure, or None for no periodic boundaries.
+        reactive_groups (tuple): The group of each reactive atom and the pairs of groups that can pair, see PredictBonds.get_reactive_groups.
+        num_frames (int): The number of frames counted.
+        keys (np.ndarray): The sorted keys (atom_i * number of reactive atoms + atom_j) of the pairs in contact in any frame.
+        counts (np.ndarray): The number of frames each pair is in contact.
+        distance_sums (np.ndarray): The sum of the distances of each pair over the frames it is in contact.
+    """
+
+    def __init__(self, predictor, neighbor_search="auto", workers=1):
+        """Initializes a ContactCounter with the reactive atoms of a predictor.
+
+        Args:
+            predictor (PredictBonds): A predictor whose reactive atoms and chains are initialized.
+            neighbor_search (str): The name of the neighbor search backend in tools.neighbors, defaults to "auto".
+            workers (int): The number of threads the neighbor search may use, -1 uses all processors. Defaults to 1.
+        """
+        self.reactive_indices = predictor.reactive_indices
+        self.reactive_atom_chains = predictor.reactive_atom_chains
+        self.query_radius = predictor.query_radius
+        self.neighbor_search = neighbor_search
+        self.workers = workers
+        self.box = predictor.pdb.box
+        self.reactive_groups = predictor.get_reactive_groups()
+        self.num_frames = 0
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.distance_sums = np.empty(0, dtype=np.float64)
+
+    def add_frame(self, coords: np.ndarray):
+        """Counts the contacts of a frame.
+
+        Args:
+            coords (np.ndarray): The coordinates of all atoms of the frame.
+        """
+        reactive_coords = coords[self.reactive_indices]
+        neighbor_search = select_neighbor_search(
+            reactive_coords, self.query_radius, self.neighbor_search, self.workers, self.box
+        )
+        atom_i, atom_j, distances = extract_neighbor_pairs(
+            *neighbor_search.query_pairs(reactive_coords, self.query_radius, *self.reactive_groups),
+            self.reactive_atom_chains,
+        )
+        frame_keys = atom_i.astype(np.int64) * len(self.reactive_indices) + atom_j
+        keys, inverse = np.unique(np.concatenate((self.keys, frame_keys)), return_inverse=True)
+        self.counts = np.bincount(
+            inverse, weights=np.concatenate((self.counts, np.ones(len(frame_keys)))), minlength=len(keys)
+        ).astype(np.int64)
+        self.distance_sums = np.bincount(
+            inverse, weights=np.concatenate((self.distance_sums, distances)), minlength=len(keys)
+        )
+        self.keys = keys
+        self.num_frames += 1
+
+    def get_neighbor_pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Gets the pairs in contact in any frame, to be passed to predictors as neighbor_pairs.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The lower reactive atom indices, the higher reactive atom indices, the mean distance of the pairs over the frames they are in contact and the fraction of the frames they are in contact.
+        """
+        atom_i, atom_j = np.divmod(self.keys, max(len(self.reactive_indices), 1))
+        return atom_i, atom_j, self.distance_sums / self.counts, self.counts / max(self.num_frames, 1)
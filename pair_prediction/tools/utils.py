@@ -1,69 +1,43 @@
 ### Author: Bradford Derby ###
 
-from tools.constraint_validation import are_atoms_same_chain
 import numpy as np
 
 
-def atoms_to_coords(atoms):
-    """Converts a list of Atom objects to a numpy array of their coordinates.
+def extract_neighbor_pairs(
+    query_indices: np.ndarray, nn_indices: np.ndarray, distances: np.ndarray, chain_ids: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Filters flat neighbor pairs down to the pairs of atoms in different chains, emitting each unordered pair once.
 
-    Args:
-        atoms (List[Atom]): A list of Atom objects.
-
-    Returns:
-        np.ndarray: A numpy array where each row represents the coordinates of an atom.
-    """
-    coords = np.empty((len(atoms), 3))
-    for i, atom in enumerate(atoms):
-        coords[i] = [atom.x, atom.y, atom.z]
-    return coords
-
-
-def remove_1st_and_chain(
-    nn_indices: np.ndarray, distances_matrix: np.ndarray, reactive_atoms
-) -> tuple[np.ndarray, np.ndarray]:
-    """Filters out the first column of the indices and distances, which is the atom itself, and those atoms that are in the same chain.
+    A pair (i, j) is kept only when i < j, which also removes each atom from its own neighbors.
 
     Args:
-        nn_indices (np.ndarray): An array of nearest neighbor indices.
-        distances_matrix (np.ndarray): A matrix of distances between atoms.
-        reactive_atoms (List[Atom]): A list of reactive atoms.
+        query_indices (np.ndarray): The query atom index of each pair.
+        nn_indices (np.ndarray): The neighbor index of each pair.
+        distances (np.ndarray): The distance between the atoms of each pair.
+        chain_ids (np.ndarray): An identifier of the chain of each atom.
 
     Returns:
-        Tuple[np.ndarray, np.ndarray]: A tuple containing the filtered indices and distances.
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The lower atom indices, the higher atom indices and the distances of the kept pairs.
     """
-    indices_filtered = []
-    distances_filtered = []
-
-    # Filter out the atoms that are in the same chain
-    for query_atom_idx, inner_array in enumerate(nn_indices):
-        current_atom = reactive_atoms[query_atom_idx]
-        inner_indices = []
-        inner_distances = []
-
-        for idx_in_list, cur_nn_idx in enumerate(inner_array):
-            cur_nn_atom = reactive_atoms[cur_nn_idx]
-
-            if not are_atoms_same_chain(current_atom, cur_nn_atom):
-                inner_indices.append(cur_nn_idx)
-                inner_distances.append(distances_matrix[query_atom_idx][idx_in_list])
-
-        indices_filtered.append(inner_indices)
-        distances_filtered.append(inner_distances)
-
-    return indices_filtered, distances_filtered
+    keep = (query_indices < nn_indices) & (chain_ids[query_indices] != chain_ids[nn_indices])
+    return query_indices[keep], nn_indices[keep], distances[keep]
 
 
-def calc_distance(atom1, atom2) -> float:
+def calc_distance(atom1, atom2, box=None) -> float:
     """Calculates the Euclidean distance between two Atom objects.
 
     Args:
         atom1 (Atom): The first Atom object.
         atom2 (Atom): The second Atom object.
+        box (np.ndarray): The edge lengths of an orthorhombic periodic box to take the minimum image distance in, defaults to None for no periodic boundaries.
 
     Returns:
         float: The Euclidean distance between the two Atom objects.
     """
+    if box is not None:
+        diff = np.array([atom1.x - atom2.x, atom1.y - atom2.y, atom1.z - atom2.z])
+        diff -= box * np.round(diff / box)
+        return np.sqrt(np.dot(diff, diff))
     distance = np.sqrt(
         (atom1.x - atom2.x) ** 2 + (atom1.y - atom2.y) ** 2 + (atom1.z - atom2.z) ** 2
     )